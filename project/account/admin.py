@@ -1,4 +1,55 @@
 from django.contrib import admin
-from .models import Profile
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
 
-admin.site.register(Profile)
+from project.admin import EstimatedCountPaginator
+from .deletion import request_account_deletion
+from .models import AccountDeletion, Profile
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display: tuple = ('user', 'phone_number', 'updated_at')
+    list_select_related: tuple = ('user',)
+    list_per_page: int = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+    search_fields: tuple = ('^user__username',)
+    autocomplete_fields: tuple = ('user',)
+
+
+class DeferredDeletionUserAdmin(UserAdmin):
+    """
+    Администрирование пользователей, при котором удаление выполняется фоновым процессом.
+
+    Поиск (и автодополнение пользователей в других разделах админки) идет по
+    началу имени пользователя и email, чтобы использовать уникальный индекс
+    username и индекс email (миграция account 0006). Поиск по имени и фамилии
+    из UserAdmin не поддерживается: он требует LIKE '%...%' без индекса.
+    """
+
+    search_fields: tuple = ('^username', '^email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+
+    def get_deleted_objects(self, objs, request):
+        # связанные объекты не собираются: каскад выполнит process_account_deletions
+        to_delete = [str(obj) for obj in objs]
+        return to_delete, {User._meta.verbose_name_plural: len(to_delete)}, set(), []
+
+    def delete_model(self, request, obj: User) -> None:
+        request_account_deletion(obj)
+
+    def delete_queryset(self, request, queryset) -> None:
+        for user in queryset:
+            request_account_deletion(user)
+
+
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display: tuple = ('user', 'requested_at', 'deleted_objects')
+    list_select_related: tuple = ('user',)
+
+
+admin.site.unregister(User)
+admin.site.register(User, DeferredDeletionUserAdmin)
+admin.site.register(AccountDeletion, AccountDeletionAdmin)
+admin.site.register(Profile, ProfileAdmin)
@@ -0,0 +1,38 @@
+"""Асинхронные версии представлений учетной записи для ASGI-развертывания."""
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from memo_board.stats import aget_note_stats
+from project.decorators import aget_user
+from project.query_budget import query_budget
+from .cache import aget_profile, profile_validators
+
+
+@query_budget(4)
+async def profile(request: HttpRequest, username: str) -> HttpResponse:
+    """
+    Функция представления для вывода страницы профиля пользователя.
+
+    Args:
+        request: HTTP-запрос.
+        username: Имя пользователя, профиль которого отображается.
+
+    Returns:
+        HTTP-ответ, содержащий отрисованный шаблон.
+    """
+    profile = await aget_profile(username)
+    if profile is None:
+        raise Http404('Профиль не найден')
+    user = await aget_user(request)  # base.html обращается к user
+    stats = await aget_note_stats(profile.user_id)
+    etag, last_modified = profile_validators(profile, user, stats)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        context = {'profile': profile, 'note_stats': stats}
+        response = render(request, 'account/profile.html', context)
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
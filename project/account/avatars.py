@@ -0,0 +1,209 @@
+"""
+Производные изображения аватарок.
+
+Для каждого Profile.image строятся квадратные копии размеров AVATAR_SIZES в
+WebP и JPEG (для браузеров без WebP). Построение выполняет фоновый процесс
+manage.py process_avatars: представления только сбрасывают Profile.avatar_ready
+в None, а обработчик находит такие профили и строит для них копии.
+
+Оригиналы хранятся в ContentAddressedStorage, поэтому один файл может быть
+общим для многих профилей (например, стандартная аватарка). Число ссылок на
+файл - это число профилей с таким Profile.image; release_avatar удаляет файл
+и его копии, когда ссылок не осталось и файл не сохранялся последние
+AVATAR_RELEASE_GRACE секунд. Оставленные файлы без ссылок удаляет
+manage.py dedupe_avatars --prune.
+"""
+import io
+import logging
+import os
+import posixpath
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6}), 'jpg': ('JPEG', {'quality': 85, 'optimize': True})}
+DEFAULT_AVATAR_PATH = os.path.join(settings.BASE_DIR, 'media', 'account.jpg')
+
+# имя стандартной аватарки в хранилище для каждого MEDIA_ROOT
+_default_avatar_names: Dict[str, str] = {}
+
+
+def derivative_name(name: str, size: int, ext: str) -> str:
+    """
+    Возвращает имя файла производной копии изображения.
+
+    Args:
+        name: Имя исходного файла в хранилище.
+        size: Сторона квадрата в пикселях.
+        ext: Расширение формата (webp или jpg).
+
+    Returns:
+        Имя файла вида avatars/<путь исходника без расширения>_<size>.<ext>.
+    """
+    root, _ = posixpath.splitext(name)
+    return posixpath.join('avatars', f'{root}_{size}.{ext}')
+
+
+def default_avatar_name() -> str:
+    """
+    Возвращает имя стандартной аватарки в хранилище, сохраняя ее при первом вызове.
+
+    Файл хранится один раз на все профили и никогда не удаляется release_avatar.
+
+    Returns:
+        Имя файла для Profile.image.
+    """
+    from .models import Profile
+
+    field = Profile._meta.get_field('image')
+    location = field.storage.location
+    if location not in _default_avatar_names:
+        with open(DEFAULT_AVATAR_PATH, 'rb') as f:
+            name = field.storage.save(field.generate_filename(None, 'account.jpg'), File(f))
+        _default_avatar_names[location] = name
+    return _default_avatar_names[location]
+
+
+def release_avatar(name: Optional[str]) -> bool:
+    """
+    Удаляет файл аватарки и его копии, если на него больше не ссылается ни один профиль.
+
+    Файл, сохраненный за последние AVATAR_RELEASE_GRACE секунд, не удаляется:
+    загрузка того же содержимого могла получить его имя, но еще не сохранить
+    профиль. Проверка и удаление выполняются под блокировкой хранилища.
+
+    Args:
+        name: Имя файла, на который профиль перестал ссылаться.
+
+    Returns:
+        True, если файл был удален.
+    """
+    from .models import Profile
+
+    if not name or name == default_avatar_name():
+        return False
+    storage = Profile._meta.get_field('image').storage
+    with storage.lock():
+        if Profile.objects.filter(image=name).exists():
+            return False
+        try:
+            if time.time() - os.path.getmtime(storage.path(name)) < settings.AVATAR_RELEASE_GRACE:
+                return False
+        except FileNotFoundError:
+            pass
+        storage.delete(name)
+    for size in AVATAR_SIZES:
+        for ext in AVATAR_FORMATS:
+            default_storage.delete(derivative_name(name, size, ext))
+    return True
+
+
+def _save(storage, name: str, content: bytes) -> None:
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+
+
+def _encode(image: Image.Image, fmt: str, options: dict) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _cap_original(profile: 'Profile', image: Image.Image, source_format: str) -> None:
+    limit = settings.AVATAR_MAX_ORIGINAL_SIZE
+    if not limit or max(image.size) <= limit:
+        return
+    capped = image.copy()
+    capped.thumbnail((limit, limit), Image.LANCZOS)
+    fmt = source_format if source_format in ('JPEG', 'PNG', 'WEBP', 'GIF') else 'PNG'
+    if fmt == 'JPEG' and capped.mode not in ('RGB', 'L'):
+        capped = capped.convert('RGB')
+    # оригинал может быть общим, поэтому уменьшенная версия сохраняется как новый файл
+    profile.image.name = profile.image.storage.save(profile.image.name, ContentFile(_encode(capped, fmt, {})))
+
+
+def generate_avatar_derivatives(profile: 'Profile') -> List[str]:
+    """
+    Строит производные копии аватарки профиля и, если задан
+    AVATAR_MAX_ORIGINAL_SIZE, уменьшает слишком большой оригинал (profile.image
+    тогда указывает на новый файл, сам профиль не сохраняется).
+
+    Args:
+        profile: Профиль с загруженным изображением.
+
+    Returns:
+        Список имен созданных файлов.
+    """
+    with profile.image.open('rb') as f:
+        source = Image.open(f)
+        source_format = source.format
+        source.load()
+    image = ImageOps.exif_transpose(source)
+    _cap_original(profile, image, source_format)
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    else:
+        image = image.convert('RGB')
+
+    names = []
+    for size in AVATAR_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        for ext, (fmt, options) in AVATAR_FORMATS.items():
+            name = derivative_name(profile.image.name, size, ext)
+            _save(default_storage, name, _encode(square, fmt, options))
+            names.append(name)
+    return names
+
+
+def process_pending_avatars(limit: int = 100) -> int:
+    """
+    Обрабатывает профили, ожидающие построения копий (avatar_ready is None).
+
+    После обработки avatar_ready становится True, а если изображение не удалось
+    прочитать - False (шаблоны тогда показывают оригинал). Флаг меняется только
+    если изображение не сменилось за время обработки, иначе профиль останется
+    в очереди и будет обработан повторно. Копии общего файла, уже построенные
+    для другого профиля, не строятся заново.
+
+    Args:
+        limit: Максимальное число профилей за вызов.
+
+    Returns:
+        Число обработанных профилей.
+    """
+    from .cache import invalidate_profile, invalidate_user
+    from .models import Profile
+
+    profiles = list(Profile.objects.filter(avatar_ready__isnull=True).select_related('user').order_by('id')[:limit])
+    for profile in profiles:
+        name = profile.image.name
+        if Profile.objects.filter(image=name, avatar_ready=True).exists():
+            ready = True
+        else:
+            try:
+                generate_avatar_derivatives(profile)
+                ready = True
+            except (OSError, ValueError, Image.DecompressionBombError):
+                logger.exception('Failed to build avatar derivatives for profile %s', profile.pk)
+                ready = False
+        Profile.objects.filter(pk=profile.pk, image=name).update(avatar_ready=ready, image=profile.image.name,
+                                                                 updated_at=timezone.now())
+        invalidate_profile(profile.user.username)
+        invalidate_user(profile.user_id)
+        if profile.image.name != name:
+            release_avatar(name)
+    return len(profiles)
@@ -0,0 +1,38 @@
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from project.routers import recently_written, use_primary
+
+from .cache import user_cache_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который берет пользователя сессии из кэша.
+
+    Пользователь загружается вместе с профилем и кэшируется на
+    AUTH_USER_CACHE_TIMEOUT секунд, поэтому на типичный запрос
+    аутентифицированного пользователя не нужно ни одного SQL-запроса. С
+    AUTH_USER_CACHE_TIMEOUT = 0 (по умолчанию при кэше в памяти процесса,
+    который не видит сбросов из других процессов) пользователь читается из БД
+    на каждый запрос.
+    Кэш сбрасывается приемниками сигналов User и Profile (см. account.signals);
+    смена пароля тоже сохраняет пользователя, поэтому проверка хеша сессии
+    видит новый пароль.
+    """
+
+    def get_user(self, user_id) -> Optional[User]:
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            with use_primary(recently_written(key)):
+                user = User._default_manager.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            if settings.AUTH_USER_CACHE_TIMEOUT:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
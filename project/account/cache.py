@@ -0,0 +1,106 @@
+"""
+Кэш профилей для страницы профиля и пользователей сессий.
+
+Профиль вместе с пользователем загружается одним запросом и кэшируется под
+именем пользователя. Ключ удаляется приемниками сигналов Profile и User
+(см. account.signals) после фиксации транзакции. Для условных GET-запросов
+profile_validators строит ETag и Last-Modified по Profile.updated_at.
+
+Пользователи сессий кэшируются account.backends.CachedModelBackend под id
+пользователя и удаляются из кэша теми же приемниками сигналов.
+
+Удаление из кэша отмечает данные измененными (project.routers.mark_written),
+и в течение DB_REPLICA_STICKINESS секунд кэш заполняется из основной БД, а не
+из реплики, которая могла еще не получить изменение.
+"""
+import hashlib
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from project.routers import arecently_written, mark_written, recently_written, use_primary
+
+from .models import Profile
+
+
+def profile_cache_key(username: str) -> str:
+    return f'account:profile:{username}'
+
+
+def get_profile(username: str) -> Optional[Profile]:
+    """
+    Возвращает профиль пользователя из кэша или загружает и кэширует его.
+
+    Args:
+        username: Имя пользователя.
+
+    Returns:
+        Профиль с загруженным пользователем или None, если пользователя нет.
+    """
+    key = profile_cache_key(username)
+    profile = cache.get(key)
+    if profile is None:
+        with use_primary(recently_written(key)):
+            profile = Profile.objects.select_related('user').filter(user__username=username).first()
+        if profile is not None:
+            cache.set(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+async def aget_profile(username: str) -> Optional[Profile]:
+    """Асинхронная версия get_profile."""
+    key = profile_cache_key(username)
+    profile = await cache.aget(key)
+    if profile is None:
+        with use_primary(await arecently_written(key)):
+            profile = await Profile.objects.select_related('user').filter(user__username=username).afirst()
+        if profile is not None:
+            await cache.aset(key, profile, settings.PROFILE_CACHE_TIMEOUT)
+    return profile
+
+
+def invalidate_profile(username: str) -> None:
+    """Удаляет профиль пользователя из кэша."""
+    key = profile_cache_key(username)
+    cache.delete(key)
+    mark_written(key)
+
+
+def user_cache_key(user_id) -> str:
+    return f'account:user:{user_id}'
+
+
+def invalidate_user(user_id) -> None:
+    """Удаляет пользователя сессии (вместе с его профилем) из кэша."""
+    key = user_cache_key(user_id)
+    cache.delete(key)
+    mark_written(key)
+
+
+def profile_validators(profile: Profile, viewer, stats=None) -> Tuple[str, Optional[int]]:
+    """
+    Возвращает валидаторы страницы профиля для условного GET.
+
+    Страница содержит имя зрителя в навигации, поэтому ETag зависит и от
+    профиля, и от зрителя. Last-Modified зрителя не учитывает, поэтому
+    отдается только анонимным зрителям: иначе клиент, приславший только
+    If-Modified-Since, после входа или выхода получил бы 304 на страницу
+    с чужой навигацией.
+
+    Args:
+        profile: Отображаемый профиль.
+        viewer: Пользователь, запросивший страницу (может быть анонимным).
+        stats: Статистика заметок владельца профиля (memo_board.models.NoteStats) или None.
+
+    Returns:
+        Пара (ETag в кавычках, время последнего изменения профиля или статистики в секундах
+        или None для аутентифицированного зрителя).
+    """
+    viewer_key = f'{viewer.pk}:{viewer.get_username()}' if viewer.is_authenticated else '-'
+    updated_at = profile.updated_at if stats is None else max(profile.updated_at, stats.updated_at)
+    stats_key = '-' if stats is None else f'{stats.note_count}:{stats.updated_at.isoformat()}'
+    raw = f'{profile.pk}:{profile.updated_at.isoformat()}:{stats_key}:{viewer_key}'
+    etag = quote_etag(hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest())
+    return etag, None if viewer.is_authenticated else int(updated_at.timestamp())
@@ -0,0 +1,132 @@
+"""
+Отложенное удаление учетных записей.
+
+Удаление пользователя каскадно удаляет все его заметки. У активных
+пользователей их много, и удаление одним запросом в одной транзакции надолго
+блокирует таблицу заметок. Поэтому запрос на удаление только деактивирует
+пользователя и создает AccountDeletion, а связанные объекты удаляет фоновый
+процесс manage.py process_account_deletions пакетами в коротких транзакциях.
+Обработка идемпотентна: прерванное удаление продолжается с того же места.
+
+Заметки и прочие объекты удаляются без сигналов post_delete: вместо события
+и поправки статистики на каждую заметку после пакета один раз сбрасывается
+кэш списка и в живую ленту отправляется reset. Через delete() с сигналами
+удаляются только профили - их приемники удаляют файлы аватарок.
+
+Каждый пакет блокирует запись AccountDeletion (skip_locked), поэтому
+несколько обработчиков не удаляют объекты одного пользователя одновременно:
+обработчик, заставший запись заблокированной, переходит к следующей.
+"""
+from typing import Callable, Optional
+
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.db.models import F
+
+from memo_board.cache import mark_notes_deleted
+from memo_board.events import publish_reset
+from memo_board.models import ArchivedNote, Note
+from project.db.bulk import delete_rows
+from .cache import invalidate_user
+from .models import AccountDeletion, Profile
+
+# модели, удаление которых должно отправлять сигналы (приемники удаляют файлы)
+SIGNAL_DELETE_MODELS = (Profile,)
+NOTE_MODELS = (Note, ArchivedNote)
+
+
+def request_account_deletion(user: User) -> AccountDeletion:
+    """
+    Деактивирует пользователя и ставит его учетную запись в очередь на удаление.
+
+    Args:
+        user: Удаляемый пользователь.
+
+    Returns:
+        Запись об удалении (существующая, если удаление уже запрошено).
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        deletion, _ = AccountDeletion.objects.get_or_create(user=user)
+        # update() не отправляет сигналы, а закэшированный пользователь остался бы активным
+        transaction.on_commit(lambda: invalidate_user(user.pk))
+    user.is_active = False
+    return deletion
+
+
+def _cascade_relations():
+    # связи, которые удалил бы каскад User.delete(), кроме самой записи об удалении
+    for relation in User._meta.related_objects:
+        if relation.on_delete is models.CASCADE and not relation.many_to_many \
+                and relation.related_model is not AccountDeletion:
+            yield relation.related_model, relation.field.name
+
+
+def _claim(deletion: AccountDeletion) -> bool:
+    # блокировка до конца текущей транзакции; False - запись обрабатывает другой процесс или она уже удалена
+    return AccountDeletion.objects.select_for_update(skip_locked=True).filter(pk=deletion.pk).exists()
+
+
+def _delete_batch(model, ids) -> None:
+    manager = model._default_manager
+    if model in SIGNAL_DELETE_MODELS:
+        manager.filter(pk__in=ids).delete()
+        return
+    # без сигналов: последствия удаления заметок обновляются ниже один раз на пакет
+    delete_rows(model, ids)
+    if model in NOTE_MODELS:
+        transaction.on_commit(mark_notes_deleted)
+        transaction.on_commit(publish_reset)
+
+
+def process_account_deletion(deletion: AccountDeletion, batch_size: int,
+                             progress: Optional[Callable[[AccountDeletion, int], None]] = None) -> bool:
+    """
+    Удаляет объекты пользователя пакетами, а затем самого пользователя.
+
+    Args:
+        deletion: Запись об удалении.
+        batch_size: Максимальное число объектов в одной транзакции.
+        progress: Функция, вызываемая после каждого пакета с записью об удалении
+            и числом удаленных в нем объектов.
+
+    Returns:
+        True, если учетная запись удалена; False, если запись об удалении
+        заблокирована другим обработчиком (он и продолжит удаление).
+    """
+    for model, field_name in _cascade_relations():
+        rows = model._default_manager.filter(**{field_name: deletion.user_id})
+        while True:
+            with transaction.atomic():
+                if not _claim(deletion):
+                    return False
+                ids = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                _delete_batch(model, ids)
+                AccountDeletion.objects.filter(pk=deletion.pk).update(deleted_objects=F('deleted_objects') + len(ids))
+            deletion.deleted_objects += len(ids)
+            if progress is not None:
+                progress(deletion, len(ids))
+    with transaction.atomic():
+        if not _claim(deletion):
+            return False
+        User.objects.filter(pk=deletion.user_id).delete()
+    return True
+
+
+def process_pending_deletions(batch_size: int, limit: int = 10,
+                              progress: Optional[Callable[[AccountDeletion, int], None]] = None) -> int:
+    """
+    Обрабатывает запрошенные удаления учетных записей.
+
+    Args:
+        batch_size: Максимальное число объектов в одной транзакции.
+        limit: Максимальное число учетных записей за вызов.
+        progress: См. process_account_deletion.
+
+    Returns:
+        Число удаленных учетных записей.
+    """
+    deletions = list(AccountDeletion.objects.order_by('requested_at', 'pk')[:limit])
+    return sum(process_account_deletion(deletion, batch_size, progress) for deletion in deletions)
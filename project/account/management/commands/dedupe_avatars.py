@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.avatars import default_avatar_name, release_avatar
+from account.cache import invalidate_profile, invalidate_user
+from account.models import Profile
+
+
+class Command(BaseCommand):
+    help = ('Переводит аватарки на хранение по содержимому: профили с одинаковыми файлами начинают '
+            'ссылаться на один файл, освободившиеся копии удаляются. С --prune также удаляет файлы '
+            'аватарок, на которые не ссылается ни один профиль.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Удалить файлы без ссылок из профилей')
+
+    def handle(self, *args, **options):
+        field = Profile._meta.get_field('image')
+        storage = field.storage
+        default_name = default_avatar_name()
+        moved = removed = missing = 0
+
+        for name in list(Profile.objects.order_by().values_list('image', flat=True).distinct()):
+            if not name:
+                continue
+            if storage.exists(name):
+                with storage.open(name, 'rb') as f:
+                    target = storage.save(name, f)
+            elif name == field.default:
+                target = default_name
+            else:
+                missing += 1
+                self.stderr.write(f'Missing file: {name}')
+                continue
+            if target == name:
+                continue
+            profiles = Profile.objects.filter(image=name)
+            users = list(profiles.values_list('user_id', 'user__username'))
+            moved += profiles.update(image=target, avatar_ready=None, updated_at=timezone.now())
+            for user_id, username in users:
+                invalidate_profile(username)
+                invalidate_user(user_id)
+            removed += release_avatar(name)
+
+        if options['prune']:
+            directory = field.upload_to
+            for filename in storage.listdir(directory)[1]:
+                removed += release_avatar(f'{directory}/{filename}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done, {moved} profiles relinked, {removed} files removed, {missing} files missing'))
+        if moved:
+            self.stdout.write('Run manage.py process_avatars --once to rebuild derivatives')
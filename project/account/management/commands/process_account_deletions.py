@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.deletion import process_pending_deletions
+
+
+class Command(BaseCommand):
+    help = ('Фоновый обработчик удаления учетных записей: удаляет заметки, профиль и остальные объекты '
+            'пользователей, запросивших удаление, пакетами в коротких транзакциях. Прерванную обработку '
+            'можно безопасно запустить повторно. С --once обрабатывает очередь и завершается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+        parser.add_argument('--batch-size', type=int, default=500, help='Объектов в одной транзакции')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза в секундах при пустой очереди')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_pending_deletions(options['batch_size'], progress=self._progress)
+            total += processed
+            if processed:
+                self.stdout.write(f'{total} accounts deleted')
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Done, {total} accounts deleted'))
+
+    def _progress(self, deletion, deleted: int) -> None:
+        self.stdout.write(f'user {deletion.user_id}: {deletion.deleted_objects} objects deleted (+{deleted})')
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.avatars import process_pending_avatars
+from account.models import Profile
+
+
+class Command(BaseCommand):
+    help = ('Фоновый обработчик аватарок: строит уменьшенные копии WebP/JPEG для профилей, ожидающих '
+            'обработки. С --once обрабатывает очередь и завершается (используется для заполнения копий '
+            'существующих аватарок), с --all сначала ставит в очередь все профили.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+        parser.add_argument('--all', action='store_true', help='Перестроить копии для всех профилей')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза в секундах при пустой очереди')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            queued = Profile.objects.filter(avatar_ready__isnull=False).update(avatar_ready=None)
+            self.stdout.write(f'{queued} profiles queued')
+        total = 0
+        while True:
+            processed = process_pending_avatars(options['batch_size'])
+            total += processed
+            if processed:
+                self.stdout.write(f'{total} avatars processed')
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Done, {total} avatars processed'))
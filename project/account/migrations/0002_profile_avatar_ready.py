@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_ready",
+            field=models.BooleanField(
+                db_index=True, default=None, null=True, verbose_name="Копии аватарки"
+            ),
+        ),
+    ]
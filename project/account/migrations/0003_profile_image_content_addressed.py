@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:24
+
+import account.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0002_profile_avatar_ready"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="image",
+            field=models.ImageField(
+                db_index=True,
+                default="account/account.jpg",
+                storage=account.storage.ContentAddressedStorage(),
+                upload_to="account/profile_pics",
+                verbose_name="Аватарка",
+            ),
+        ),
+    ]
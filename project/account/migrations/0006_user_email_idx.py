@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+
+# индекс для поиска пользователей в админке по началу email (DeferredDeletionUserAdmin.search_fields);
+# модель auth.User не принадлежит приложению, поэтому индекс создается через schema_editor, а не AddIndex
+EMAIL_INDEX = models.Index(fields=["email"], name="account_user_email_idx")
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("account", "0005_accountdeletion"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
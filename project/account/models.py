@@ -1,16 +1,59 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from django.core.files.storage import default_storage
+
+from .avatars import AVATAR_SIZES, derivative_name
+from .storage import avatar_storage
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='Ник')
-    image = models.ImageField(verbose_name='Аватарка', default='account/account.jpg', upload_to='account/profile_pics')
+    # файлы именуются хешем содержимого и могут быть общими для нескольких профилей
+    image = models.ImageField(verbose_name='Аватарка', default='account/account.jpg', upload_to='account/profile_pics',
+                              storage=avatar_storage, db_index=True)
     bio = models.TextField(verbose_name='О себе', max_length=500, null=True, blank=True)
     phone_number = models.CharField(verbose_name='Номер телефона', max_length=20, null=True, blank=True)
+    # None - копии аватарки ждут построения, True - построены, False - построить не удалось
+    avatar_ready = models.BooleanField(verbose_name='Копии аватарки', null=True, default=None, db_index=True)
+    updated_at = models.DateTimeField(verbose_name='Дата изменения', auto_now=True)
 
     def __str__(self) -> str:
         return f'{self.user.username} Profile'
 
+    def avatar_url(self, size: int, ext: str = 'jpg') -> str:
+        return default_storage.url(derivative_name(self.image.name, size, ext))
+
+    def _avatar_srcset(self, ext: str) -> str:
+        return ', '.join(f'{self.avatar_url(size, ext)} {size}w' for size in AVATAR_SIZES)
+
+    @property
+    def avatar_webp_srcset(self) -> str:
+        return self._avatar_srcset('webp')
+
+    @property
+    def avatar_jpeg_srcset(self) -> str:
+        return self._avatar_srcset('jpg')
+
+    @property
+    def avatar_fallback_url(self) -> str:
+        return self.avatar_url(128)
+
     class Meta:
         verbose_name = 'Профиль'
         verbose_name_plural = 'Профили'
+
+
+class AccountDeletion(models.Model):
+    """Запрос на удаление учетной записи, выполняемый фоновым процессом (см. account.deletion)."""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='deletion', verbose_name='Пользователь')
+    requested_at = models.DateTimeField(verbose_name='Время запроса', auto_now_add=True)
+    deleted_objects = models.PositiveIntegerField(verbose_name='Удалено объектов', default=0)
+
+    def __str__(self) -> str:
+        return f'{self.user.username} deletion'
+
+    class Meta:
+        verbose_name = 'Удаление учетной записи'
+        verbose_name_plural = 'Удаления учетных записей'
@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .avatars import release_avatar
+from .cache import invalidate_profile, invalidate_user
+from .models import Profile
+
+
+@receiver(post_delete, sender=Profile)
+def release_profile_image(sender, instance: Profile, **kwargs) -> None:
+    """Удаляет файл аватарки удаленного профиля, если он больше ни с кем не общий."""
+    name = instance.image.name
+    transaction.on_commit(lambda: release_avatar(name))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_cache(sender, instance: Profile, **kwargs) -> None:
+    """
+    Функция приемника сигналов, удаляющая профиль из кэша после его изменения.
+
+    Ключ удаляется после фиксации транзакции, иначе конкурентный запрос мог бы
+    закэшировать профиль в состоянии до изменения.
+    """
+    try:
+        username = instance.user.username
+    except User.DoesNotExist:
+        return
+    transaction.on_commit(lambda: invalidate_profile(username))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance: User, update_fields=None, **kwargs) -> None:
+    """Запоминает прежнее имя пользователя, чтобы после переименования удалить профиль из кэша."""
+    if instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_cache_on_rename(sender, instance: User, created: bool, **kwargs) -> None:
+    """
+    Функция приемника сигналов, обновляющая дату изменения профиля и кэш при смене имени пользователя,
+    которое выводится на странице профиля.
+    """
+    previous = getattr(instance, '_previous_username', None)
+    if created or previous is None or previous == instance.username:
+        return
+    Profile.objects.filter(user=instance).update(updated_at=timezone.now())
+    username = instance.username
+    transaction.on_commit(lambda: (invalidate_profile(previous), invalidate_profile(username)))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_profile_cache_on_delete(sender, instance: User, **kwargs) -> None:
+    username = instance.username
+    transaction.on_commit(lambda: invalidate_profile(username))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance: User, **kwargs) -> None:
+    """
+    Функция приемника сигналов, удаляющая пользователя сессии из кэша после его изменения.
+
+    Ключ удаляется сразу (в том числе для нового пользователя, получившего id
+    удаленного) и еще раз после фиксации транзакции, чтобы не осталась версия,
+    закэшированная конкурентным запросом до фиксации.
+    """
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_user_profile(sender, instance: Profile, **kwargs) -> None:
+    """Функция приемника сигналов, удаляющая из кэша пользователя сессии вместе с измененным профилем."""
+    user_id = instance.user_id
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
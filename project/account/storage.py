@@ -0,0 +1,75 @@
+"""
+Хранилище файлов, адресуемых по содержимому.
+
+Файл сохраняется под именем <каталог>/<sha256 содержимого>.<расширение>,
+поэтому одинаковые загрузки и стандартная аватарка хранятся на диске один
+раз, а повторное сохранение существующего содержимого не пишет на диск, а
+только обновляет время изменения файла. Файл может быть общим для нескольких
+записей, поэтому удалять его можно только когда на него не осталось ссылок
+(см. account.avatars.release_avatar). Сохранение и удаление выполняются под
+блокировкой хранилища (lock), чтобы удаление не попало между проверкой
+существования файла и ссылкой на него.
+"""
+import hashlib
+import os
+import posixpath
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, именующее файлы хешем их содержимого."""
+
+    def content_name(self, name: str, content: File) -> str:
+        """
+        Возвращает имя файла по его содержимому.
+
+        Args:
+            name: Имя, предложенное полем (из него берутся каталог и расширение).
+            content: Содержимое файла.
+
+        Returns:
+            Имя вида <каталог>/<sha256>.<расширение>.
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, basename = posixpath.split(name)
+        ext = posixpath.splitext(basename)[1].lower()
+        return posixpath.join(directory, digest.hexdigest() + ext)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Монопольная блокировка хранилища между процессами (файл .lock в корне хранилища)."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.lock'), 'a') as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def save(self, name, content, max_length=None) -> str:
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        with self.lock():
+            if self.exists(name):
+                # свежее время изменения не дает release_avatar удалить файл, ссылка на
+                # который еще не сохранена (см. AVATAR_RELEASE_GRACE)
+                os.utime(self.path(name))
+                return name
+            # при одновременной записи одного содержимого второй файл получит суффикс;
+            # такие копии схлопывает manage.py dedupe_avatars
+            return super().save(name, content, max_length)
+
+
+avatar_storage = ContentAddressedStorage()
@@ -1,10 +1,26 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client
+from django.core.management import call_command
+from PIL import Image
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from .avatars import (AVATAR_SIZES, default_avatar_name, derivative_name, generate_avatar_derivatives,
+                      process_pending_avatars)
+from .cache import get_profile, user_cache_key
+from .deletion import process_pending_deletions, request_account_deletion
 from .forms import ProfileUpdateForm, UserUpdateForm
-from .models import Profile
+from .models import AccountDeletion, Profile
+from memo_board.models import Note
+from project.query_budget import capture_queries
 
 
 # тест для модели
@@ -93,3 +109,389 @@ class AccountViewTest(TestCase):
         self.assertEqual(response.status_code, 200)  # Check if form errors are shown
         self.assertContains(response, 'This field is required.')  # Check for error message
         self.assertTemplateUsed(response, 'account/account.html')  # Check if the correct template is used
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class AccountQueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        Profile.objects.get_or_create(user=self.user)
+        self.client.force_login(self.user)
+
+    def test_profile_within_budget(self):
+        response = self.client.get(reverse('profile', args=['testuser']))
+        self.assertContains(response, 'testuser')
+
+    def test_account_within_budget(self):
+        self.assertEqual(self.client.get(reverse('account')).status_code, 200)
+        response = self.client.post(reverse('account'), {
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'phone_number': '1234567890',
+            'bio': 'Hello, I am a test user!',
+        })
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(ROOT_URLCONF='project.async_urls', QUERY_BUDGET_STRICT=True)
+class AsyncProfileViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        Profile.objects.get_or_create(user=self.user)
+
+    async def test_profile(self):
+        response = await self.async_client.get(reverse('profile', args=['testuser']))
+        self.assertContains(response, 'testuser')
+
+    async def test_missing_profile(self):
+        response = await self.async_client.get(reverse('profile', args=['nobody']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_conditional_get(self):
+        response = await self.async_client.get(reverse('profile', args=['testuser']))
+        response = await self.async_client.get(reverse('profile', args=['testuser']),
+                                               headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class ProfileCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.url = reverse('profile', args=['testuser'])
+
+    def test_cached_profile_needs_no_queries(self):
+        self.client.get(self.url)
+        with capture_queries() as stats:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'testuser')
+        self.assertEqual(stats.count, 0)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(self.url, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_is_not_shared_between_viewers(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_profile_update_invalidates_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        profile = Profile.objects.get(user=self.user)
+        profile.bio = 'Updated bio'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Updated bio')
+
+    def test_rename_invalidates_both_usernames(self):
+        self.client.get(self.url)
+        self.user.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertContains(self.client.get(reverse('profile', args=['renamed'])), 'renamed')
+
+    def test_login_does_not_touch_profile(self):
+        updated_at = get_profile('testuser').updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(username='testuser', password='testpass')
+        self.assertEqual(Profile.objects.get(user=self.user).updated_at, updated_at)
+
+
+def make_image(size=(600, 400), fmt='PNG', mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class AvatarPipelineTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.profile, _ = Profile.objects.get_or_create(user=self.user)
+        self.client.force_login(self.user)
+
+    def _upload(self, content, name='avatar.png'):
+        return self.client.post(reverse('account'), {
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'phone_number': '1234567890',
+            'bio': 'bio',
+            'image': SimpleUploadedFile(name, content, content_type='image/png'),
+        })
+
+    def test_upload_queues_and_worker_builds_derivatives(self):
+        self.assertEqual(self._upload(make_image()).status_code, 302)
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.avatar_ready)
+        self.assertNotContains(self.client.get(reverse('profile', args=['testuser'])), 'srcset')
+
+        self.assertEqual(process_pending_avatars(), 1)
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.avatar_ready)
+        storage = self.profile.image.storage
+        for size in AVATAR_SIZES:
+            for ext in ('webp', 'jpg'):
+                with storage.open(derivative_name(self.profile.image.name, size, ext)) as f:
+                    self.assertEqual(Image.open(f).size, (size, size))
+        response = self.client.get(reverse('profile', args=['testuser']))
+        self.assertContains(response, self.profile.avatar_url(256, 'webp') + ' 256w')
+        self.assertEqual(process_pending_avatars(), 0)
+
+    @override_settings(AVATAR_MAX_ORIGINAL_SIZE=300)
+    def test_large_original_is_capped(self):
+        self._upload(make_image((1200, 900)))
+        process_pending_avatars()
+        self.profile.refresh_from_db()
+        with self.profile.image.open('rb') as f:
+            self.assertEqual(Image.open(f).size, (300, 225))
+
+    def test_broken_image_falls_back_to_original(self):
+        Profile.objects.filter(pk=self.profile.pk).update(image='account/profile_pics/missing.png', avatar_ready=None)
+        process_pending_avatars()
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.avatar_ready)
+
+    def test_backfill_command(self):
+        self.profile.image.save('existing.jpg', SimpleUploadedFile('existing.jpg', make_image(fmt='JPEG', mode='RGB')))
+        Profile.objects.update(avatar_ready=True)
+        out = io.StringIO()
+        call_command('process_avatars', '--once', '--all', stdout=out)
+        self.assertIn('Done, 1 avatars processed', out.getvalue())
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.avatar_ready)
+
+
+class ContentAddressedAvatarTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root, AVATAR_RELEASE_GRACE=0)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.alice = User.objects.create_user(username='alice', password='testpass')
+        self.bob = User.objects.create_user(username='bob', password='testpass')
+        self.storage = Profile._meta.get_field('image').storage
+
+    def _stored_files(self):
+        return sorted(self.storage.listdir('account/profile_pics')[1])
+
+    def _upload(self, user, content, name='avatar.png'):
+        client = Client()
+        client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('account'), {
+                'username': user.username,
+                'email': f'{user.username}@example.com',
+                'phone_number': '1234567890',
+                'bio': 'bio',
+                'image': SimpleUploadedFile(name, content, content_type='image/png'),
+            })
+        self.assertEqual(response.status_code, 302)
+        return Profile.objects.get(user=user).image.name
+
+    def test_default_avatar_is_stored_once(self):
+        names = set(Profile.objects.values_list('image', flat=True))
+        self.assertEqual(names, {default_avatar_name()})
+        self.assertEqual(len(self._stored_files()), 1)
+
+    def test_identical_uploads_share_a_file_until_last_reference_is_gone(self):
+        content = make_image()
+        alice_image = self._upload(self.alice, content, 'alice.png')
+        bob_image = self._upload(self.bob, content, 'bob.PNG')
+        self.assertEqual(alice_image, bob_image)
+        self.assertTrue(alice_image.endswith('.png'))
+        self.assertEqual(len(self._stored_files()), 2)
+
+        self._upload(self.alice, make_image((100, 100)))
+        self.assertTrue(self.storage.exists(bob_image))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.delete()
+        self.assertFalse(self.storage.exists(bob_image))
+        self.assertTrue(self.storage.exists(default_avatar_name()))
+
+    def test_recently_saved_file_is_kept_until_prune(self):
+        content = make_image()
+        alice_image = self._upload(self.alice, content)
+        with override_settings(AVATAR_RELEASE_GRACE=600):
+            # загрузка того же содержимого получила имя файла, но профиль еще не сохранен
+            self.assertEqual(self.storage.save('account/profile_pics/bob.png', ContentFile(content)), alice_image)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.alice.delete()
+            self.assertTrue(self.storage.exists(alice_image))
+        call_command('dedupe_avatars', '--prune', stdout=io.StringIO())
+        self.assertFalse(self.storage.exists(alice_image))
+
+    def test_shared_derivatives_are_built_once(self):
+        self._upload(self.alice, make_image())
+        self._upload(self.bob, make_image())
+        with mock.patch('account.avatars.generate_avatar_derivatives', wraps=generate_avatar_derivatives) as generate:
+            self.assertEqual(process_pending_avatars(), 2)
+        generate.assert_called_once()
+        self.assertEqual(Profile.objects.filter(avatar_ready=True).count(), 2)
+
+    def test_dedupe_command_collapses_legacy_copies(self):
+        content = make_image(fmt='JPEG', mode='RGB')
+        legacy = ['account/profile_pics/account.jpg', 'account/profile_pics/account_xgHiQQ9.jpg']
+        for name, user in zip(legacy, (self.alice, self.bob)):
+            default_storage.save(name, ContentFile(content))
+            Profile.objects.filter(user=user).update(image=name, avatar_ready=True)
+        default_storage.save('account/profile_pics/orphan.jpg', ContentFile(b'orphan'))
+
+        out = io.StringIO()
+        call_command('dedupe_avatars', '--prune', stdout=out)
+        self.assertIn('2 profiles relinked, 3 files removed', out.getvalue())
+        images = set(Profile.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertEqual(len(self._stored_files()), 2)
+        self.assertFalse(Profile.objects.filter(avatar_ready=True).exists())
+
+
+class AccountDeletionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='leaving', password='testpass')
+        Note.objects.bulk_create([Note(title=f'Note {n}', text='text', user=self.user) for n in range(5)])
+        self.stayer = User.objects.create_user(username='staying', password='testpass')
+        Note.objects.create(title='Kept', text='text', user=self.stayer)
+
+    def test_request_deactivates_and_defers_cascade(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('account_delete')).status_code, 405)
+        response = self.client.post(reverse('account_delete'))
+        self.assertRedirects(response, reverse('base_views'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(AccountDeletion.objects.filter(user=self.user).exists())
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 5)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertFalse(self.client.login(username='leaving', password='testpass'))
+
+    def test_worker_deletes_in_batches(self):
+        AccountDeletion.objects.create(user=self.user)
+        batches = []
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending_deletions(batch_size=2, progress=lambda d, n: batches.append(n)), 1)
+        self.assertEqual(batches, [2, 2, 1, 1])  # заметки пакетами, затем профиль
+        self.assertFalse(User.objects.filter(username='leaving').exists())
+        self.assertFalse(Profile.objects.filter(user_id=self.user.id).exists())
+        self.assertFalse(AccountDeletion.objects.exists())
+        self.assertEqual(list(Note.objects.values_list('title', flat=True)), ['Kept'])
+
+    def test_notes_are_deleted_without_per_note_signals(self):
+        AccountDeletion.objects.create(user=self.user)
+        with mock.patch('memo_board.signals.adjust_note_stats') as adjust, \
+                mock.patch('account.deletion.publish_reset') as reset:
+            with self.captureOnCommitCallbacks(execute=True):
+                process_pending_deletions(batch_size=2)
+        adjust.assert_not_called()
+        self.assertEqual(reset.call_count, 3)  # один раз на пакет заметок
+
+    def test_deletion_locked_by_another_worker_is_skipped(self):
+        AccountDeletion.objects.create(user=self.user)
+        with mock.patch('account.deletion._claim', return_value=False):
+            self.assertEqual(process_pending_deletions(batch_size=2), 0)
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 5)
+        self.assertTrue(User.objects.filter(username='leaving').exists())
+
+    def test_interrupted_deletion_resumes(self):
+        deletion = AccountDeletion.objects.create(user=self.user)
+
+        def interrupt(deletion, deleted):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            process_pending_deletions(batch_size=2, progress=interrupt)
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.deleted_objects, 2)
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 3)
+
+        out = io.StringIO()
+        call_command('process_account_deletions', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn(f'user {self.user.id}: 6 objects deleted', out.getvalue())
+        self.assertIn('Done, 1 accounts deleted', out.getvalue())
+        self.assertFalse(Note.objects.filter(user_id=self.user.id).exists())
+
+    def test_admin_delete_is_deferred(self):
+        admin = User.objects.create_superuser(username='admin', password='adminpass')
+        self.client.force_login(admin)
+        url = reverse('admin:auth_user_delete', args=[self.user.id])
+        self.assertContains(self.client.get(url), 'leaving')
+        self.client.post(url, {'post': 'yes'})
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(AccountDeletion.objects.filter(user=self.user).exists())
+        self.assertEqual(Note.objects.filter(user=self.user).count(), 5)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_login(self.user)
+        self.url = reverse('account')
+
+    def test_authenticated_page_needs_no_auth_queries(self):
+        self.client.get(self.url)
+        with capture_queries() as stats:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'testuser')
+        self.assertEqual(stats.count, 0)
+
+    def test_sessions_of_model_backend_stay_logged_in(self):
+        client = Client()
+        client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertContains(client.get(self.url), 'testuser')
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_user_is_not_cached_without_timeout(self):
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_password_change_invalidates_cached_user(self):
+        self.client.get(self.url)
+        self.user.set_password('newpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        # хеш сессии больше не совпадает с паролем - сессия сброшена
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_profile_save_refreshes_cached_profile(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'username': 'testuser', 'email': 'testuser@example.com',
+                                        'phone_number': '5550100', 'bio': 'Fresh bio'})
+        self.assertContains(self.client.get(self.url), '5550100')
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            request_account_deletion(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
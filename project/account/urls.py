@@ -3,5 +3,6 @@ from . import views
 
 urlpatterns = [
     path('account/', views.account, name='account'),
+    path('account/delete/', views.account_delete, name='account_delete'),
     path('profile/<str:username>/', views.profile, name='profile')
 ]
@@ -1,15 +1,23 @@
+from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from .forms import UserUpdateForm, ProfileUpdateForm
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.core.files import File
-from django.conf import settings
-import os
+from django.db import transaction
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_POST
 
 from django.contrib.auth.models import User
+from .avatars import default_avatar_name, release_avatar
+from .cache import get_profile, profile_validators
+from .deletion import request_account_deletion
 from .models import Profile
+from memo_board.stats import get_note_stats
+from project.query_budget import query_budget
 
 
 @receiver(post_save, sender=User)
@@ -27,14 +35,12 @@ def create_profile(sender: User, instance: User, created: bool, **kwargs) -> Non
         None
     """
     if created:
-        default_img_path = os.path.join(settings.BASE_DIR, 'media', 'account.jpg')
-        with open(default_img_path, 'rb') as f:
-            file = File(f)
-            profile = Profile.objects.create(user=instance)
-            profile.image.save('account.jpg', file)
+        # стандартная аватарка хранится один раз и общая для всех новых профилей
+        Profile.objects.create(user=instance, image=default_avatar_name())
 
 
 @login_required
+@query_budget(8)
 def account(request) -> render:
     """
     Функция просмотра для отображения страницы счета.
@@ -46,11 +52,18 @@ def account(request) -> render:
         HTTP-ответ, содержащий отрисованный шаблон.
     """
     if request.method == 'POST':
+        old_image = request.user.profile.image.name
         u_form = UserUpdateForm(request.POST, instance=request.user)
         p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
         if u_form.is_valid() and p_form.is_valid():
             u_form.save()
+            image_changed = 'image' in p_form.changed_data
+            if image_changed:
+                # копии аватарки построит фоновый обработчик process_avatars
+                p_form.instance.avatar_ready = None
             p_form.save()
+            if image_changed:
+                transaction.on_commit(lambda: release_avatar(old_image))
             messages.success(request, 'Your account has been updated!')
             return redirect('account')
     else:
@@ -63,10 +76,35 @@ def account(request) -> render:
     return render(request, 'account/account.html', context)
 
 
+@login_required
+@require_POST
+def account_delete(request):
+    """
+    Функция просмотра для удаления учетной записи текущего пользователя.
+
+    Пользователь сразу деактивируется и выходит из системы, а его заметки и
+    профиль удаляет фоновый процесс process_account_deletions.
+
+    Args:
+        request: HTTP-запрос.
+
+    Returns:
+        Перенаправление на главную страницу.
+    """
+    request_account_deletion(request.user)
+    logout(request)
+    messages.info(request, 'Your account has been scheduled for deletion.')
+    return redirect('base_views')
+
+
+@query_budget(4)
 def profile(request, username: str) -> render:
     """
     Функция представления для вывода страницы профиля пользователя.
 
+    Профиль берется из кэша, а на повторный запрос с совпадающим ETag или
+    If-Modified-Since возвращается 304 без рендеринга шаблона.
+
     Args:
         request: HTTP-запрос..
         username: Имя пользователя, профиль которого отображается.
@@ -74,6 +112,16 @@ def profile(request, username: str) -> render:
     Returns:
         HTTP-ответ, содержащий отрисованный шаблон.
     """
-    profile = Profile.objects.get(user__username=username)
-    context = {'profile': profile}
-    return render(request, 'account/profile.html', context)
+    profile = get_profile(username)
+    if profile is None:
+        raise Http404('Профиль не найден')
+    stats = get_note_stats(profile.user_id)
+    etag, last_modified = profile_validators(profile, request.user, stats)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        context = {'profile': profile, 'note_stats': stats}
+        response = render(request, 'account/profile.html', context)
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
@@ -1,10 +1,53 @@
 from django.contrib import admin
-from .models import Note
+
+from project.admin import AutocompleteFilter, EstimatedCountPaginator
+from .models import ArchivedNote, Note, NoteStats
 
 
 class NoteAdmin(admin.ModelAdmin):
     list_display: tuple = ('title', 'user')
+    list_select_related: tuple = ('user',)
+    list_filter: tuple = (('user', AutocompleteFilter),)
     list_per_page: int = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+    autocomplete_fields: tuple = ('user',)
 
 
 admin.site.register(Note, NoteAdmin)
+
+
+class ArchivedNoteAdmin(admin.ModelAdmin):
+    list_display: tuple = ('title', 'user', 'archived_at')
+    list_select_related: tuple = ('user',)
+    list_filter: tuple = (('user', AutocompleteFilter),)
+    list_per_page: int = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
+admin.site.register(ArchivedNote, ArchivedNoteAdmin)
+
+
+class NoteStatsAdmin(admin.ModelAdmin):
+    list_display: tuple = ('user', 'note_count', 'last_note_at', 'text_length')
+    list_select_related: tuple = ('user',)
+    list_per_page: int = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+    search_fields: tuple = ('^user__username',)
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+
+admin.site.register(NoteStats, NoteStatsAdmin)
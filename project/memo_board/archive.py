@@ -0,0 +1,89 @@
+"""
+Перенос давно не менявшихся заметок в архивную таблицу.
+
+Заметки, не изменявшиеся дольше заданного срока, переносятся из Note в
+ArchivedNote порциями: каждая порция копируется и удаляется в одной
+транзакции, поэтому прерванный перенос не теряет и не дублирует заметок.
+Список заметок по умолчанию читает только Note, и ее размер определяется
+недавней активностью; архив читается явно (notes_list?archived=1).
+
+Удаление выполняется без сигналов post_delete: вместо события на каждую
+заметку после порции один раз сбрасывается кэш списка и в живую ленту
+отправляется reset. Полнотекстовый поиск по архиву не выполняется.
+
+Архивные заметки сохраняют id, поэтому новые заметки не должны получать id
+из архива. SQLite (AUTOINCREMENT) и InnoDB MySQL 8 не выдают id повторно, а
+reserve_note_ids после каждого переноса дополнительно сдвигает счетчик Note
+выше наибольшего id архива - на случай, если таблица опустела и счетчик был
+пересчитан по оставшимся строкам (старые версии MySQL после перезапуска).
+"""
+from datetime import datetime
+from typing import Iterator
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from project.db.bulk import delete_rows
+
+from .cache import mark_notes_deleted
+from .events import publish_reset
+from .models import ArchivedNote, Note
+
+ARCHIVE_FIELDS = ('id', 'title', 'text', 'created_at', 'updated_at', 'user_id')
+
+
+def archive_notes(older_than: datetime, batch_size: int = 1000) -> Iterator[int]:
+    """
+        Переносит заметки, измененные раньше older_than, в архив.
+
+        Args:
+            older_than: Граница времени последнего изменения.
+            batch_size: Число заметок в одной транзакции.
+
+        Returns:
+            Итератор с числом заметок, перенесенных каждой порцией.
+    """
+    using = router.db_for_write(Note)
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(Note.objects.using(using).select_for_update()
+                        .filter(updated_at__lt=older_than).order_by('id')
+                        .values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            ArchivedNote.objects.using(using).bulk_create([ArchivedNote(**row) for row in rows])
+            delete_rows(Note, [row['id'] for row in rows], using)
+            transaction.on_commit(mark_notes_deleted, using=using)
+            transaction.on_commit(publish_reset, using=using)
+        yield len(rows)
+    reserve_note_ids(using)
+
+
+def reserve_note_ids(using: str) -> None:
+    """
+        Сдвигает счетчик id Note выше наибольшего id архивных заметок.
+
+        Счетчик, уже превышающий наибольший id архива, не меняется.
+    """
+    max_id = ArchivedNote.objects.using(using).aggregate(max_id=Max('id'))['max_id']
+    if max_id is None:
+        return
+    connection = connections[using]
+    table = Note._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            # ALTER TABLE со значением не больше max(id) таблицы сбрасывает счетчик InnoDB до max(id) + 1,
+            # и это может быть меньше текущего счетчика, если удалены самые новые заметки
+            if not connection.mysql_is_mariadb:
+                # иначе information_schema отдает закэшированную статистику таблицы
+                cursor.execute('SET SESSION information_schema_stats_expiry = 0')
+            cursor.execute('SELECT AUTO_INCREMENT FROM information_schema.TABLES '
+                           'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table])
+            row = cursor.fetchone()
+            if row is not None and row[0] is not None and row[0] > max_id:
+                return
+            cursor.execute(f'ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {int(max_id) + 1}')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [max_id, table])
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                           'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)', [table, max_id, table])
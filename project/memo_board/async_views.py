@@ -0,0 +1,191 @@
+"""
+Асинхронные версии представлений заметок для ASGI-развертывания.
+
+Повторяют поведение memo_board.views, но работают с БД через асинхронный
+интерфейс ORM и не занимают поток из пула sync_to_async на время запроса.
+Подключаются через project.async_urls (ASYNC_VIEWS=True).
+"""
+import json
+import time
+from typing import AsyncIterator, Union
+
+from django.conf import settings
+from django.http import (HttpResponseRedirect, HttpResponseForbidden, HttpResponse, HttpRequest, Http404,
+                         StreamingHttpResponse)
+from django.shortcuts import render, reverse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from project.decorators import aget_user, async_login_required
+from project.query_budget import query_budget
+from project.ratelimit import rate_limit
+from .cache import aget_notes_page, aget_notes_state, notes_validators
+from .events import get_broker
+from .forms import NoteForm
+from .models import Note
+from .views import NOTE_WRITE_RATE, notes_list_budget
+
+
+async def _aget_note(item_id: int) -> Note:
+    try:
+        return await Note.objects.aget(id=item_id)
+    except Note.DoesNotExist:
+        raise Http404('Заметка не существует')
+
+
+@async_login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE)
+@query_budget(7)
+async def note_create(request: HttpRequest) -> HttpResponse:
+    """
+        Создает новую заметку.
+
+        Args:
+            request: HttpRequest объект.
+
+        Returns:
+            HttpResponse объект с перенаправлением на список заметок.
+    """
+    if request.method == "POST":
+        form = NoteForm(request.POST)
+        if form.is_valid():
+            note = form.save(commit=False)
+            note.user = request.user
+            await note.asave()
+            return HttpResponseRedirect(reverse('notes_list'))
+    else:
+        form = NoteForm()
+    return render(request, 'memo_board/note_create.html', {'form': form})
+
+
+@async_login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE)
+@query_budget(5)
+async def note_edit(request: HttpRequest, item_id: int) -> Union[HttpResponse, HttpResponseForbidden]:
+    """
+        Редактирует существующую заметку.
+
+        Args:
+            request: HttpRequest объект.
+            item_id: Идентификатор заметки.
+
+        Returns:
+            HttpResponse объект с перенаправлением на список заметок или HttpResponseForbidden,
+            если пользователь не имеет прав на редактирование заметки.
+    """
+    note = await _aget_note(item_id)
+    if not note.can_edit(request.user):
+        return HttpResponseForbidden('Вы не авторизованы для выполнения этого действия')
+    form = NoteForm(request.POST or None, instance=note)
+    if form.is_valid():
+        await form.save(commit=False).asave()
+        return HttpResponseRedirect(reverse('notes_list'))
+    return render(request, 'memo_board/note_edit.html', {'form': form})
+
+
+@async_login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE, methods=None)
+async def note_delete(request: HttpRequest, item_id: int) -> HttpResponse:
+    """
+        Удаляет существующую заметку.
+
+        Args:
+            request: HttpRequest объект.
+            item_id: Идентификатор заметки.
+
+        Returns:
+            HttpResponse объект с перенаправлением на список заметок или HttpResponse объект со статусом 404,
+            если заметка не существует.
+    """
+    try:
+        note = await Note.objects.aget(pk=item_id)
+    except Note.DoesNotExist:
+        return HttpResponse('Заметка не существует', status=404)
+    if not note.can_edit(request.user):
+        return HttpResponseForbidden('Вы не уполномочены выполнять это действие')
+    await note.adelete()
+    return HttpResponseRedirect(reverse('notes_list'))
+
+
+@async_login_required
+@query_budget(notes_list_budget)
+async def notes_list(request: HttpRequest) -> HttpResponse:
+    """
+        Отображает страницу списка заметок; если список не менялся, возвращает 304.
+
+        Args:
+            request: HttpRequest объект.
+
+        Returns:
+            HttpResponse объект с отображением списка заметок.
+    """
+    etag, last_modified = notes_validators(await aget_notes_state(), await aget_user(request))
+    if last_modified is not None:
+        last_modified = int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        archived = request.GET.get('archived') == '1'
+        page = await aget_notes_page(request.GET.get('after'), request.GET.get('before'), archived)
+        context = {'notes_list': page.object_list, 'page': page, 'archived': archived}
+        response = render(request, 'memo_board/notes_list.html', context=context)
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _format_event(event_id, data: dict, user) -> str:
+    if 'html' in data:
+        # кнопки управления в элементе списка зависят от зрителя
+        # события, опубликованные до появления ссылок в карточке, еще могут лежать в буфере брокера
+        card = {'edit_url': reverse('note_edit', args=[data['id']]),
+                'delete_url': reverse('note_delete', args=[data['id']]), **data}
+        item = render_to_string('memo_board/note_item.html', {'card': card, 'user': user})
+        data = {'type': data['type'], 'id': data['id'], 'html': item}
+    lines = [f'id: {event_id}'] if event_id else []
+    lines += [f'event: {data["type"]}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _event_stream(subscription, user) -> AsyncIterator[str]:
+    deadline = time.monotonic() + settings.NOTES_EVENTS_MAX_AGE
+    try:
+        yield f'retry: {settings.NOTES_EVENTS_RETRY * 1000}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = await subscription.get(min(settings.NOTES_EVENTS_HEARTBEAT, remaining))
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            yield _format_event(*event, user)
+            if event[1]['type'] == 'reset':
+                break
+    finally:
+        await subscription.aclose()
+
+
+@async_login_required
+@query_budget(2)
+async def note_events(request: HttpRequest) -> StreamingHttpResponse:
+    """
+        Отдает живую ленту изменений заметок в формате Server-Sent Events.
+
+        Поток закрывается через NOTES_EVENTS_MAX_AGE секунд, после чего
+        EventSource переподключается с заголовком Last-Event-ID и получает
+        пропущенные события. Работает только под ASGI.
+
+        Args:
+            request: HttpRequest объект.
+
+        Returns:
+            StreamingHttpResponse с событиями created, updated, deleted и reset.
+    """
+    user = await aget_user(request)
+    subscription = await get_broker().subscribe(request.headers.get('Last-Event-ID'))
+    response = StreamingHttpResponse(_event_stream(subscription, user), content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,145 @@
+"""
+Пакетное создание, изменение и удаление заметок одним запросом.
+
+Все элементы пакета проверяются правилами NoteForm, права на изменяемые и
+удаляемые заметки проверяются одним запросом с блокировкой строк, а изменения
+применяются в той же транзакции через bulk_create, bulk_update и удаление по
+первичным ключам (project.db.bulk.delete_rows). Число SQL-запросов не
+зависит от числа элементов.
+"""
+from typing import Dict, List
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from project.db.bulk import delete_rows
+
+from .cache import bump_notes_version, mark_notes_deleted
+from .events import publish_note_batch
+from .forms import NoteForm
+from .models import Note
+from .stats import adjust_note_stats, adjust_note_stats_for_created
+
+
+class BatchError(Exception):
+    """Пакет отклонен целиком; errors сопоставляет элементам пакета списки ошибок."""
+
+    def __init__(self, errors: Dict[str, List[str]], status: int = 400) -> None:
+        super().__init__(errors)
+        self.errors = errors
+        self.status = status
+
+
+def _form_errors(form: NoteForm) -> List[str]:
+    return [f'{field}: {message}' for field, messages in form.errors.items() for message in messages]
+
+
+def _validate_id(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def apply_note_batch(user: User, payload) -> Dict[str, object]:
+    """
+        Проверяет и применяет пакет изменений заметок пользователя.
+
+        Args:
+            user: Автор изменений; изменять и удалять можно только его заметки.
+            payload: Разобранный JSON вида {"create": [{"title", "text"}, ...],
+                "update": [{"id", "title", "text"}, ...], "delete": [id, ...]}.
+
+        Returns:
+            Словарь с количеством созданных, измененных и удаленных заметок.
+
+        Raises:
+            BatchError: Если хотя бы один элемент некорректен или недоступен пользователю.
+    """
+    if not isinstance(payload, dict):
+        raise BatchError({'__all__': ['Ожидается JSON-объект']})
+    creates = payload.get('create', [])
+    updates = payload.get('update', [])
+    deletes = payload.get('delete', [])
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        raise BatchError({'__all__': ['Поля create, update и delete должны быть списками']})
+    if len(creates) + len(updates) + len(deletes) > settings.NOTES_BATCH_MAX_SIZE:
+        raise BatchError({'__all__': [f'Не больше {settings.NOTES_BATCH_MAX_SIZE} элементов в пакете']})
+
+    errors: Dict[str, List[str]] = {}
+    new_notes = []
+    for index, item in enumerate(creates):
+        form = NoteForm(data=item if isinstance(item, dict) else {})
+        if form.is_valid():
+            note = form.save(commit=False)
+            note.user = user
+            new_notes.append(note)
+        else:
+            errors[f'create.{index}'] = _form_errors(form)
+
+    changed_notes = []
+    now = timezone.now()
+    for index, item in enumerate(updates):
+        item = item if isinstance(item, dict) else {}
+        form = NoteForm(data=item)
+        if not _validate_id(item.get('id')):
+            errors[f'update.{index}'] = ['id: Ожидается идентификатор заметки']
+        elif not form.is_valid():
+            errors[f'update.{index}'] = _form_errors(form)
+        else:
+            changed_notes.append(Note(id=item['id'], user=user, title=form.cleaned_data['title'],
+                                      text=form.cleaned_data['text'], updated_at=now))
+
+    for index, item in enumerate(deletes):
+        if not _validate_id(item):
+            errors[f'delete.{index}'] = ['Ожидается идентификатор заметки']
+    if errors:
+        raise BatchError(errors)
+
+    update_ids = [note.id for note in changed_notes]
+    target_ids = update_ids + deletes
+    if len(set(target_ids)) != len(target_ids):
+        raise BatchError({'__all__': ['Заметка не может встречаться в пакете дважды']})
+
+    with transaction.atomic():
+        # права проверяются по заблокированным строкам: заметка, которую параллельный
+        # запрос удалил или перенес в архив, не будет учтена как измененная
+        owners = {}
+        text_lengths = {}
+        created_at = {}
+        for note_id, owner_id, text_length, note_created_at in (
+                Note.objects.select_for_update().filter(id__in=target_ids)
+                .values_list('id', 'user_id', Length('text'), 'created_at')):
+            owners[note_id] = owner_id
+            text_lengths[note_id] = text_length
+            created_at[note_id] = note_created_at
+        forbidden = False
+        for action, ids in (('update', update_ids), ('delete', deletes)):
+            for index, note_id in enumerate(ids):
+                if note_id not in owners:
+                    errors[f'{action}.{index}'] = ['Заметка не существует']
+                elif owners[note_id] != user.pk:
+                    errors[f'{action}.{index}'] = ['Вы не уполномочены выполнять это действие']
+                    forbidden = True
+        if errors:
+            raise BatchError(errors, status=403 if forbidden else 404)
+
+        Note.objects.bulk_create(new_notes)
+        for note in changed_notes:
+            # нужно карточке в событии живой ленты
+            note.created_at = created_at[note.id]
+        # bulk_update не вызывает pre_save, поэтому updated_at задается явно
+        updated = Note.objects.bulk_update(changed_notes, ['title', 'text', 'updated_at'])
+        # удаление без сигналов post_delete: их приемники выполняли бы запросы на каждую заметку,
+        # а права на удаляемые строки уже проверены под блокировкой
+        deleted = delete_rows(Note, deletes)
+        # bulk_create, bulk_update и удаление выше не отправляют сигналы: статистика, кэш
+        # и живая лента обновляются здесь один раз на пакет
+        text_delta = sum(len(note.text) - text_lengths[note.id] for note in changed_notes)
+        adjust_note_stats_for_created(new_notes)
+        # длины прочитаны из заблокированных строк, а число удаленных - из результата удаления,
+        # поэтому параллельные изменения не сбивают статистику
+        adjust_note_stats(user.pk, notes=-deleted, text_length=text_delta - sum(text_lengths[i] for i in deletes))
+        transaction.on_commit(mark_notes_deleted if deletes else bump_notes_version)
+        transaction.on_commit(lambda: publish_note_batch(new_notes, changed_notes, deletes))
+    return {'created': len(new_notes), 'updated': updated, 'deleted': deleted}
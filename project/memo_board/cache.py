@@ -0,0 +1,220 @@
+"""
+Кэш отрендеренных страниц списка заметок.
+
+Страницы кэшируются под ключом, включающим счетчик версии. Любое изменение
+заметок увеличивает счетчик (см. memo_board.signals), и старые страницы
+перестают читаться, не требуя поиска и удаления ключей. В кэш попадает
+только не зависящая от зрителя разметка карточек: кнопки редактирования
+и удаления шаблон добавляет сам, сравнивая пользователя с card.user_id.
+
+Для условных GET-запросов под той же версией кэшируется сводка списка
+(число заметок и время последнего изменения), по которой строятся ETag и
+Last-Modified без выборки строк заметок.
+
+Страницы и сводка, построенные в первые DB_REPLICA_STICKINESS секунд после
+изменения, читаются из основной БД: реплика могла еще не получить изменение,
+а устаревшая копия осталась бы в кэше под новой версией.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.http import quote_etag
+
+from project.routers import arecently_written, mark_written, recently_written, use_primary
+
+from .models import ArchivedNote, Note
+from .pagination import KeysetPage, KeysetPaginator, MergedKeysetPaginator
+
+NOTES_VERSION_KEY = 'memo_board:notes:version'
+NOTES_DELETED_AT_KEY = 'memo_board:notes:deleted_at'
+# меняется вместе с полями словарей render_note_cards, чтобы не читать страницы старого формата
+CARDS_FORMAT = 2
+
+
+def get_notes_version() -> int:
+    """
+        Возвращает текущую версию списка заметок.
+
+        Если счетчика нет в кэше (первый запуск или вытеснение), он
+        создается со значением текущего времени в миллисекундах, чтобы не
+        совпасть с версиями, под которыми могли остаться старые страницы.
+    """
+    version = cache.get(NOTES_VERSION_KEY)
+    if version is None:
+        initial = int(time.time() * 1000)
+        cache.add(NOTES_VERSION_KEY, initial, timeout=None)
+        version = cache.get(NOTES_VERSION_KEY, initial)
+    return version
+
+
+async def aget_notes_version() -> int:
+    """Асинхронная версия get_notes_version."""
+    version = await cache.aget(NOTES_VERSION_KEY)
+    if version is None:
+        initial = int(time.time() * 1000)
+        await cache.aadd(NOTES_VERSION_KEY, initial, timeout=None)
+        version = await cache.aget(NOTES_VERSION_KEY, initial)
+    return version
+
+
+def bump_notes_version() -> None:
+    """Увеличивает версию списка заметок, делая закэшированные страницы устаревшими."""
+    mark_written('notes')
+    try:
+        cache.incr(NOTES_VERSION_KEY)
+    except ValueError:
+        cache.add(NOTES_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def mark_notes_deleted() -> None:
+    """
+        Запоминает время удаления заметки и увеличивает версию списка.
+
+        Удаление не меняет max(updated_at), поэтому время последнего удаления
+        учитывается в Last-Modified отдельно.
+    """
+    cache.set(NOTES_DELETED_AT_KEY, time.time(), timeout=None)
+    bump_notes_version()
+
+
+def _state_key(version: int) -> str:
+    return f'memo_board:notes:state:{version}'
+
+
+def _build_state(version: int, aggregate: dict, deleted_at: Optional[float]) -> dict:
+    if deleted_at is None:
+        # время последнего удаления неизвестно (вытеснено из кэша) - считаем, что оно было сейчас
+        deleted_at = time.time()
+        cache.add(NOTES_DELETED_AT_KEY, deleted_at, timeout=None)
+    updated_at = aggregate['updated_at'].timestamp() if aggregate['updated_at'] else 0
+    return {'version': version, 'count': aggregate['count'], 'last_modified': int(max(updated_at, deleted_at))}
+
+
+def get_notes_state() -> dict:
+    """
+        Возвращает сводку списка заметок для текущей версии.
+
+        Returns:
+            Словарь с версией, числом заметок и временем последнего изменения
+            (создания, правки или удаления) в секундах.
+    """
+    version = get_notes_version()
+    state = cache.get(_state_key(version))
+    if state is None:
+        with use_primary(recently_written('notes')):
+            aggregate = Note.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        state = _build_state(version, aggregate, cache.get(NOTES_DELETED_AT_KEY))
+        cache.set(_state_key(version), state, settings.NOTES_CACHE_TIMEOUT)
+    return state
+
+
+async def aget_notes_state() -> dict:
+    """Асинхронная версия get_notes_state."""
+    version = await aget_notes_version()
+    state = await cache.aget(_state_key(version))
+    if state is None:
+        with use_primary(await arecently_written('notes')):
+            aggregate = await Note.objects.aaggregate(count=Count('id'), updated_at=Max('updated_at'))
+        state = _build_state(version, aggregate, await cache.aget(NOTES_DELETED_AT_KEY))
+        await cache.aset(_state_key(version), state, settings.NOTES_CACHE_TIMEOUT)
+    return state
+
+
+def notes_validators(state: dict, viewer) -> Tuple[str, Optional[datetime]]:
+    """
+        Возвращает валидаторы страницы списка заметок для условного GET.
+
+        Версия входит в ETag, потому что карточки меняются и без изменения
+        заметок (например, при смене имени автора), а зритель - потому что от
+        него зависят кнопки управления и навигация. Last-Modified зрителя не
+        учитывает, поэтому аутентифицированным зрителям не отдается: иначе
+        клиент, приславший только If-Modified-Since, после смены
+        пользователя получил бы 304 на страницу с чужими кнопками.
+
+        Args:
+            state: Сводка из get_notes_state.
+            viewer: Пользователь, запросивший страницу.
+
+        Returns:
+            Пара (ETag, время последнего изменения или None для
+            аутентифицированного зрителя).
+    """
+    viewer_key = f'{viewer.pk}:{viewer.get_username()}' if viewer.is_authenticated else '-'
+    raw = f'{state["version"]}:{state["count"]}:{state["last_modified"]}:{viewer_key}'
+    etag = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    if viewer.is_authenticated:
+        return quote_etag(etag), None
+    return quote_etag(etag), datetime.fromtimestamp(state['last_modified'], tz=timezone.utc)
+
+
+def render_note_cards(notes: List[Note]) -> List[dict]:
+    """
+        Рендерит карточки заметок без элементов, зависящих от зрителя.
+
+        Ссылки на изменение и удаление тоже строятся здесь, один раз на
+        карточку в кэше, а не при каждом выводе страницы.
+
+        Args:
+            notes: Заметки с загруженным пользователем.
+
+        Returns:
+            Список словарей с id заметки, id автора, признаком архивной заметки,
+            ссылками на изменение и удаление и HTML карточки.
+    """
+    template = get_template('memo_board/note_card.html')
+    return [{'id': note.id, 'user_id': note.user_id, 'archived': isinstance(note, ArchivedNote),
+             'edit_url': reverse('note_edit', args=[note.id]), 'delete_url': reverse('note_delete', args=[note.id]),
+             'html': template.render({'note': note})} for note in notes]
+
+
+def _page_key(version: int, after: Optional[str], before: Optional[str], archived: bool) -> str:
+    scope = 'all' if archived else 'hot'
+    return f'memo_board:notes:page:{CARDS_FORMAT}:{version}:{scope}:{settings.NOTES_PER_PAGE}:{after or ""}:{before or ""}'
+
+
+def _paginator(archived: bool) -> KeysetPaginator:
+    if archived:
+        return MergedKeysetPaginator([Note.objects.select_related('user'), ArchivedNote.objects.select_related('user')],
+                                     per_page=settings.NOTES_PER_PAGE)
+    return KeysetPaginator(Note.objects.select_related('user'), per_page=settings.NOTES_PER_PAGE)
+
+
+def get_notes_page(after: Optional[str], before: Optional[str], archived: bool = False) -> KeysetPage:
+    """
+        Возвращает страницу карточек заметок из кэша или строит и кэширует ее.
+
+        Args:
+            after: Курсор after из запроса.
+            before: Курсор before из запроса.
+            archived: Включать ли в список архивные заметки (см. memo_board.archive).
+
+        Returns:
+            KeysetPage, object_list которой содержит словари из render_note_cards.
+    """
+    key = _page_key(get_notes_version(), after, before, archived)
+    page = cache.get(key)
+    if page is None:
+        with use_primary(recently_written('notes')):
+            page = _paginator(archived).page(after=after, before=before)
+        page.object_list = render_note_cards(page.object_list)
+        cache.set(key, page, settings.NOTES_CACHE_TIMEOUT)
+    return page
+
+
+async def aget_notes_page(after: Optional[str], before: Optional[str], archived: bool = False) -> KeysetPage:
+    """Асинхронная версия get_notes_page."""
+    key = _page_key(await aget_notes_version(), after, before, archived)
+    page = await cache.aget(key)
+    if page is None:
+        with use_primary(await arecently_written('notes')):
+            page = await _paginator(archived).apage(after=after, before=before)
+        page.object_list = render_note_cards(page.object_list)
+        await cache.aset(key, page, settings.NOTES_CACHE_TIMEOUT)
+    return page
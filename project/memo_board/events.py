@@ -0,0 +1,277 @@
+"""
+Живая лента изменений заметок (Server-Sent Events).
+
+Приемники сигналов memo_board и пакетный API (memo_board.batch) публикуют
+события created, updated и deleted после фиксации транзакции; массовые
+операции обслуживания (архивация, удаление учетных записей), не отправляющие
+сигналы, публикуют reset (клиент перезагружает список). Потоковое представление
+note_events подписывается на брокер и отдает события браузеру.
+
+Брокер выбирается настройкой NOTES_EVENTS_BROKER:
+
+* local - LocalBroker в памяти процесса. Подходит для одного процесса
+  ASGI-сервера: события из других процессов до него не доходят.
+* redis://... - RedisBroker на Redis Streams, общий для всех процессов
+  (нужен пакет redis).
+
+Оба брокера хранят последние NOTES_EVENTS_BUFFER событий, чтобы клиент,
+переподключившийся с заголовком Last-Event-ID, получил пропущенное. Если
+пропущенные события уже вытеснены, клиент получает reset.
+
+Без ASYNC_VIEWS маршрута note_events нет и подписаться на ленту некому,
+поэтому события не строятся и не публикуются.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import render_note_cards
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[Optional[str], dict]
+
+RESET: Event = (None, {'type': 'reset'})
+REDIS_STREAM_KEY = 'memo_board:notes:events'
+
+
+class LocalSubscription:
+    """Подписка на LocalBroker, привязанная к циклу событий подписчика."""
+
+    def __init__(self, broker: 'LocalBroker', loop: asyncio.AbstractEventLoop, maxsize: int) -> None:
+        self._broker = broker
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._overflowed = False
+
+    def push(self, event: Event) -> None:
+        """Передает событие подписчику; может вызываться из любого потока."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # цикл событий подписчика уже закрыт
+            self._broker.unsubscribe(self)
+
+    def _put(self, event: Event) -> None:
+        if self._overflowed:
+            return
+        if self._queue.full():
+            # подписчик не успевает читать - вместо потерянных событий он получит reset
+            self._overflowed = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            event = RESET
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """
+        Ждет следующее событие.
+
+        Args:
+            timeout: Максимальное время ожидания в секундах.
+
+        Returns:
+            Пара (id события, данные) или None, если за timeout событий не было.
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Брокер событий в памяти процесса с буфером последних событий."""
+
+    def __init__(self, buffer_size: int) -> None:
+        self.buffer_size = buffer_size
+        # id событий уникальны для запуска процесса, чтобы Last-Event-ID
+        # от другого процесса или до перезапуска не принимался за свой
+        self._epoch = str(int(time.time() * 1000))
+        self._next_seq = 1
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: Set[LocalSubscription] = set()
+        self._lock = threading.Lock()
+
+    def publish(self, data: dict) -> str:
+        """
+        Публикует событие всем подписчикам.
+
+        Args:
+            data: Данные события (сериализуемые в JSON).
+
+        Returns:
+            Идентификатор события.
+        """
+        with self._lock:
+            event = (f'{self._epoch}-{self._next_seq}', data)
+            self._next_seq += 1
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event[0]
+
+    def _missed(self, last_event_id: str) -> list:
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self._epoch or not seq.isdigit() or int(seq) >= self._next_seq:
+            return [RESET]
+        seq = int(seq)
+        first_seq = self._next_seq - len(self._buffer)
+        if seq < first_seq - 1:
+            return [RESET]
+        return list(self._buffer)[seq - first_seq + 1:]
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> LocalSubscription:
+        """
+        Подписывается на события.
+
+        Args:
+            last_event_id: Id последнего полученного клиентом события; события
+                после него будут отправлены первыми.
+
+        Returns:
+            Подписка, из которой читаются события.
+        """
+        subscription = LocalSubscription(self, asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            # пропущенные события кладутся в очередь под блокировкой, до новых
+            for event in self._missed(last_event_id) if last_event_id else []:
+                subscription._put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LocalSubscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+def _stream_id(value: str) -> Tuple[int, int]:
+    ms, _, seq = value.partition('-')
+    return int(ms), int(seq or 0)
+
+
+class RedisSubscription:
+    """Подписка на RedisBroker: чтение Redis Stream начиная с last_id."""
+
+    def __init__(self, client, last_id: str, pending: list) -> None:
+        self._client = client
+        self._last_id = last_id
+        self._pending = pending
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        if not self._pending:
+            response = await self._client.xread({REDIS_STREAM_KEY: self._last_id}, count=100,
+                                                block=max(int(timeout * 1000), 1))
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    self._pending.append((entry_id.decode(), json.loads(fields[b'data'])))
+        if not self._pending:
+            return None
+        event = self._pending.pop(0)
+        if event[0] is not None:
+            self._last_id = event[0]
+        return event
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class RedisBroker:
+    """Брокер событий на Redis Streams, общий для всех процессов."""
+
+    def __init__(self, url: str, buffer_size: int) -> None:
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('NOTES_EVENTS_BROKER=redis://... requires the redis package')
+        self._url = url
+        self._buffer_size = buffer_size
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, data: dict) -> str:
+        event_id = self._client.xadd(REDIS_STREAM_KEY, {'data': json.dumps(data)},
+                                     maxlen=self._buffer_size, approximate=True)
+        return event_id.decode()
+
+    async def subscribe(self, last_event_id: Optional[str] = None) -> RedisSubscription:
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self._url)
+        if not last_event_id:
+            return RedisSubscription(client, '$', [])
+        first = await client.xrange(REDIS_STREAM_KEY, count=1)
+        try:
+            missed = first and _stream_id(last_event_id) < _stream_id(first[0][0].decode())
+        except ValueError:
+            missed = True
+        if missed:
+            return RedisSubscription(client, '$', [RESET])
+        return RedisSubscription(client, last_event_id, [])
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Возвращает брокер событий, заданный NOTES_EVENTS_BROKER (один на процесс)."""
+    if settings.NOTES_EVENTS_BROKER == 'local':
+        return LocalBroker(settings.NOTES_EVENTS_BUFFER)
+    return RedisBroker(settings.NOTES_EVENTS_BROKER, settings.NOTES_EVENTS_BUFFER)
+
+
+def _publish(data: dict) -> None:
+    if not settings.ASYNC_VIEWS:
+        return
+    # лента - дополнительная возможность: недоступный брокер не должен ломать сохранение заметок
+    try:
+        get_broker().publish(data)
+    except Exception:
+        logger.exception('Failed to publish note event %s', data.get('type'))
+
+
+def publish_note_saved(note, created: bool) -> None:
+    """Публикует событие о созданной или измененной заметке с HTML ее карточки."""
+    card = render_note_cards([note])[0]
+    _publish({'type': 'created' if created else 'updated', **card})
+
+
+def publish_note_deleted(note_id: int) -> None:
+    _publish({'type': 'deleted', 'id': note_id})
+
+
+def publish_note_batch(created: List, updated: List, deleted_ids: List[int]) -> None:
+    """
+        Публикует события о заметках, измененных одним пакетом.
+
+        Карточки всех созданных и измененных заметок рендерятся за один вызов.
+        Если id созданных заметок неизвестны (bulk_create в MySQL их не
+        возвращает), вместо событий публикуется reset.
+
+        Args:
+            created: Созданные заметки с загруженным пользователем.
+            updated: Измененные заметки с загруженным пользователем и created_at.
+            deleted_ids: Id удаленных заметок.
+    """
+    if not settings.ASYNC_VIEWS:
+        return
+    if any(note.pk is None for note in created):
+        publish_reset()
+        return
+    types = ['created'] * len(created) + ['updated'] * len(updated)
+    for event_type, card in zip(types, render_note_cards(created + updated)):
+        _publish({'type': event_type, **card})
+    for note_id in deleted_ids:
+        publish_note_deleted(note_id)
+
+
+def publish_reset() -> None:
+    """Сообщает клиентам, что список изменился без отдельных событий и его нужно перезагрузить."""
+    _publish(RESET[1])
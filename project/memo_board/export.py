@@ -0,0 +1,90 @@
+"""
+Потоковая выгрузка заметок пользователя в CSV и NDJSON.
+
+Строки читаются порциями через values_list, без создания экземпляров
+моделей. Каждая порция выбирается отдельным запросом по условию id > last_id,
+поэтому память остается постоянной и на MySQL, драйвер которого буферизует
+весь результат одного запроса на клиенте.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .models import ArchivedNote, Note
+
+EXPORT_FIELDS = ('id', 'title', 'text', 'created_at')
+
+
+def iter_note_rows(user: User, since: Optional[datetime] = None, archived: bool = False) -> Iterator[Tuple]:
+    """
+        Перебирает заметки пользователя в порядке id порциями по NOTES_EXPORT_CHUNK_SIZE.
+
+        Args:
+            user: Владелец заметок.
+            since: Если задано, выгружаются только заметки, созданные не раньше этого момента.
+            archived: Выгрузить после заметок и архивные заметки пользователя.
+
+        Returns:
+            Итератор кортежей (id, title, text, created_at).
+    """
+    yield from _iter_rows(Note.objects.filter(user=user), since)
+    if archived:
+        yield from _iter_rows(ArchivedNote.objects.filter(user=user), since)
+
+
+def _iter_rows(queryset, since: Optional[datetime]) -> Iterator[Tuple]:
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    chunk_size = settings.NOTES_EXPORT_CHUNK_SIZE
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*EXPORT_FIELDS)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def _chunks(rows: Iterator[Tuple]) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == settings.NOTES_EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows: Iterator[Tuple]) -> Iterator[str]:
+    """Отдает CSV с заголовком, одной строкой-фрагментом на порцию заметок."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for chunk in _chunks(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((pk, title, text, created_at.isoformat()) for pk, title, text, created_at in chunk)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(rows: Iterator[Tuple]) -> Iterator[str]:
+    """Отдает NDJSON: по одному JSON-объекту на строку."""
+    for chunk in _chunks(rows):
+        yield ''.join(
+            json.dumps({'id': pk, 'title': title, 'text': text, 'created_at': created_at.isoformat()},
+                       ensure_ascii=False) + '\n'
+            for pk, title, text, created_at in chunk
+        )
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
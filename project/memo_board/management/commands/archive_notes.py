@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from memo_board.archive import archive_notes
+
+
+class Command(BaseCommand):
+    help = ('Переносит заметки, не изменявшиеся дольше --older-than дней, в архивную таблицу пакетами '
+            'в коротких транзакциях. Прерванный перенос можно безопасно запустить повторно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, help='Срок в днях с последнего изменения')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Заметок в одной транзакции')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--older-than must be non-negative and --batch-size positive')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        total = 0
+        for archived in archive_notes(cutoff, options['batch_size']):
+            total += archived
+            self.stdout.write(f'{total} notes archived')
+        self.stdout.write(self.style.SUCCESS(f'Done, {total} notes archived'))
@@ -0,0 +1,109 @@
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import override_settings
+from django.urls import reverse
+
+from memo_board.models import Note
+from memo_board.pagination import encode_cursor
+from project.benchmark import Scenario, compare_results, run_scenario
+
+SCENARIOS = ('notes_list', 'profile', 'note_create')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет представления внутри процесса параллельными тестовыми клиентами и выводит JSON '
+            'с перцентилями времени ответа, числом SQL-запросов на запрос и пропускной способностью. '
+            'Данные для замера создает manage.py seed. Сценарий note_create добавляет заметки в базу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Сценарий (можно несколько; по умолчанию все)')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов в каждом сценарии')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных клиентов')
+        parser.add_argument('--prefix', default='seed', help='Префикс имен пользователей из manage.py seed')
+        parser.add_argument('--sample', type=int, default=200, help='Сколько пользователей и заметок взять для запросов')
+        parser.add_argument('--output', help='Файл для JSON с результатами (по умолчанию стандартный вывод)')
+        parser.add_argument('--compare', help='JSON предыдущего замера; изменения попадут в поле comparison')
+        parser.add_argument('--random-seed', type=int, default=0, help='Начальное значение генератора')
+        parser.add_argument('--rate-limits', action='store_true',
+                            help='Не отключать ограничения частоты запросов (каждый клиент - один пользователь)')
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--requests and --concurrency must be positive')
+        users = list(User.objects.filter(username__startswith=options['prefix'], is_active=True)
+                     .order_by('id')[:options['sample']])
+        if not users:
+            raise CommandError(f'No users named {options["prefix"]}<n>; run manage.py seed first')
+        rng = random.Random(options['random_seed'])
+        cursors = [None] + self._sample_cursors(rng, options['sample'])
+        usernames = [user.username for user in users]
+        list_url, create_url = reverse('notes_list'), reverse('note_create')
+
+        # параметры запроса зависят только от его номера, поэтому прогоны с одним --random-seed повторяемы
+        picks = [rng.random() for _ in range(options['requests'])]
+
+        def notes_list(client, n):
+            cursor = cursors[int(picks[n] * len(cursors))]
+            return client.get(list_url, {'after': cursor} if cursor else {})
+
+        def profile(client, n):
+            return client.get(reverse('profile', args=[usernames[int(picks[n] * len(usernames))]]))
+
+        def note_create(client, n):
+            return client.post(create_url, {'title': f'Benchmark {n}', 'text': 'text'})
+
+        scenarios = {'notes_list': notes_list, 'profile': profile, 'note_create': note_create}
+
+        host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            with override_settings(RATELIMIT_ENABLED=settings.RATELIMIT_ENABLED and options['rate_limits']):
+                results[name] = run_scenario(Scenario(name, scenarios[name], users), options['requests'],
+                                             options['concurrency'], host=host)
+            self.stderr.write(f'{name}: p50 {results[name]["latency_ms"]["p50"]} ms, '
+                              f'p95 {results[name]["latency_ms"]["p95"]} ms, '
+                              f'{results[name]["throughput_rps"]} rps, {results[name]["errors"]} errors')
+
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'debug': settings.DEBUG,
+                'rate_limits': settings.RATELIMIT_ENABLED and options['rate_limits'],
+            },
+            'dataset': {'users': User.objects.count(), 'notes': Note.objects.count()},
+            'scenarios': results,
+        }
+        if options['compare']:
+            with open(options['compare']) as f:
+                report['comparison'] = compare_results(json.load(f).get('scenarios', {}), results)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def _sample_cursors(rng: random.Random, sample: int) -> list:
+        # случайные заметки ищутся по диапазону id: ORDER BY RAND() просматривал бы всю таблицу
+        bounds = Note.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return []
+        cursors = []
+        for _ in range(sample):
+            note = (Note.objects.filter(id__gte=rng.randint(bounds['low'], bounds['high']))
+                    .only('id', 'created_at').order_by('id').first())
+            cursors.append(encode_cursor(note))
+        return cursors
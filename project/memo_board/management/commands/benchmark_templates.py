@@ -0,0 +1,99 @@
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from project.benchmark import percentile
+
+TEMPLATE = 'memo_board/notes_list.html'
+DJANGO_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+
+class _Page:
+    """Страница без соседних страниц: ссылки пагинации не выводятся."""
+
+    has_previous = has_next = False
+
+
+def _django_engine(cached: bool) -> DjangoTemplates:
+    loaders = [('django.template.loaders.cached.Loader', DJANGO_LOADERS)] if cached else DJANGO_LOADERS
+    return DjangoTemplates({
+        'NAME': 'benchmark_cached' if cached else 'benchmark_uncached',
+        'DIRS': [os.path.join(settings.BASE_DIR, 'templates')],
+        'APP_DIRS': False,
+        'OPTIONS': {'loaders': loaders, 'context_processors': settings.TEMPLATE_CONTEXT_PROCESSORS},
+    })
+
+
+def _jinja2_engine():
+    from django.template.backends.jinja2 import Jinja2
+
+    return Jinja2({
+        'NAME': 'benchmark_jinja2',
+        'DIRS': [os.path.join(settings.BASE_DIR, 'templates', 'jinja2')],
+        'APP_DIRS': False,
+        'OPTIONS': {'environment': 'project.jinja2.environment',
+                    'context_processors': settings.TEMPLATE_CONTEXT_PROCESSORS},
+    })
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендеринг страницы списка заметок с заданным числом карточек: шаблонами Django без '
+            'кэша скомпилированных шаблонов, с кэширующим загрузчиком и Jinja2. '
+            'Выводит JSON со временем рендеринга страницы и одной карточки. База данных не используется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=20, help='Карточек на странице')
+        parser.add_argument('--repeat', type=int, default=200, help='Рендерингов каждым движком')
+
+    def handle(self, *args, **options):
+        if options['cards'] <= 0 or options['repeat'] <= 0:
+            raise CommandError('--cards and --repeat must be positive')
+        request = RequestFactory().get(reverse('notes_list'))
+        request.user = AnonymousUser()
+        context = {'notes_list': self._cards(options['cards']), 'page': _Page(), 'archived': False}
+
+        engines = {'django': _django_engine(cached=False), 'django_cached': _django_engine(cached=True),
+                   'jinja2': _jinja2_engine()}
+
+        results = {}
+        for name, engine in engines.items():
+            results[name] = self._measure(lambda: engine.get_template(TEMPLATE).render(context, request),
+                                          options['repeat'], options['cards'])
+            self.stderr.write(f'{name}: p50 {results[name]["render_ms"]["p50"]} ms, '
+                              f'{results[name]["per_card_us"]} us per card')
+        self.stdout.write(json.dumps({'template': TEMPLATE, 'cards': options['cards'],
+                                      'repeat': options['repeat'], 'engines': results}, indent=2))
+
+    @staticmethod
+    def _cards(count: int) -> list:
+        # карточки как в кэше страниц: HTML заметки уже готов, ссылки построены заранее
+        return [{'id': n, 'user_id': n, 'archived': False,
+                 'edit_url': reverse('note_edit', args=[n]), 'delete_url': reverse('note_delete', args=[n]),
+                 'html': mark_safe(f'<div class="card"><h5>Заметка {n}</h5><p>Текст заметки {n}</p></div>')}
+                for n in range(1, count + 1)]
+
+    @staticmethod
+    def _measure(render: Callable[[], str], repeat: int, cards: int) -> Dict[str, object]:
+        render()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - start)
+        mean = statistics.fmean(timings)
+        timings.sort()
+        return {
+            'render_ms': {'mean': round(mean * 1000, 3), 'p50': round(percentile(timings, 50) * 1000, 3),
+                          'p95': round(percentile(timings, 95) * 1000, 3)},
+            'per_card_us': round(mean / cards * 1_000_000, 2),
+        }
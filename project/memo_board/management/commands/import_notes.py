@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from memo_board.cache import bump_notes_version
+from memo_board.events import publish_reset
+from memo_board.models import Note
+from memo_board.stats import adjust_note_stats_for_created
+
+TITLE_MAX_LENGTH = Note._meta.get_field('title').max_length
+TEXT_MAX_LENGTH = Note._meta.get_field('text').max_length
+
+
+class UserIdCache:
+    """Кэш соответствия имен пользователей их id с пакетной дозагрузкой."""
+
+    def __init__(self, max_size: int = 100_000) -> None:
+        self.max_size = max_size
+        self._ids: Dict[str, Optional[int]] = {}
+
+    def resolve(self, usernames: List[str]) -> Dict[str, Optional[int]]:
+        missing = {name for name in usernames if name not in self._ids}
+        if missing:
+            if len(self._ids) + len(missing) > self.max_size:
+                self._ids.clear()
+            found = dict(User.objects.filter(username__in=missing).values_list('username', 'id'))
+            for name in missing:
+                self._ids[name] = found.get(name)
+        return {name: self._ids[name] for name in usernames}
+
+
+class Command(BaseCommand):
+    help = ('Импортирует заметки из CSV (колонки username,title,text) или NDJSON пакетами bulk_create. '
+            'После каждого пакета записывается контрольная точка, с которой можно продолжить после сбоя '
+            '(--resume). Пакет, зафиксированный перед самым сбоем, может быть импортирован повторно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с заметками или "-" для стандартного ввода')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Заметок в одной транзакции')
+        parser.add_argument('--checkpoint', help='Файл контрольной точки (по умолчанию <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true', help='Продолжить с контрольной точки')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        checkpoint = options['checkpoint'] or (None if path == '-' else f'{path}.checkpoint')
+        if options['resume'] and not checkpoint:
+            raise CommandError('--resume требует --checkpoint при чтении из стандартного ввода')
+
+        state = {'records': 0, 'imported': 0, 'skipped': 0}
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                state = json.load(f)
+            self.stdout.write(f'Resuming after {state["records"]} records')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            self._import(self._read(stream, fmt), state, batch_size, checkpoint)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    @staticmethod
+    def _read(stream, fmt: str) -> Iterator[dict]:
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record if isinstance(record, dict) else {}
+
+    def _import(self, records: Iterator[dict], state: dict, batch_size: int, checkpoint: Optional[str]) -> None:
+        users = UserIdCache()
+        skip = state['records']
+        started = time.monotonic()
+        imported_at_start = state['imported']
+        batch: List[dict] = []
+        for position, record in enumerate(records):
+            if position < skip:
+                continue
+            batch.append(record)
+            if len(batch) == batch_size:
+                self._flush(batch, users, state, checkpoint, started, imported_at_start)
+                batch = []
+        if batch:
+            self._flush(batch, users, state, checkpoint, started, imported_at_start)
+        bump_notes_version()
+        publish_reset()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {state["imported"]} notes, skipped {state["skipped"]} invalid records'))
+
+    def _flush(self, batch: List[dict], users: UserIdCache, state: dict, checkpoint: Optional[str],
+               started: float, imported_at_start: int) -> None:
+        user_ids = users.resolve([str(record.get('username') or '') for record in batch])
+        notes = []
+        for record in batch:
+            note = self._build_note(record, user_ids)
+            if note is None:
+                state['skipped'] += 1
+            else:
+                notes.append(note)
+        with transaction.atomic():
+            Note.objects.bulk_create(notes)
+            adjust_note_stats_for_created(notes)
+        state['records'] += len(batch)
+        state['imported'] += len(notes)
+        if checkpoint:
+            tmp_path = f'{checkpoint}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, checkpoint)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rate = (state['imported'] - imported_at_start) / elapsed
+        self.stdout.write(f'{state["records"]} records read, {state["imported"]} imported, {rate:.0f} rows/s')
+
+    @staticmethod
+    def _build_note(record: dict, user_ids: Dict[str, Optional[int]]) -> Optional[Note]:
+        user_id = user_ids.get(str(record.get('username') or ''))
+        title = str(record.get('title') or '').strip()
+        text = str(record.get('text') or '').strip()
+        if user_id is None or not title or not text:
+            return None
+        if len(title) > TITLE_MAX_LENGTH or len(text) > TEXT_MAX_LENGTH:
+            return None
+        return Note(user_id=user_id, title=title, text=text)
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from memo_board.stats import reconcile_note_stats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает статистику заметок (NoteStats) всех пользователей пакетами и исправляет '
+            'расхождения с заметками. Каждый пакет проверяется в отдельной короткой транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Пользователей в одной транзакции')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            user_ids = list(User.objects.filter(id__gt=last_id).order_by('id')
+                            .values_list('id', flat=True)[:options['batch_size']])
+            if not user_ids:
+                break
+            repaired += reconcile_note_stats(user_ids)
+            checked += len(user_ids)
+            last_id = user_ids[-1]
+            self.stdout.write(f'{checked} users checked, {repaired} repaired')
+        self.stdout.write(self.style.SUCCESS(f'Done, {checked} users checked, {repaired} repaired'))
@@ -0,0 +1,112 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Dict, Iterator, List
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from account.avatars import default_avatar_name
+from account.models import Profile
+from memo_board.cache import bump_notes_version
+from memo_board.events import publish_reset
+from memo_board.models import Note, NoteStats
+
+WORDS = ('заметка', 'план', 'встреча', 'список', 'покупки', 'идея', 'проект', 'отчет', 'звонок', 'задача',
+         'note', 'meeting', 'draft', 'todo', 'review', 'release', 'budget', 'travel', 'book', 'call')
+
+
+@contextmanager
+def explicit_timestamps(*fields) -> Iterator[None]:
+    """Отключает auto_now и auto_now_add у полей, чтобы bulk_create сохранил заданные значения."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, профилями и заметками для нагрузочных тестов '
+            '(manage.py benchmark). Все строки создаются bulk_create пакетами; приемники сигналов '
+            '(в том числе create_profile) не вызываются, статистика заметок заполняется сразу. '
+            'Пользователи получают имена <prefix><n> и общий пароль.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Сколько пользователей создать')
+        parser.add_argument('--notes', type=int, default=100_000, help='Сколько заметок создать')
+        parser.add_argument('--days', type=int, default=365, help='За сколько последних дней распределить заметки')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Строк в одном INSERT')
+        parser.add_argument('--prefix', default='seed', help='Префикс имен пользователей')
+        parser.add_argument('--password', default='seed-password', help='Пароль всех созданных пользователей')
+        parser.add_argument('--random-seed', type=int, default=0, help='Начальное значение генератора')
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['notes'] < 0 or options['days'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--users, --days and --batch-size must be positive, --notes non-negative')
+        rng = random.Random(options['random_seed'])
+        started = time.monotonic()
+        user_ids = self._create_users(options)
+        self.stdout.write(f'{len(user_ids)} users and profiles created')
+        stats = self._create_notes(rng, user_ids, options)
+        NoteStats.objects.bulk_create(stats.values(), batch_size=options['batch_size'])
+        bump_notes_version()
+        publish_reset()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users and {options["notes"]} notes in {time.monotonic() - started:.1f} s'))
+
+    def _create_users(self, options) -> List[int]:
+        prefix = options['prefix']
+        start = User.objects.filter(username__startswith=prefix).count()
+        # хеш пароля вычисляется один раз: это самая медленная часть создания пользователя
+        password = make_password(options['password'])
+        image = default_avatar_name()
+        avatar_ready = Profile.objects.filter(image=image, avatar_ready=True).exists() or None
+        usernames = [f'{prefix}{n}' for n in range(start, start + options['users'])]
+        user_ids = []
+        for offset in range(0, len(usernames), options['batch_size']):
+            chunk = usernames[offset:offset + options['batch_size']]
+            if User.objects.filter(username__in=chunk).exists():
+                raise CommandError(f'Users named {prefix}<n> already exist; choose another --prefix')
+            with transaction.atomic():
+                User.objects.bulk_create([User(username=name, password=password) for name in chunk])
+                # bulk_create не на всех СУБД возвращает id, поэтому они читаются по именам
+                ids = list(User.objects.filter(username__in=chunk).values_list('id', flat=True))
+                Profile.objects.bulk_create([Profile(user_id=user_id, image=image, avatar_ready=avatar_ready)
+                                             for user_id in ids])
+            user_ids.extend(ids)
+        return user_ids
+
+    def _create_notes(self, rng: random.Random, user_ids: List[int], options) -> Dict[int, NoteStats]:
+        stats: Dict[int, NoteStats] = {}
+        now = timezone.now()
+        span = options['days'] * 86400
+        created_at_field = Note._meta.get_field('created_at')
+        updated_at_field = Note._meta.get_field('updated_at')
+        remaining = options['notes']
+        with explicit_timestamps(created_at_field, updated_at_field):
+            while remaining > 0:
+                notes = []
+                for _ in range(min(remaining, options['batch_size'])):
+                    user_id = rng.choice(user_ids)
+                    created_at = now - timedelta(seconds=rng.randrange(span))
+                    note = Note(user_id=user_id, title=' '.join(rng.choices(WORDS, k=3))[:50],
+                                text=' '.join(rng.choices(WORDS, k=rng.randint(3, 30)))[:250],
+                                created_at=created_at, updated_at=created_at)
+                    notes.append(note)
+                    item = stats.setdefault(user_id, NoteStats(user_id=user_id))
+                    item.note_count += 1
+                    item.text_length += len(note.text)
+                    if item.last_note_at is None or created_at > item.last_note_at:
+                        item.last_note_at = created_at
+                Note.objects.bulk_create(notes)
+                remaining -= len(notes)
+                self.stdout.write(f'{options["notes"] - remaining} notes created')
+        return stats
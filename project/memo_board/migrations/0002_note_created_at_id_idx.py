@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memo_board", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["created_at", "id"], name="note_created_at_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+MYSQL_FORWARD = [
+    "ALTER TABLE memo_board_note ADD FULLTEXT INDEX note_title_text_ft (title, text)",
+]
+MYSQL_BACKWARD = [
+    "ALTER TABLE memo_board_note DROP INDEX note_title_text_ft",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE memo_board_note_fts USING fts5("
+    "title, text, content='memo_board_note', content_rowid='id')",
+    "INSERT INTO memo_board_note_fts(memo_board_note_fts) VALUES ('rebuild')",
+    "CREATE TRIGGER memo_board_note_fts_ai AFTER INSERT ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    "END",
+    "CREATE TRIGGER memo_board_note_fts_ad AFTER DELETE ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(memo_board_note_fts, rowid, title, text) "
+    "VALUES ('delete', old.id, old.title, old.text); "
+    "END",
+    "CREATE TRIGGER memo_board_note_fts_au AFTER UPDATE ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(memo_board_note_fts, rowid, title, text) "
+    "VALUES ('delete', old.id, old.title, old.text); "
+    "INSERT INTO memo_board_note_fts(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    "END",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_au",
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_ad",
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_ai",
+    "DROP TABLE IF EXISTS memo_board_note_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memo_board", "0002_note_created_at_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"mysql": MYSQL_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"mysql": MYSQL_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
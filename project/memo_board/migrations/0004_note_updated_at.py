@@ -0,0 +1,59 @@
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+# SQLite добавляет NOT NULL-столбец пересозданием таблицы, при котором
+# удаляются триггеры полнотекстового индекса из 0003; они создаются заново.
+SQLITE_FTS_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_ai",
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_ad",
+    "DROP TRIGGER IF EXISTS memo_board_note_fts_au",
+    "CREATE TRIGGER memo_board_note_fts_ai AFTER INSERT ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    "END",
+    "CREATE TRIGGER memo_board_note_fts_ad AFTER DELETE ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(memo_board_note_fts, rowid, title, text) "
+    "VALUES ('delete', old.id, old.title, old.text); "
+    "END",
+    "CREATE TRIGGER memo_board_note_fts_au AFTER UPDATE ON memo_board_note BEGIN "
+    "INSERT INTO memo_board_note_fts(memo_board_note_fts, rowid, title, text) "
+    "VALUES ('delete', old.id, old.title, old.text); "
+    "INSERT INTO memo_board_note_fts(rowid, title, text) VALUES (new.id, new.title, new.text); "
+    "END",
+]
+
+
+def restore_fts_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_FTS_TRIGGERS:
+            schema_editor.execute(sql)
+
+
+def copy_created_at(apps, schema_editor):
+    Note = apps.get_model("memo_board", "Note")
+    Note.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memo_board", "0003_note_fulltext_search"),
+    ]
+
+    operations = [
+        # при откате удаление столбца тоже пересоздает таблицу
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name="note",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name="Время изменения",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
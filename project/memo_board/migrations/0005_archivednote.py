@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("memo_board", "0004_note_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedNote",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "title",
+                    models.CharField(
+                        max_length=50, verbose_name="Наименование заметки"
+                    ),
+                ),
+                ("text", models.TextField(max_length=250, verbose_name="Заметка")),
+                ("created_at", models.DateTimeField(verbose_name="Время создания")),
+                ("updated_at", models.DateTimeField(verbose_name="Время изменения")),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время архивации"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_notes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архивная заметка",
+                "verbose_name_plural": "Архивные заметки",
+                "indexes": [
+                    models.Index(
+                        fields=["created_at", "id"], name="archived_note_created_id_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.16 on 2026-10-18 18:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Length
+
+
+def fill_note_stats(apps, schema_editor):
+    NoteStats = apps.get_model("memo_board", "NoteStats")
+    stats = {}
+    for model_name in ("Note", "ArchivedNote"):
+        rows = (apps.get_model("memo_board", model_name).objects.values("user_id")
+                .annotate(count=Count("id"), text_length=Sum(Length("text")), last_note_at=Max("created_at"))
+                .order_by())
+        for row in rows.iterator():
+            item = stats.setdefault(row["user_id"], NoteStats(user_id=row["user_id"]))
+            item.note_count += row["count"]
+            item.text_length += row["text_length"] or 0
+            if item.last_note_at is None or row["last_note_at"] > item.last_note_at:
+                item.last_note_at = row["last_note_at"]
+    NoteStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("memo_board", "0005_archivednote"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NoteStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="note_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "note_count",
+                    models.IntegerField(default=0, verbose_name="Число заметок"),
+                ),
+                (
+                    "last_note_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Время последней заметки"
+                    ),
+                ),
+                (
+                    "text_length",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Общая длина текста"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Время изменения"),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика заметок",
+                "verbose_name_plural": "Статистика заметок",
+            },
+        ),
+        migrations.RunPython(fill_note_stats, migrations.RunPython.noop),
+    ]
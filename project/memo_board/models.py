@@ -6,10 +6,19 @@ class Note(models.Model):
     title: models.CharField = models.CharField(max_length=50, verbose_name='Наименование заметки')
     text: models.TextField = models.TextField(max_length=250, verbose_name='Заметка')
     created_at: models.DateTimeField = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Время изменения')
     user: models.ForeignKey = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # длина загруженного текста нужна для поправки NoteStats.text_length при сохранении
+        if 'text' in field_names:
+            instance._saved_text_length = len(instance.text)
+        return instance
+
     def can_edit(self, user: User) -> bool:
-        return user == self.user
+        return user.is_authenticated and user.pk == self.user_id
 
     def __str__(self) -> str:
         return self.title
@@ -17,3 +26,61 @@ class Note(models.Model):
     class Meta:
         verbose_name: str = 'Заметка'
         verbose_name_plural: str = 'Заметки'
+        indexes: list = [
+            models.Index(fields=['created_at', 'id'], name='note_created_at_id_idx'),
+        ]
+
+
+class ArchivedNote(models.Model):
+    """
+    Заметка, перенесенная из Note командой archive_notes.
+
+    Сохраняет id, время создания и изменения исходной заметки, поэтому
+    курсоры пагинации и ссылки по id остаются общими для обеих таблиц.
+    Архивные заметки только читаются.
+    """
+    id: models.BigIntegerField = models.BigIntegerField(primary_key=True)
+    title: models.CharField = models.CharField(max_length=50, verbose_name='Наименование заметки')
+    text: models.TextField = models.TextField(max_length=250, verbose_name='Заметка')
+    created_at: models.DateTimeField = models.DateTimeField(verbose_name='Время создания')
+    updated_at: models.DateTimeField = models.DateTimeField(verbose_name='Время изменения')
+    archived_at: models.DateTimeField = models.DateTimeField(auto_now_add=True, verbose_name='Время архивации')
+    user: models.ForeignKey = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notes')
+
+    def can_edit(self, user: User) -> bool:
+        return False
+
+    def __str__(self) -> str:
+        return self.title
+
+    class Meta:
+        verbose_name: str = 'Архивная заметка'
+        verbose_name_plural: str = 'Архивные заметки'
+        indexes: list = [
+            models.Index(fields=['created_at', 'id'], name='archived_note_created_id_idx'),
+        ]
+
+
+class NoteStats(models.Model):
+    """
+    Статистика заметок пользователя, поддерживаемая инкрементально.
+
+    Учитывает и архивные заметки. Обновляется выражениями F() в той же
+    транзакции, что и изменение заметок (см. memo_board.stats), расхождения
+    исправляет команда reconcile_note_stats.
+    """
+    user: models.OneToOneField = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                                      related_name='note_stats')
+    # знаковые поля: временное расхождение не должно ломать удаление заметок ошибкой ограничения
+    note_count: models.IntegerField = models.IntegerField(default=0, verbose_name='Число заметок')
+    last_note_at: models.DateTimeField = models.DateTimeField(null=True, blank=True,
+                                                              verbose_name='Время последней заметки')
+    text_length: models.BigIntegerField = models.BigIntegerField(default=0, verbose_name='Общая длина текста')
+    updated_at: models.DateTimeField = models.DateTimeField(auto_now=True, verbose_name='Время изменения')
+
+    def __str__(self) -> str:
+        return f'{self.user_id}: {self.note_count}'
+
+    class Meta:
+        verbose_name: str = 'Статистика заметок'
+        verbose_name_plural: str = 'Статистика заметок'
@@ -0,0 +1,174 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+
+def encode_cursor(obj) -> str:
+    """
+        Кодирует позицию объекта в ленте в непрозрачный курсор.
+
+        Args:
+            obj: Объект с полями created_at и pk.
+
+        Returns:
+            Строка курсора, пригодная для использования в URL.
+    """
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+        Декодирует курсор, полученный из encode_cursor.
+
+        Args:
+            cursor: Строка курсора или None.
+
+        Returns:
+            Пара (created_at, pk) или None, если курсор пустой или поврежден.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """Страница keyset-пагинации с курсорами на соседние страницы."""
+
+    def __init__(self, object_list: List, next_cursor: Optional[str], previous_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+        Курсорная пагинация по стабильному порядку (-created_at, -id).
+
+        В отличие от OFFSET-пагинации, каждая страница выбирается диапазонным
+        условием по составному индексу (created_at, id), поэтому стоимость
+        N-й страницы не зависит от N.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def _plan(self, after: Optional[str], before: Optional[str]) -> Tuple[QuerySet, Optional[str], Optional[str]]:
+        """
+            Строит запрос страницы.
+
+            Returns:
+                Тройка (запрос, курсор after, курсор before); из курсоров заполнен
+                не больше чем один - тот, что был корректен и определяет направление.
+        """
+        after_key = decode_cursor(after)
+        before_key = decode_cursor(before) if after_key is None else None
+
+        if before_key is not None:
+            created_at, pk = before_key
+            queryset = self.queryset.filter(
+                Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(id__gt=pk))
+            ).order_by('created_at', 'id')
+            return queryset[:self.per_page + 1], None, before
+
+        queryset = self.queryset
+        if after_key is not None:
+            created_at, pk = after_key
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            )
+        return queryset.order_by('-created_at', '-id')[:self.per_page + 1], (after if after_key else None), None
+
+    def _build(self, rows: List, after: Optional[str], before: Optional[str]) -> KeysetPage:
+        if before is not None:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=encode_cursor(rows[-1]) if rows else before,
+                previous_cursor=encode_cursor(rows[0]) if has_previous else None,
+            )
+
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        previous_cursor = None
+        if after is not None:
+            previous_cursor = encode_cursor(rows[0]) if rows else after
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=previous_cursor,
+        )
+
+    def page(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        """
+            Возвращает страницу после курсора after или перед курсором before.
+
+            Args:
+                after: Курсор последнего элемента предыдущей страницы.
+                before: Курсор первого элемента следующей страницы.
+
+            Returns:
+                Объект KeysetPage. Поврежденный курсор трактуется как первая страница.
+        """
+        queryset, after, before = self._plan(after, before)
+        return self._build(list(queryset), after, before)
+
+    async def apage(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        """Асинхронная версия page, использующая async-интерфейс ORM."""
+        queryset, after, before = self._plan(after, before)
+        return self._build([obj async for obj in queryset], after, before)
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """
+        Курсорная пагинация по нескольким запросам с общим порядком (-created_at, -id).
+
+        Каждый запрос выбирает не больше per_page + 1 строк с тем же условием по
+        курсору, результаты сливаются в памяти. Подходит для таблиц с
+        непересекающимися id, например Note и ArchivedNote.
+    """
+
+    def __init__(self, querysets: List[QuerySet], per_page: int) -> None:
+        super().__init__(querysets[0], per_page)
+        self.paginators = [KeysetPaginator(queryset, per_page) for queryset in querysets]
+
+    def _merge(self, results: List[List], before: Optional[str]) -> List:
+        rows = [row for result in results for row in result]
+        # страница before выбирается в прямом порядке (см. _plan)
+        rows.sort(key=lambda row: (row.created_at, row.pk), reverse=before is None)
+        return rows[:self.per_page + 1]
+
+    def page(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        plans = [paginator._plan(after, before) for paginator in self.paginators]
+        _, after, before = plans[0]
+        return self._build(self._merge([list(queryset) for queryset, _, _ in plans], before), after, before)
+
+    async def apage(self, after: Optional[str] = None, before: Optional[str] = None) -> KeysetPage:
+        plans = [paginator._plan(after, before) for paginator in self.paginators]
+        _, after, before = plans[0]
+        results = [[obj async for obj in queryset] for queryset, _, _ in plans]
+        return self._build(self._merge(results, before), after, before)
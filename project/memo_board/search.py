@@ -0,0 +1,53 @@
+"""
+Полнотекстовый поиск по заголовку и тексту заметок.
+
+На MySQL используется FULLTEXT-индекс (title, text), на SQLite -
+виртуальная таблица FTS5 memo_board_note_fts, которую синхронизируют
+триггеры из миграции 0003. Поиск без индекса (LIKE '%q%') не выполняется.
+"""
+import re
+
+from django.db import NotSupportedError, connections, router
+from django.db.models import QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Note
+
+TERM_RE = re.compile(r'\w+')
+
+MYSQL_MATCH = 'MATCH (memo_board_note.title, memo_board_note.text) AGAINST (%s IN NATURAL LANGUAGE MODE)'
+SQLITE_FTS_TABLE = 'memo_board_note_fts'
+SQLITE_WHERE = ['memo_board_note_fts MATCH %s', 'memo_board_note_fts.rowid = memo_board_note.id']
+# rank - скрытый столбец FTS5 со значением bm25 (чем меньше, тем релевантнее)
+SQLITE_RANK = '-memo_board_note_fts.rank'
+
+
+def search_notes(query: str) -> QuerySet:
+    """
+        Ищет заметки по словам запроса и упорядочивает их по релевантности.
+
+        Args:
+            query: Строка поиска, введенная пользователем. Из нее берутся
+                только слова, поэтому синтаксис FTS в запросе не исполняется.
+
+        Returns:
+            QuerySet заметок с аннотацией rank (чем больше, тем релевантнее).
+    """
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return Note.objects.none()
+    vendor = connections[router.db_for_read(Note)].vendor
+    if vendor == 'mysql':
+        text = ' '.join(terms)
+        # MATCH в WHERE без сравнения позволяет MySQL выбрать FULLTEXT-индекс
+        return (Note.objects.extra(where=[MYSQL_MATCH], params=[text])
+                .annotate(rank=RawSQL(MYSQL_MATCH, [text]))
+                .order_by('-rank', '-id'))
+    if vendor == 'sqlite':
+        # каждое слово в кавычках и с префиксным поиском: "слово"*
+        match = ' '.join('"{}"*'.format(term) for term in terms)
+        # одно соединение с FTS5: совпадения берутся из индекса, заметки - по первичному ключу
+        return (Note.objects.extra(tables=[SQLITE_FTS_TABLE], where=SQLITE_WHERE, params=[match],
+                                   select={'rank': SQLITE_RANK})
+                .order_by('-rank', '-id'))
+    raise NotSupportedError(f'Full-text search is not configured for {vendor}')
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_notes_version, mark_notes_deleted
+from .events import publish_note_deleted, publish_note_saved
+from .models import Note
+from .stats import adjust_note_stats
+
+
+@receiver(post_save, sender=Note)
+def invalidate_notes_cache(sender: Note, **kwargs) -> None:
+    """
+    Функция приемника сигналов, сбрасывающая кэш списка заметок после изменения заметки.
+
+    Версия увеличивается только после фиксации транзакции, иначе конкурентный
+    запрос мог бы закэшировать под новой версией еще не зафиксированные данные.
+    """
+    transaction.on_commit(bump_notes_version)
+
+
+@receiver(post_delete, sender=Note)
+def invalidate_notes_cache_on_delete(sender: Note, **kwargs) -> None:
+    """Функция приемника сигналов, сбрасывающая кэш списка заметок и запоминающая время удаления."""
+    transaction.on_commit(mark_notes_deleted)
+
+
+@receiver(post_save, sender=User)
+def invalidate_notes_cache_on_rename(sender: User, instance: User, created: bool, update_fields=None,
+                                     **kwargs) -> None:
+    """
+    Функция приемника сигналов, сбрасывающая кэш списка заметок при возможной смене имени пользователя,
+    которое выводится в карточках.
+    """
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    transaction.on_commit(bump_notes_version)
+
+
+@receiver(post_save, sender=Note)
+def publish_note_saved_event(sender: Note, instance: Note, created: bool, **kwargs) -> None:
+    """Функция приемника сигналов, публикующая в живую ленту созданную или измененную заметку."""
+    if not settings.ASYNC_VIEWS:  # без ASYNC_VIEWS ленту никто не слушает, карточка не рендерится
+        return
+    transaction.on_commit(lambda: publish_note_saved(instance, created))
+
+
+@receiver(post_delete, sender=Note)
+def publish_note_deleted_event(sender: Note, instance: Note, **kwargs) -> None:
+    """Функция приемника сигналов, публикующая в живую ленту удаление заметки."""
+    if not settings.ASYNC_VIEWS:
+        return
+    note_id = instance.pk
+    transaction.on_commit(lambda: publish_note_deleted(note_id))
+
+
+@receiver(post_save, sender=Note)
+def update_note_stats(sender: Note, instance: Note, created: bool, **kwargs) -> None:
+    """Функция приемника сигналов, поправляющая статистику автора созданной или измененной заметки."""
+    text_length = len(instance.text)
+    if created:
+        adjust_note_stats(instance.user_id, notes=1, text_length=text_length, created_at=instance.created_at)
+    elif hasattr(instance, '_saved_text_length'):
+        adjust_note_stats(instance.user_id, text_length=text_length - instance._saved_text_length)
+    instance._saved_text_length = text_length
+
+
+@receiver(post_delete, sender=Note)
+def update_note_stats_on_delete(sender: Note, instance: Note, **kwargs) -> None:
+    """Функция приемника сигналов, поправляющая статистику автора удаленной заметки."""
+    adjust_note_stats(instance.user_id, notes=-1, text_length=-len(instance.text))
@@ -0,0 +1,151 @@
+"""
+Инкрементальная статистика заметок пользователей (NoteStats).
+
+Каждое изменение заметок поправляет строку статистики владельца одним
+UPDATE с выражениями F() в той же транзакции, поэтому конкурентные изменения
+не теряют друг друга, а откат транзакции откатывает и статистику. Приемники
+сигналов memo_board учитывают создание, правку и удаление отдельных заметок;
+пакетные операции без сигналов (batch, import_notes) вызывают
+adjust_note_stats сами.
+
+last_note_at при удалении заметок не уменьшается (для этого пришлось бы
+искать предыдущую заметку) и уточняется сверкой. Строки статистики, которые
+разошлись с заметками (например, после правки данных вручную), исправляет
+reconcile_note_stats.
+
+Для страницы профиля статистика кэшируется (get_note_stats) и удаляется из
+кэша после фиксации транзакции, изменившей ее.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Length, Now
+
+from .models import ArchivedNote, Note, NoteStats
+
+
+def adjust_note_stats(user_id: int, notes: int = 0, text_length: int = 0,
+                      created_at: Optional[datetime] = None) -> None:
+    """
+        Поправляет статистику пользователя на изменение его заметок.
+
+        Args:
+            user_id: Владелец заметок.
+            notes: Изменение числа заметок.
+            text_length: Изменение общей длины текста.
+            created_at: Время создания новой заметки (для last_note_at).
+    """
+    if not notes and not text_length and created_at is None:
+        return
+    updates = {'note_count': F('note_count') + notes, 'text_length': F('text_length') + text_length,
+               'updated_at': Now()}
+    if created_at is not None:
+        updates['last_note_at'] = Greatest(Coalesce('last_note_at', Value(created_at)), Value(created_at))
+    # без строки статистики учитывается только создание: строка могла быть удалена
+    # каскадно вместе с пользователем, заметки которого сейчас удаляются
+    if not NoteStats.objects.filter(user_id=user_id).update(**updates) and created_at is not None:
+        # первая заметка пользователя: строки еще нет
+        try:
+            with transaction.atomic():
+                NoteStats.objects.create(user_id=user_id, note_count=notes, text_length=text_length,
+                                         last_note_at=created_at)
+        except IntegrityError:  # строку одновременно создал другой запрос
+            NoteStats.objects.filter(user_id=user_id).update(**updates)
+    # вне транзакции on_commit выполняется сразу, поэтому кэш сбрасывается только после записи:
+    # иначе конкурентный запрос успел бы закэшировать статистику до изменения
+    invalidate_note_stats(user_id)
+
+
+def note_stats_cache_key(user_id: int) -> str:
+    return f'memo_board:note_stats:{user_id}'
+
+
+def invalidate_note_stats(user_id: int) -> None:
+    """Удаляет статистику пользователя из кэша после фиксации текущей транзакции."""
+    key = note_stats_cache_key(user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_note_stats(user_id: int) -> Optional[NoteStats]:
+    """Возвращает статистику заметок пользователя из кэша или None, если заметок у него не было."""
+    key = note_stats_cache_key(user_id)
+    # False в кэше означает, что строки статистики нет
+    stats = cache.get(key)
+    if stats is None:
+        stats = NoteStats.objects.filter(user_id=user_id).first() or False
+        cache.set(key, stats, settings.PROFILE_CACHE_TIMEOUT)
+    return stats or None
+
+
+async def aget_note_stats(user_id: int) -> Optional[NoteStats]:
+    """Асинхронная версия get_note_stats."""
+    key = note_stats_cache_key(user_id)
+    stats = await cache.aget(key)
+    if stats is None:
+        stats = await NoteStats.objects.filter(user_id=user_id).afirst() or False
+        await cache.aset(key, stats, settings.PROFILE_CACHE_TIMEOUT)
+    return stats or None
+
+
+def adjust_note_stats_for_created(notes: Iterable[Note]) -> None:
+    """Учитывает заметки, созданные без сигналов post_save (bulk_create)."""
+    totals: Dict[int, List] = {}
+    for note in notes:
+        total = totals.setdefault(note.user_id, [0, 0, note.created_at])
+        total[0] += 1
+        total[1] += len(note.text)
+        total[2] = max(total[2], note.created_at)
+    for user_id, (count, text_length, created_at) in totals.items():
+        adjust_note_stats(user_id, notes=count, text_length=text_length, created_at=created_at)
+
+
+def _actual_stats(user_ids: List[int]) -> Dict[int, Tuple[int, int, Optional[datetime]]]:
+    stats: Dict[int, Tuple[int, int, Optional[datetime]]] = {}
+    for model in (Note, ArchivedNote):
+        rows = (model.objects.filter(user_id__in=user_ids).values('user_id')
+                .annotate(count=Count('id'), text_length=Sum(Length('text')), last_note_at=Max('created_at'))
+                .order_by())
+        for row in rows:
+            count, text_length, last_note_at = stats.get(row['user_id'], (0, 0, None))
+            if last_note_at is None or (row['last_note_at'] and row['last_note_at'] > last_note_at):
+                last_note_at = row['last_note_at']
+            stats[row['user_id']] = (count + row['count'], text_length + (row['text_length'] or 0), last_note_at)
+    return stats
+
+
+def reconcile_note_stats(user_ids: List[int]) -> int:
+    """
+        Пересчитывает статистику пользователей и исправляет расхождения.
+
+        Строки статистики блокируются на время пересчета, поэтому
+        одновременные поправки из других транзакций ждут его окончания.
+
+        Args:
+            user_ids: Пользователи, статистику которых нужно проверить.
+
+        Returns:
+            Число исправленных строк статистики.
+    """
+    repaired = 0
+    with transaction.atomic():
+        stored = {stats.user_id: stats for stats in NoteStats.objects.select_for_update().filter(user_id__in=user_ids)}
+        actual = _actual_stats(user_ids)
+        for user_id in user_ids:
+            count, text_length, last_note_at = actual.get(user_id, (0, 0, None))
+            stats = stored.get(user_id)
+            if stats is None and count:
+                NoteStats.objects.create(user_id=user_id, note_count=count, text_length=text_length,
+                                         last_note_at=last_note_at)
+            elif stats is not None and (stats.note_count, stats.text_length, stats.last_note_at) != (
+                    count, text_length, last_note_at):
+                stats.note_count, stats.text_length, stats.last_note_at = count, text_length, last_note_at
+                stats.save(update_fields=['note_count', 'text_length', 'last_note_at', 'updated_at'])
+            else:
+                continue
+            repaired += 1
+            invalidate_note_stats(user_id)
+    return repaired
@@ -1,9 +1,32 @@
-from django.test import TestCase, Client
-from django.urls import reverse
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from django.contrib.auth.models import User
 
-from .models import Note
+from .cache import NOTES_DELETED_AT_KEY, get_notes_state
+from .events import LocalBroker, get_broker, publish_note_batch
+from account.models import Profile
+
+from .models import ArchivedNote, Note, NoteStats
 from .forms import NoteForm
+from .pagination import KeysetPaginator, decode_cursor
+from .search import search_notes
+from project.query_budget import capture_queries
 
 
 # Тест для модели
@@ -77,6 +100,22 @@ class NoteCreateTestCase(TestCase):
         self.assertRedirects(response, reverse('login') + '?next=' + self.url)
         self.assertEqual(Note.objects.count(), 0)
 
+    @mock.patch('project.ratelimit.time', **{'time.return_value': 1000.0})
+    def test_note_writes_share_a_per_user_rate_limit(self, _):
+        cache.clear()
+        self.client.force_login(self.user)
+        for _ in range(60):
+            self.client.post(self.url, self.note_data)
+        response = self.client.post(reverse('note_batch'), json.dumps({'create': [self.note_data]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Note.objects.count(), 60)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.post(self.url, self.note_data).status_code, 302)
+
 
 class NoteEditTestCase(TestCase):
 
@@ -161,3 +200,848 @@ class NoteModelTestCase(TestCase):
         self.assertTrue(self.note.can_edit(self.user))
         another_user = User.objects.create_user(username='anotheruser', password='anotherpass')
         self.assertFalse(self.note.can_edit(another_user))
+
+
+@override_settings(NOTES_PER_PAGE=3)
+class NotesListPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_login(self.user)
+        base = timezone.now()
+        # две пары заметок с одинаковым временем создания проверяют сортировку по id
+        for i, minutes in enumerate([0, 0, 1, 1, 2, 3, 4, 5]):
+            note = Note.objects.create(title=f'Note {i}', text='text', user=self.user)
+            Note.objects.filter(pk=note.pk).update(created_at=base + timedelta(minutes=minutes))
+        self.expected = list(Note.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _ids(self, response):
+        return [card['id'] for card in response.context['notes_list']]
+
+    def test_walk_forward_and_back(self):
+        url = reverse('notes_list')
+        response = self.client.get(url)
+        pages = [self._ids(response)]
+        self.assertFalse(response.context['page'].has_previous)
+        while response.context['page'].has_next:
+            response = self.client.get(url, {'after': response.context['page'].next_cursor})
+            pages.append(self._ids(response))
+        self.assertEqual([i for page in pages for i in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+
+        while response.context['page'].has_previous:
+            response = self.client.get(url, {'before': response.context['page'].previous_cursor})
+            pages.pop()
+            self.assertEqual(self._ids(response), pages[-1])
+        self.assertEqual(self._ids(response), self.expected[:3])
+
+    def test_page_cost_does_not_depend_on_position(self):
+        paginator = KeysetPaginator(Note.objects.all(), per_page=3)
+        second = paginator.page(after=paginator.page().next_cursor)
+        with self.assertNumQueries(1):
+            last = paginator.page(after=second.next_cursor)
+        self.assertFalse(last.has_next)
+
+    def test_invalid_cursor_returns_first_page(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.client.get(reverse('notes_list'), {'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._ids(response), self.expected[:3])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, QUERY_REPEAT_THRESHOLD=3)
+class NotesQueryBudgetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(5)]
+        for user in self.users:
+            Note.objects.create(title='Test Note', text='This is a test note.', user=user)
+        self.client.force_login(self.users[0])
+
+    def test_notes_list_does_not_query_per_note(self):
+        response = self.client.get(reverse('notes_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'user4')
+
+    def test_note_edit_within_budget(self):
+        note = Note.objects.filter(user=self.users[0]).get()
+        url = reverse('note_edit', args=[note.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {'title': 'Updated', 'text': 'Updated text'})
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class NotesListCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.owner = User.objects.create_user(username='owner', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.note = Note.objects.create(title='Cached Note', text='Cached text', user=self.owner)
+        self.url = reverse('notes_list')
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.force_login(self.owner)
+        self.client.get(self.url)
+        with self.assertNumQueries(0):  # сессия и пользователь берутся из кэша
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Cached Note')
+
+    def test_controls_depend_on_viewer(self):
+        edit_url = reverse('note_edit', args=[self.note.id])
+        self.client.force_login(self.owner)
+        self.assertContains(self.client.get(self.url), edit_url)
+        self.client.force_login(self.other)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Cached Note')
+        self.assertNotContains(response, edit_url)
+
+    def test_create_edit_and_delete_invalidate_cache(self):
+        self.client.force_login(self.owner)
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_create'), {'title': 'Fresh Note', 'text': 'Fresh text'})
+        self.assertContains(self.client.get(self.url), 'Fresh Note')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_edit', args=[self.note.id]), {'title': 'Edited Note', 'text': 'Edited'})
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Edited Note')
+        self.assertNotContains(response, 'Cached Note')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_delete', args=[self.note.id]))
+        self.assertNotContains(self.client.get(self.url), 'Edited Note')
+
+    def test_username_change_invalidates_cache(self):
+        self.client.force_login(self.other)
+        self.client.get(self.url)
+        self.owner.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.save()
+        self.assertContains(self.client.get(self.url), 'renamed')
+
+
+class NotesListSharedCacheTestCase(NotesListCacheTestCase):
+    """Те же проверки на файловом кэше, общем для нескольких процессов."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        cache_settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.cache_dir.name,
+        }})
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        super().setUp()
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', AUTH_USER_CACHE_TIMEOUT=60)
+class NotesListConditionalGetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.note = Note.objects.create(title='First Note', text='text', user=self.owner)
+        self.url = reverse('notes_list')
+        self.client.force_login(self.owner)
+
+    def test_updated_at_tracks_edits(self):
+        created = self.note.updated_at
+        self.note.title = 'Edited'
+        self.note.save()
+        self.assertGreater(self.note.updated_at, created)
+
+    def test_unchanged_list_returns_not_modified_without_rendering(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):  # сессия и пользователь берутся из кэша
+            response = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, 'memo_board/notes_list.html')
+
+    def test_etag_depends_on_viewer(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_if_modified_since_is_not_shared_between_viewers(self):
+        last_modified = http_date(get_notes_state()['last_modified'])
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.client.force_login(self.other)
+        response = self.client.get(self.url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_changes_invalidate_validators(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(title='Second Note', text='text', user=self.owner)
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertContains(response, 'Second Note')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_batch'), json.dumps({'update': [{'id': self.note.id, 'title': 'Batched',
+                                                                            'text': 'text'}]}),
+                             content_type='application/json')
+        self.assertGreater(Note.objects.get(id=self.note.id).updated_at, self.note.updated_at)
+        self.assertContains(self.client.get(self.url, headers={'If-None-Match': etag}), 'Batched')
+
+    def test_delete_moves_last_modified(self):
+        Note.objects.filter(id=self.note.id).update(updated_at=timezone.now() - timedelta(days=1))
+        cache.clear()
+        Note.objects.create(title='Old Note', text='text', user=self.owner)
+        Note.objects.filter(title='Old Note').update(updated_at=timezone.now() - timedelta(days=1))
+        cache.set(NOTES_DELETED_AT_KEY, (timezone.now() - timedelta(days=1)).timestamp())
+        etag = self.client.get(self.url)['ETag']
+        last_modified = get_notes_state()['last_modified']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.get(title='Old Note').delete()
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Old Note')
+        self.assertGreater(get_notes_state()['last_modified'], last_modified)
+
+
+# FULLTEXT-индекс InnoDB видит только зафиксированные строки, поэтому без обертки в транзакцию
+class NoteSearchTestCase(TransactionTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_login(self.user)
+        self.both = Note.objects.create(title='Grocery list', text='Buy grocery items and bread', user=self.user)
+        self.text_only = Note.objects.create(title='Weekend', text='Maybe visit the grocery market', user=self.user)
+        self.other = Note.objects.create(title='Meeting', text='Discuss quarterly report', user=self.user)
+
+    def test_ranks_matches(self):
+        self.assertEqual(list(search_notes('grocery').values_list('id', flat=True)),
+                         [self.both.id, self.text_only.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.text = 'Discuss grocery budget'
+        self.other.save()
+        self.text_only.delete()
+        ids = set(search_notes('grocery').values_list('id', flat=True))
+        self.assertEqual(ids, {self.both.id, self.other.id})
+        self.assertFalse(search_notes('quarterly').exists())
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса FTS5')
+    def test_sqlite_search_joins_fts_index(self):
+        sql, params = search_notes('grocery').select_related('user').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(plan[0].startswith('SCAN memo_board_note_fts VIRTUAL TABLE'), plan)
+        self.assertIn('SEARCH memo_board_note USING INTEGER PRIMARY KEY (rowid=?)', plan)
+
+    def test_query_syntax_is_not_executed(self):
+        self.assertFalse(search_notes('"* NEAR( title:').exists())
+        self.assertEqual(search_notes('Meeting OR').count(), 0)
+
+    @override_settings(NOTES_PER_PAGE=1)
+    def test_search_view_paginates(self):
+        url = reverse('note_search')
+        response = self.client.get(url, {'q': 'grocery'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([note.id for note in response.context['page']], [self.both.id])
+        self.assertEqual(response.context['page'].paginator.num_pages, 2)
+        response = self.client.get(url, {'q': 'grocery', 'page': 2})
+        self.assertEqual([note.id for note in response.context['page']], [self.text_only.id])
+
+
+class NoteBatchTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_login(self.user)
+        self.url = reverse('note_batch')
+
+    def _post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def _notes(self, count, user=None):
+        return [Note.objects.create(title=f'Note {i}', text='text', user=user or self.user) for i in range(count)]
+
+    def _payload(self, size):
+        updates, deletes = self._notes(size), self._notes(size)
+        return {
+            'create': [{'title': f'New {i}', 'text': 'new text'} for i in range(size)],
+            'update': [{'id': note.id, 'title': 'Updated', 'text': 'updated text'} for note in updates],
+            'delete': [note.id for note in deletes],
+        }
+
+    def test_applies_whole_batch(self):
+        payload = self._payload(3)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self._post(payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 3, 'updated': 3, 'deleted': 3})
+        self.assertEqual(Note.objects.filter(title__startswith='New', user=self.user).count(), 3)
+        self.assertEqual(Note.objects.filter(title='Updated').count(), 3)
+        self.assertFalse(Note.objects.filter(id__in=payload['delete']).exists())
+        self.assertTrue(callbacks)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        small, large = self._payload(2), self._payload(20)
+        self._post({})  # пользователь сессии попадает в кэш
+        with capture_queries() as small_stats:
+            self._post(small)
+        with capture_queries() as large_stats:
+            self._post(large)
+        self.assertEqual(small_stats.count, large_stats.count)
+
+    def test_invalid_item_rejects_batch(self):
+        note = self._notes(1)[0]
+        response = self._post({
+            'create': [{'title': 'ok', 'text': 'ok'}, {'title': 'x' * 51, 'text': 'ok'}],
+            'update': [{'id': note.id, 'title': '', 'text': 'ok'}],
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'create.1', 'update.0'})
+        self.assertEqual(Note.objects.count(), 1)
+
+    def test_foreign_notes_reject_batch(self):
+        mine, foreign = self._notes(1)[0], self._notes(1, user=self.other)[0]
+        response = self._post({
+            'create': [{'title': 'ok', 'text': 'ok'}],
+            'update': [{'id': mine.id, 'title': 'Changed', 'text': 'ok'}],
+            'delete': [foreign.id],
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(list(response.json()['errors']), ['delete.0'])
+        self.assertTrue(Note.objects.filter(pk=foreign.pk).exists())
+        mine.refresh_from_db()
+        self.assertEqual(mine.title, 'Note 0')
+
+    def test_missing_notes_and_bad_json(self):
+        self.assertEqual(self._post({'delete': [999999]}).status_code, 404)
+        response = self.client.post(self.url, '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+@override_settings(NOTES_EXPORT_CHUNK_SIZE=2)
+class NoteExportTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_login(self.user)
+        self.notes = [Note.objects.create(title=f'Note {i}', text=f'Text, "quoted" {i}', user=self.user)
+                      for i in range(5)]
+        Note.objects.create(title='Foreign', text='text', user=other)
+        self.old = self.notes[0]
+        Note.objects.filter(pk=self.old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        self.url = reverse('note_export')
+
+    def _content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(self._content(response))))
+        self.assertEqual(rows[0], ['id', 'title', 'text', 'created_at'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [note.id for note in self.notes])
+        self.assertEqual(rows[1][2], 'Text, "quoted" 0')
+
+    def test_ndjson_export_with_since(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        response = self.client.get(self.url, {'format': 'ndjson', 'since': since})
+        items = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([item['id'] for item in items], [note.id for note in self.notes[1:]])
+
+    def test_export_reads_fixed_size_chunks(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        with capture_queries() as stats:
+            lines = self._content(response).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(stats.count, 3)
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': '2023-13-45'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+
+
+class ArchiveNotesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_login(self.user)
+        base = timezone.now() - timedelta(days=30)
+        self.notes = [Note.objects.create(title=f'Note {i}', text='text', user=self.user) for i in range(6)]
+        self.created_at = [base + timedelta(days=i * 5) for i in range(6)]
+        for note, created_at in zip(self.notes, self.created_at):
+            Note.objects.filter(pk=note.pk).update(created_at=created_at)
+        # три старые заметки давно не менялись
+        Note.objects.filter(pk__in=[note.pk for note in self.notes[:3]]).update(updated_at=base)
+        self.expected = list(Note.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def _ids(self, response):
+        return [card['id'] for card in response.context['notes_list']]
+
+    def test_command_moves_cold_notes_in_batches(self):
+        out = io.StringIO()
+        call_command('archive_notes', older_than=7, batch_size=2, stdout=out)
+        self.assertIn('Done, 3 notes archived', out.getvalue())
+        self.assertEqual(Note.objects.count(), 3)
+        archived = ArchivedNote.objects.get(pk=self.notes[0].pk)
+        self.assertEqual((archived.title, archived.user_id), ('Note 0', self.user.pk))
+        self.assertEqual(archived.created_at, self.created_at[0])
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        self.assertEqual(ArchivedNote.objects.count(), 3)
+
+    def test_new_notes_do_not_reuse_archived_ids(self):
+        Note.objects.update(updated_at=timezone.now() - timedelta(days=30))
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        self.assertFalse(Note.objects.exists())
+        ArchivedNote.objects.create(id=self.notes[-1].pk + 10, title='Imported', text='text', user=self.user,
+                                    created_at=timezone.now(), updated_at=timezone.now())
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        note = Note.objects.create(title='Fresh', text='text', user=self.user)
+        self.assertGreater(note.pk, self.notes[-1].pk + 10)
+
+    def test_list_reads_hot_table_unless_archived_requested(self):
+        self.assertEqual(len(self._ids(self.client.get(reverse('notes_list')))), 6)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        response = self.client.get(reverse('notes_list'))
+        self.assertEqual(self._ids(response), self.expected[:3])
+        response = self.client.get(reverse('notes_list'), {'archived': '1'})
+        self.assertEqual(self._ids(response), self.expected)
+        self.assertNotContains(response, reverse('note_edit', args=[self.notes[0].pk]))
+        self.assertContains(response, reverse('note_edit', args=[self.notes[5].pk]))
+
+    @override_settings(NOTES_PER_PAGE=2)
+    def test_archived_pages_merge_both_tables(self):
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        url = reverse('notes_list')
+        response = self.client.get(url, {'archived': '1'})
+        pages = [self._ids(response)]
+        while response.context['page'].has_next:
+            response = self.client.get(url, {'after': response.context['page'].next_cursor, 'archived': '1'})
+            pages.append(self._ids(response))
+        self.assertEqual(pages, [self.expected[0:2], self.expected[2:4], self.expected[4:6]])
+        response = self.client.get(url, {'before': response.context['page'].previous_cursor, 'archived': '1'})
+        self.assertEqual(self._ids(response), self.expected[2:4])
+
+    def test_export_includes_archived_on_request(self):
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        url = reverse('note_export')
+        response = self.client.get(url, {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        response = self.client.get(url, {'format': 'ndjson', 'archived': '1'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(sorted(json.loads(line)['id'] for line in lines), sorted(self.expected))
+
+
+class NoteStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_login(self.user)
+
+    def _stats(self):
+        stats = NoteStats.objects.get(user=self.user)
+        return stats.note_count, stats.text_length
+
+    def test_views_and_signals_keep_stats(self):
+        self.client.post(reverse('note_create'), {'title': 'One', 'text': 'abc'})
+        self.client.post(reverse('note_create'), {'title': 'Two', 'text': 'defgh'})
+        self.assertEqual(self._stats(), (2, 8))
+        note = Note.objects.get(title='One')
+        self.assertEqual(NoteStats.objects.get(user=self.user).last_note_at,
+                         Note.objects.get(title='Two').created_at)
+        self.client.post(reverse('note_edit', args=[note.id]), {'title': 'One', 'text': 'abcdef'})
+        self.assertEqual(self._stats(), (2, 11))
+        self.client.get(reverse('note_delete', args=[note.id]))
+        self.assertEqual(self._stats(), (1, 5))
+
+    def test_batch_and_import_keep_stats(self):
+        notes = [Note.objects.create(title=f'Note {i}', text='text', user=self.user) for i in range(3)]
+        self.client.post(reverse('note_batch'), json.dumps({
+            'create': [{'title': 'New', 'text': 'new text'}],
+            'update': [{'id': notes[0].id, 'title': 'Updated', 'text': 'longer text'}],
+            'delete': [notes[1].id],
+        }), content_type='application/json')
+        self.assertEqual(self._stats(), (3, 8 + 11 + 4))
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as f:
+            f.write(json.dumps({'username': 'testuser', 'title': 'Imported', 'text': 'xy'}) + '\n')
+        self.addCleanup(os.remove, f.name)
+        call_command('import_notes', f.name, stdout=io.StringIO())
+        self.assertEqual(self._stats(), (4, 25))
+
+    def test_cache_is_invalidated_after_the_update(self):
+        Note.objects.create(title='One', text='abc', user=self.user)
+        seen = []
+        with mock.patch('memo_board.stats.invalidate_note_stats', side_effect=lambda user_id: seen.append(
+                NoteStats.objects.get(user_id=user_id).note_count)):
+            Note.objects.create(title='Two', text='abc', user=self.user)
+        self.assertEqual(seen, [2])  # без транзакции кэш сбрасывается сразу, и он видит новое значение
+
+    def test_reconcile_repairs_drift(self):
+        for i in range(3):
+            Note.objects.create(title=f'Note {i}', text='text', user=self.user)
+        other = User.objects.create_user(username='other', password='testpass')
+        Note.objects.create(title='Other', text='text', user=other)
+        NoteStats.objects.filter(user=self.user).update(note_count=10, text_length=0)
+        NoteStats.objects.filter(user=other).delete()
+        out = io.StringIO()
+        call_command('reconcile_note_stats', batch_size=1, stdout=out)
+        self.assertIn('Done, 2 users checked, 2 repaired', out.getvalue())
+        self.assertEqual(self._stats(), (3, 12))
+        self.assertEqual(NoteStats.objects.get(user=other).note_count, 1)
+
+    def test_profile_shows_stats(self):
+        url = reverse('profile', args=['testuser'])
+        self.assertContains(self.client.get(url), 'Заметок: 0')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_create'), {'title': 'One', 'text': 'abc'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Заметок: 1')
+
+    def test_archived_notes_stay_counted(self):
+        note = Note.objects.create(title='Old', text='text', user=self.user)
+        Note.objects.filter(pk=note.pk).update(updated_at=timezone.now() - timedelta(days=30))
+        call_command('archive_notes', older_than=7, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('reconcile_note_stats', stdout=out)
+        self.assertIn('0 repaired', out.getvalue())
+        self.assertEqual(self._stats(), (1, 4))
+
+
+class SeedAndBenchmarkCommandTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_creates_consistent_data_without_signals(self):
+        with mock.patch('account.views.create_profile') as create_profile:
+            call_command('seed', users=5, notes=50, batch_size=20, days=30, stdout=io.StringIO())
+        create_profile.assert_not_called()
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 5)
+        self.assertEqual(Profile.objects.filter(user__username__startswith='seed').count(), 5)
+        self.assertEqual(Note.objects.count(), 50)
+        oldest = Note.objects.order_by('created_at').first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(hours=1))
+        self.assertEqual(oldest.updated_at, oldest.created_at)
+        self.assertEqual(sum(NoteStats.objects.values_list('note_count', flat=True)), 50)
+        out = io.StringIO()
+        call_command('reconcile_note_stats', stdout=out)
+        self.assertIn('0 repaired', out.getvalue())
+        self.assertTrue(self.client.login(username='seed0', password='seed-password'))
+
+        call_command('seed', users=2, notes=0, stdout=io.StringIO())
+        self.assertTrue(User.objects.filter(username='seed6').exists())
+
+    def test_benchmark_reports_json(self):
+        call_command('seed', users=3, notes=30, stdout=io.StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark', requests=6, concurrency=1, sample=5, output=path, stderr=io.StringIO())
+            with open(path) as f:
+                baseline = json.load(f)
+            self.assertEqual(set(baseline['scenarios']), {'notes_list', 'profile', 'note_create'})
+            for result in baseline['scenarios'].values():
+                self.assertEqual(result['errors'], 0, result['error_kinds'])
+                self.assertEqual(set(result['latency_ms']), {'mean', 'p50', 'p95', 'p99'})
+                self.assertGreater(result['throughput_rps'], 0)
+            self.assertGreater(baseline['scenarios']['note_create']['queries_per_request']['mean'], 0)
+            self.assertEqual(Note.objects.filter(title__startswith='Benchmark').count(), 6)
+
+            out = io.StringIO()
+            call_command('benchmark', scenario=['profile'], requests=4, concurrency=1, compare=path, stdout=out,
+                         stderr=io.StringIO())
+            report = json.loads(out.getvalue())
+            self.assertEqual({row['metric'] for row in report['comparison']}, {'p50_ms', 'p95_ms', 'p99_ms',
+                                                                              'queries', 'rps'})
+
+
+JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [os.path.join(settings.BASE_DIR, 'templates', 'jinja2')],
+    'OPTIONS': {'environment': 'project.jinja2.environment',
+                'context_processors': settings.TEMPLATE_CONTEXT_PROCESSORS},
+}
+
+
+class TemplatePipelineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='password123')
+        self.other = User.objects.create_user(username='reader', password='password123')
+        self.note = Note.objects.create(title='Pipeline <Note>', text='text', user=self.user)
+
+    def test_cards_carry_prebuilt_links(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('notes_list'))
+        card = response.context['notes_list'][0]
+        self.assertEqual(card['edit_url'], reverse('note_edit', args=[self.note.id]))
+        self.assertContains(response, f'href="{card["delete_url"]}"')
+
+    def test_benchmark_templates_reports_json(self):
+        out = io.StringIO()
+        with capture_queries() as stats:
+            call_command('benchmark_templates', cards=3, repeat=2, stdout=out, stderr=io.StringIO())
+        self.assertEqual(stats.count, 0)
+        report = json.loads(out.getvalue())
+        self.assertLessEqual({'django', 'django_cached'}, set(report['engines']))
+        for result in report['engines'].values():
+            self.assertGreater(result['per_card_us'], 0)
+            self.assertEqual(set(result['render_ms']), {'mean', 'p50', 'p95'})
+
+    def test_jinja2_pages_match_django_markup(self):
+        self.client.force_login(self.user)
+        pages = [reverse('notes_list'), reverse('profile', args=[self.user.username])]
+        django_pages = [self.client.get(url).content.decode() for url in pages]
+        cache.clear()
+        with override_settings(TEMPLATES=[JINJA2_ENGINE, *settings.TEMPLATES]):
+            for url, expected in zip(pages, django_pages):
+                response = self.client.get(url)
+                # Django-шаблоны рендерят только карточки заметок при заполнении кэша
+                self.assertFalse({t.name for t in response.templates} & {'memo_board/notes_list.html',
+                                                                         'account/profile.html'})
+                self.assertEqual(re.sub(r'\s+', ' ', response.content.decode()), re.sub(r'\s+', ' ', expected))
+            self.client.force_login(self.other)
+            response = self.client.get(reverse('notes_list'))
+        self.assertContains(response, 'Pipeline &lt;Note&gt;')
+        self.assertNotContains(response, reverse('note_edit', args=[self.note.id]))
+
+
+class ImportNotesCommandTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpass')
+        self.bob = User.objects.create_user(username='bob', password='testpass')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def _call(self, *args):
+        out = io.StringIO()
+        call_command('import_notes', *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_import_validates_rows(self):
+        path = self._write('notes.csv', 'username,title,text\n'
+                                        'alice,First,Text one\n'
+                                        'bob,Second,Text two\n'
+                                        f'alice,{"x" * 51},Too long title\n'
+                                        'nobody,Orphan,Unknown user\n'
+                                        'bob,Empty text,\n'
+                                        'alice,Third,Text three\n')
+        output = self._call(path, '--batch-size', '4')
+        self.assertIn('Imported 3 notes, skipped 3 invalid records', output)
+        self.assertIn('rows/s', output)
+        self.assertEqual(sorted(Note.objects.values_list('title', 'user__username')),
+                         [('First', 'alice'), ('Second', 'bob'), ('Third', 'alice')])
+        self.assertFalse(os.path.exists(path + '.checkpoint'))
+
+    def test_usernames_are_resolved_once_per_batch(self):
+        lines = ''.join(f'{{"username": "alice", "title": "Note {i}", "text": "text"}}\n' for i in range(6))
+        path = self._write('notes.ndjson', lines)
+        with capture_queries() as stats:
+            self._call(path, '--batch-size', '3')
+        self.assertEqual(Note.objects.count(), 6)
+        # имя пользователя ищется в БД один раз, следующие пакеты берут id из кэша
+        self.assertEqual(sum(n for sql, n in stats.shapes.items() if 'auth_user' in sql), 1)
+
+    def test_resume_from_checkpoint(self):
+        path = self._write('notes.csv', 'username,title,text\n' + ''.join(f'bob,Note {i},text\n' for i in range(5)))
+        with open(path + '.checkpoint', 'w') as f:
+            json.dump({'records': 3, 'imported': 3, 'skipped': 0}, f)
+        output = self._call(path, '--resume', '--batch-size', '10')
+        self.assertIn('Resuming after 3 records', output)
+        self.assertEqual(sorted(Note.objects.values_list('title', flat=True)), ['Note 3', 'Note 4'])
+
+
+@override_settings(ROOT_URLCONF='project.async_urls', QUERY_BUDGET_STRICT=True)
+class AsyncNoteViewsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='otheruser', password='testpass')
+        self.note = Note.objects.create(title='Async Note', text='text', user=self.user)
+        self.async_client.force_login(self.user)
+
+    def test_views_are_async(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('notes_list')).func))
+
+    async def test_notes_list(self):
+        response = await self.async_client.get(reverse('notes_list'))
+        self.assertContains(response, 'Async Note')
+
+    async def test_notes_list_conditional_get(self):
+        response = await self.async_client.get(reverse('notes_list'))
+        response = await self.async_client.get(reverse('notes_list'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_login_required(self):
+        url = reverse('note_create')
+        response = await AsyncClient().get(url)
+        self.assertRedirects(response, reverse('login') + '?next=' + url, fetch_redirect_response=False)
+
+    async def test_create_edit_delete(self):
+        response = await self.async_client.post(reverse('note_create'), {'title': 'Created', 'text': 'text'})
+        self.assertRedirects(response, reverse('notes_list'), fetch_redirect_response=False)
+        created = await Note.objects.aget(title='Created')
+        self.assertEqual(created.user_id, self.user.id)
+
+        url = reverse('note_edit', args=[created.id])
+        response = await self.async_client.post(url, {'title': 'Edited', 'text': 'edited'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await Note.objects.filter(pk=created.id, title='Edited').aexists())
+
+        response = await self.async_client.post(reverse('note_delete', args=[created.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await Note.objects.filter(pk=created.id).aexists())
+        response = await self.async_client.post(reverse('note_delete', args=[created.id]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_foreign_note_is_forbidden(self):
+        foreign = await Note.objects.acreate(title='Foreign', text='text', user=self.other)
+        response = await self.async_client.get(reverse('note_edit', args=[foreign.id]))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.post(reverse('note_delete', args=[foreign.id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual((await self.async_client.get(reverse('note_edit', args=[999999]))).status_code, 404)
+
+
+class LocalBrokerTestCase(TestCase):
+    async def test_subscriber_receives_published_events(self):
+        broker = LocalBroker(buffer_size=10)
+        subscription = await broker.subscribe()
+        event_id = broker.publish({'type': 'deleted', 'id': 1})
+        self.assertEqual(await subscription.get(1), (event_id, {'type': 'deleted', 'id': 1}))
+        self.assertIsNone(await subscription.get(0.01))
+        await subscription.aclose()
+
+    async def test_resume_from_last_event_id(self):
+        broker = LocalBroker(buffer_size=3)
+        ids = [broker.publish({'type': 'deleted', 'id': n}) for n in range(5)]
+        subscription = await broker.subscribe(ids[2])
+        self.assertEqual([(await subscription.get(1))[0] for _ in range(2)], ids[3:])
+
+        for last_event_id in (ids[0], '1-1', 'garbage'):
+            subscription = await broker.subscribe(last_event_id)
+            self.assertEqual((await subscription.get(1))[1], {'type': 'reset'})
+
+    async def test_slow_subscriber_gets_reset(self):
+        broker = LocalBroker(buffer_size=2)
+        subscription = await broker.subscribe()
+        for n in range(3):
+            broker.publish({'type': 'deleted', 'id': n})
+        await asyncio.sleep(0)
+        self.assertEqual((await subscription.get(1))[1], {'type': 'reset'})
+        self.assertIsNone(await subscription.get(0.01))
+
+
+@override_settings(ROOT_URLCONF='project.async_urls', ASYNC_VIEWS=True, NOTES_EVENTS_HEARTBEAT=0.05,
+                   NOTES_EVENTS_MAX_AGE=0.2)
+class NoteEventsTestCase(TestCase):
+    def setUp(self):
+        get_broker.cache_clear()
+        self.addCleanup(get_broker.cache_clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='otheruser', password='testpass')
+        self.note = Note.objects.create(title='Live Note', text='text', user=self.user)
+        self.clients = {}
+        for user in (self.user, self.other):
+            self.clients[user.username] = AsyncClient()
+            self.clients[user.username].force_login(user)
+
+    def test_signals_publish_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            note = Note.objects.create(title='Created Live', text='text', user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            note.title = 'Edited Live'
+            note.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        events = [data for _, data in get_broker()._buffer]
+        self.assertEqual([data['type'] for data in events], ['created', 'updated', 'deleted'])
+        self.assertIn('Created Live', events[0]['html'])
+        self.assertEqual(events[2]['id'], events[0]['id'])
+
+    @override_settings(ASYNC_VIEWS=False)
+    def test_nothing_is_published_without_async_views(self):
+        with mock.patch('memo_board.events.render_note_cards') as render_cards:
+            with self.captureOnCommitCallbacks(execute=True):
+                Note.objects.create(title='Unseen', text='text', user=self.user)
+            self.client.force_login(self.user)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('note_batch'), json.dumps({'create': [{'title': 'Batch', 'text': 'text'}]}),
+                                 content_type='application/json')
+        render_cards.assert_not_called()
+        self.assertFalse(get_broker()._buffer)
+
+    def test_batch_publishes_note_events(self):
+        doomed = Note.objects.create(title='Doomed', text='text', user=self.user)
+        get_broker()._buffer.clear()
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('note_batch'), json.dumps({
+                'create': [{'title': 'Batch', 'text': 'text'}],
+                'update': [{'id': self.note.id, 'title': 'Batch Edit', 'text': 'text'}],
+                'delete': [doomed.id],
+            }), content_type='application/json')
+        events = [data for _, data in get_broker()._buffer]
+        self.assertEqual([data['type'] for data in events], ['created', 'updated', 'deleted'])
+        self.assertIn('Batch', events[0]['html'])
+        self.assertEqual(events[0]['id'], Note.objects.get(title='Batch').id)
+        self.assertEqual(events[1]['id'], self.note.id)
+        self.assertIn(self.note.created_at.strftime('%d-%m-%Y'), events[1]['html'])
+        self.assertEqual(events[2], {'type': 'deleted', 'id': doomed.id})
+
+    def test_batch_without_created_ids_publishes_reset(self):
+        # bulk_create в MySQL не возвращает id созданных заметок
+        publish_note_batch([Note(title='Batch', text='text', user=self.user)], [], [])
+        self.assertEqual(get_broker()._buffer[-1][1], {'type': 'reset'})
+
+    async def _read_stream(self, user, **headers):
+        response = await self.clients[user.username].get(reverse('note_events'), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_stream_resumes_and_renders_controls_per_viewer(self):
+        broker = get_broker()
+        first = broker.publish({'type': 'deleted', 'id': 999})
+        card = {'type': 'updated', 'id': self.note.id, 'user_id': self.user.id, 'html': '<div>Live Note</div>'}
+        second = broker.publish(card)
+
+        body = await self._read_stream(self.user, **{'Last-Event-ID': first})
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn(f'id: {second}\nevent: updated\n', body)
+        self.assertNotIn(f'id: {first}\n', body)
+        self.assertIn(reverse('note_edit', args=[self.note.id]), body)
+        self.assertIn(': keepalive', body)
+
+        body = await self._read_stream(self.other, **{'Last-Event-ID': first})
+        self.assertIn('Live Note', body)
+        self.assertNotIn(reverse('note_edit', args=[self.note.id]), body)
+
+    async def test_login_required(self):
+        response = await AsyncClient().get(reverse('note_events'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_notes_list_links_live_feed(self):
+        response = await self.clients['testuser'].get(reverse('notes_list'))
+        self.assertContains(response, f'data-events-url="{reverse("note_events")}"')
+        self.assertContains(response, f'data-note-id="{self.note.id}"')
@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.base_views, name='base_views'),
     path('notes-list/', views.notes_list, name='notes_list'),
+    path('notes/search/', views.note_search, name='note_search'),
+    path('notes/batch/', views.note_batch, name='note_batch'),
+    path('notes/export/', views.note_export, name='note_export'),
     path('note-create/', views.note_create, name='note_create'),
     path('note-edit/<int:item_id>/', views.note_edit, name='note_edit'),
     path('note-delete/<int:item_id>/', views.note_delete, name='note_delete'),
@@ -1,13 +1,32 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect, HttpResponseForbidden, HttpResponse, HttpRequest, HttpResponseNotFound
+from django.core.paginator import Paginator
+from django.http import (HttpResponseRedirect, HttpResponseForbidden, HttpResponse, HttpRequest, HttpResponseNotFound,
+                         JsonResponse, StreamingHttpResponse, HttpResponseBadRequest)
 from django.shortcuts import render, reverse, get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import condition, require_POST
+import json
+from datetime import datetime, time
 from typing import Union
 
+from project.query_budget import query_budget
+from project.ratelimit import rate_limit
 from .models import Note
 from .forms import NoteForm
+from .batch import BatchError, apply_note_batch
+from .cache import get_notes_page, get_notes_state, notes_validators
+from .export import EXPORT_FORMATS, iter_note_rows
+from .search import search_notes
+
+# общий лимит изменений заметок одним пользователем (note_create, note_edit, note_delete, note_batch)
+NOTE_WRITE_RATE = '60/m'
 
 
 @login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE)
+@query_budget(7)
 def note_create(request: HttpRequest) -> HttpResponse:
     """
         Создает новую заметку.
@@ -31,6 +50,8 @@ def note_create(request: HttpRequest) -> HttpResponse:
 
 
 @login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE)
+@query_budget(5)
 def note_edit(request: HttpRequest, item_id: int) -> Union[HttpResponse, HttpResponseForbidden]:
     """
         Редактирует существующую заметку.
@@ -54,6 +75,7 @@ def note_edit(request: HttpRequest, item_id: int) -> Union[HttpResponse, HttpRes
 
 
 @login_required
+@rate_limit('note_write', user=NOTE_WRITE_RATE, methods=None)
 def note_delete(request: HttpRequest, item_id: int) -> Union[HttpResponse, HttpResponseNotFound]:
     """
         Удаляет существующую заметку.
@@ -77,9 +99,94 @@ def note_delete(request: HttpRequest, item_id: int) -> Union[HttpResponse, HttpR
 
 
 @login_required
+@require_POST
+@rate_limit('note_write', user=NOTE_WRITE_RATE)
+@query_budget(10)
+def note_batch(request: HttpRequest) -> JsonResponse:
+    """
+        Создает, изменяет и удаляет несколько заметок одним запросом.
+
+        Тело запроса - JSON вида {"create": [...], "update": [...], "delete": [...]}.
+        Пакет применяется в одной транзакции целиком или не применяется вовсе.
+
+        Args:
+            request: HttpRequest объект.
+
+        Returns:
+            JsonResponse с количеством обработанных заметок или с ошибками по элементам пакета
+            (400 - некорректные данные, 403 - чужие заметки, 404 - несуществующие заметки).
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'errors': {'__all__': ['Некорректный JSON']}}, status=400)
+    try:
+        result = apply_note_batch(request.user, payload)
+    except BatchError as error:
+        return JsonResponse({'errors': error.errors}, status=error.status)
+    return JsonResponse(result)
+
+
+@login_required
+def note_export(request: HttpRequest) -> Union[StreamingHttpResponse, HttpResponseBadRequest]:
+    """
+        Выгружает заметки текущего пользователя потоком в CSV или NDJSON.
+
+        Args:
+            request: HttpRequest объект с параметрами format (csv или ndjson),
+                since (дата или дата и время ISO 8601, необязательный) и archived
+                (1 - выгрузить и архивные заметки).
+
+        Returns:
+            StreamingHttpResponse с файлом выгрузки или HttpResponseBadRequest
+            при неизвестном формате или некорректной дате.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    since = None
+    if request.GET.get('since'):
+        value = request.GET['since']
+        try:
+            since = parse_datetime(value) or parse_date(value)
+        except ValueError:
+            since = None
+        if since is None:
+            return HttpResponseBadRequest('Некорректная дата since')
+        if not isinstance(since, datetime):
+            since = datetime.combine(since, time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    stream, content_type = EXPORT_FORMATS[export_format]
+    rows = iter_note_rows(request.user, since, archived=request.GET.get('archived') == '1')
+    response = StreamingHttpResponse(stream(rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="notes.{export_format}"'
+    return response
+
+
+def _notes_validators(request: HttpRequest) -> tuple:
+    # condition вызывает функции ETag и Last-Modified по отдельности
+    if not hasattr(request, '_notes_validators'):
+        request._notes_validators = notes_validators(get_notes_state(), request.user)
+    return request._notes_validators
+
+
+def notes_list_budget(request: HttpRequest) -> int:
+    # страница с архивом выбирает строки из двух таблиц (см. MergedKeysetPaginator)
+    return 5 if request.GET.get('archived') == '1' else 4
+
+
+@login_required
+@query_budget(notes_list_budget)
+@condition(etag_func=lambda request: _notes_validators(request)[0],
+           last_modified_func=lambda request: _notes_validators(request)[1])
 def notes_list(request: HttpRequest) -> HttpResponse:
     """
-        Отображает список всех заметок.
+        Отображает страницу списка заметок.
+
+        Страницы выбираются курсорами after/before из GET-параметров
+        (keyset-пагинация по created_at и id) и берутся из версионного кэша.
+        Если список не менялся, возвращается 304 без выборки заметок.
 
         Args:
             request: HttpRequest объект.
@@ -87,11 +194,32 @@ def notes_list(request: HttpRequest) -> HttpResponse:
         Returns:
             HttpResponse объект с отображением списка заметок.
     """
-    notes_list = Note.objects.all().order_by('-user')
-    context = {'notes_list': notes_list}
+    archived = request.GET.get('archived') == '1'
+    page = get_notes_page(request.GET.get('after'), request.GET.get('before'), archived)
+    context = {'notes_list': page.object_list, 'page': page, 'archived': archived}
     return render(request, 'memo_board/notes_list.html', context=context)
 
 
+@login_required
+@query_budget(5)
+def note_search(request: HttpRequest) -> HttpResponse:
+    """
+        Ищет заметки по заголовку и тексту.
+
+        Args:
+            request: HttpRequest объект с параметрами q (строка поиска) и page (номер страницы).
+
+        Returns:
+            HttpResponse объект со страницей найденных заметок, упорядоченных по релевантности.
+    """
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        paginator = Paginator(search_notes(query).select_related('user'), settings.NOTES_PER_PAGE)
+        page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'memo_board/note_search.html', {'query': query, 'page': page})
+
+
 def base_views(request: HttpRequest) -> HttpResponse:
     """
         Отображает базовый шаблон страницы.
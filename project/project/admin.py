@@ -0,0 +1,94 @@
+"""
+Общие средства для страниц списков админки на больших таблицах.
+
+* EstimatedCountPaginator не выполняет COUNT(*) по всей таблице: для
+  списка без фильтров на MySQL число строк берется из статистики таблицы
+  (information_schema.TABLES.TABLE_ROWS), которая на InnoDB приблизительна.
+  Вместе с show_full_result_count = False страница списка не считает
+  строки таблицы полностью ни разу.
+* AutocompleteFilter - фильтр списка по внешнему ключу с полем
+  автодополнения вместо списка всех связанных объектов; выбранный объект
+  фильтрует список по индексированному столбцу внешнего ключа.
+"""
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms import ModelChoiceField
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, оценивающий размер нефильтрованного списка по статистике таблицы."""
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is not None and not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return super().count
+
+
+def estimate_table_rows(model, using: str):
+    """
+    Возвращает оценку числа строк таблицы модели по статистике СУБД.
+
+    Args:
+        model: Модель, таблицу которой нужно оценить.
+        using: Псевдоним базы данных.
+
+    Returns:
+        Оценка числа строк или None, если СУБД не ведет такой статистики.
+    """
+    connection = connections[using]
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                       'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр по внешнему ключу с автодополнением.
+
+    Использует представление автодополнения админки, поэтому у админки
+    связанной модели должны быть заданы search_fields.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path) -> None:
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'data-filter-param': self.lookup_kwarg}),
+            required=False,
+        )
+
+    def has_output(self) -> bool:
+        return True
+
+    def expected_parameters(self) -> list:
+        return [self.lookup_kwarg]
+
+    @property
+    def widget(self) -> str:
+        return self.form_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+    @property
+    def media(self):
+        return self.form_field.widget.media
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'Все',
+        }
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.STATIC_SERVE:
+    from project.static_serving import StaticFilesASGI  # noqa: E402
+
+    application = StaticFilesASGI(application)
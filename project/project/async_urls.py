@@ -0,0 +1,20 @@
+"""
+URL-конфигурация для ASGI-развертывания (ASYNC_VIEWS=True).
+
+Асинхронные версии представлений перекрывают синхронные с теми же путями и
+именами; остальные маршруты берутся из project.urls.
+"""
+from django.urls import path, include
+
+from account import async_views as account_views
+from memo_board import async_views as memo_board_views
+
+urlpatterns = [
+    path('notes-list/', memo_board_views.notes_list, name='notes_list'),
+    path('note-create/', memo_board_views.note_create, name='note_create'),
+    path('note-edit/<int:item_id>/', memo_board_views.note_edit, name='note_edit'),
+    path('note-delete/<int:item_id>/', memo_board_views.note_delete, name='note_delete'),
+    path('notes/events/', memo_board_views.note_events, name='note_events'),
+    path('profile/<str:username>/', account_views.profile, name='profile'),
+    path('', include('project.urls')),
+]
@@ -0,0 +1,154 @@
+"""
+Нагрузочные замеры представлений внутри процесса.
+
+run_scenario выполняет запросы сценария тестовым клиентом Django в
+нескольких потоках (каждый поток со своим клиентом и соединением с БД) и
+собирает время ответа, число SQL-запросов на HTTP-запрос и пропускную
+способность. Результат - словарь, сериализуемый в JSON, чтобы замеры разных
+коммитов можно было сравнить (compare_results).
+
+Замеры проходят через весь стек middleware, но без сети и HTTP-сервера,
+поэтому показывают стоимость кода приложения и БД, а не сервера.
+"""
+import math
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from django.db import connections
+from django.test import Client
+
+from .query_budget import capture_queries
+
+# Request(client, номер запроса) выполняет один HTTP-запрос и возвращает ответ
+Request = Callable[[Client, int], object]
+
+
+@dataclass
+class Scenario:
+    """Сценарий замера: функция запроса и пользователи, от имени которых он выполняется."""
+
+    name: str
+    request: Request
+    users: List = field(default_factory=list)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Возвращает перцентиль методом ближайшего ранга.
+
+    Args:
+        values: Отсортированные значения.
+        percent: Перцентиль от 0 до 100.
+
+    Returns:
+        Значение перцентиля или 0.0 для пустого списка.
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def _worker(scenario: Scenario, numbers: List[int], host: str, latencies: List[float], queries: List[int],
+            errors: List[str], index: int) -> None:
+    client = Client(HTTP_HOST=host)
+    if scenario.users:
+        client.force_login(scenario.users[index % len(scenario.users)])
+    try:
+        for number in numbers:
+            start = time.perf_counter()
+            try:
+                with capture_queries() as stats:
+                    response = scenario.request(client, number)
+                if response.status_code >= 400:
+                    errors.append(f'HTTP {response.status_code}')
+            except Exception as error:
+                errors.append(type(error).__name__)
+                continue
+            latencies.append(time.perf_counter() - start)
+            queries.append(stats.count)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def run_scenario(scenario: Scenario, requests: int, concurrency: int, host: str = 'localhost') -> Dict[str, object]:
+    """
+    Выполняет сценарий и возвращает его показатели.
+
+    Args:
+        scenario: Сценарий замера.
+        requests: Общее число запросов.
+        concurrency: Число параллельных клиентов (потоков); при 1 запросы
+            выполняются в текущем потоке.
+        host: Заголовок Host запросов (должен входить в ALLOWED_HOSTS).
+
+    Returns:
+        Словарь с числом запросов и ошибок, пропускной способностью (запросов
+        в секунду), перцентилями времени ответа в миллисекундах и числом
+        SQL-запросов на HTTP-запрос.
+    """
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors: List[str] = []
+    shares = [list(range(i, requests, concurrency)) for i in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        _worker(scenario, shares[0], host, latencies, queries, errors, 0)
+    else:
+        threads = [threading.Thread(target=_worker, args=(scenario, share, host, latencies, queries, errors, i))
+                   for i, share in enumerate(shares)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'error_kinds': sorted(set(errors)),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+            'p50': round(percentile(latencies, 50) * 1000, 3),
+            'p95': round(percentile(latencies, 95) * 1000, 3),
+            'p99': round(percentile(latencies, 99) * 1000, 3),
+        },
+        'queries_per_request': {
+            'mean': round(statistics.fmean(queries), 2) if queries else 0.0,
+            'max': max(queries, default=0),
+        },
+    }
+
+
+def compare_results(baseline: Dict[str, Dict], current: Dict[str, Dict]) -> List[Dict[str, object]]:
+    """
+    Сравнивает показатели сценариев с базовым замером.
+
+    Args:
+        baseline: Словарь scenarios из сохраненного результата.
+        current: Словарь scenarios текущего замера.
+
+    Returns:
+        Строки сравнения: сценарий, показатель, базовое и текущее значение и
+        изменение в процентах (None, если базовое значение нулевое).
+    """
+    rows = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, path in (('p50_ms', ('latency_ms', 'p50')), ('p95_ms', ('latency_ms', 'p95')),
+                             ('p99_ms', ('latency_ms', 'p99')), ('queries', ('queries_per_request', 'mean')),
+                             ('rps', ('throughput_rps',))):
+            before, after = base, result
+            for key in path:
+                before, after = before.get(key, 0), after.get(key, 0)
+            change: Optional[float] = round((after - before) / before * 100, 1) if before else None
+            rows.append({'scenario': name, 'metric': metric, 'baseline': before, 'current': after, 'change': change})
+    return rows
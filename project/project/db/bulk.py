@@ -0,0 +1,43 @@
+"""
+Массовое удаление строк без загрузки объектов.
+
+QuerySet.delete() при подключенных приемниках pre_delete/post_delete
+загружает все удаляемые объекты и отправляет сигналы для каждого из них.
+Там, где последствия удаления (кэш, статистика, живая лента) обновляются
+один раз на пакет, delete_rows удаляет строки явным DELETE по первичным
+ключам: без сигналов и без каскада, поэтому вызывающий код сам отвечает за
+связанные строки.
+"""
+from typing import Iterable
+
+from django.db import connections, router
+
+
+def delete_rows(model, ids: Iterable, using: str = None) -> int:
+    """
+        Удаляет строки модели по первичным ключам запросом DELETE ... WHERE pk IN (...).
+
+        Args:
+            model: Класс модели.
+            ids: Первичные ключи удаляемых строк.
+            using: Псевдоним БД; по умолчанию БД записи модели.
+
+        Returns:
+            Число удаленных строк.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    connection = connections[using or router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    pk_column = quote_name(model._meta.pk.column)
+    batch_size = connection.ops.bulk_batch_size([model._meta.pk], ids) or len(ids)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f'DELETE FROM {table} WHERE {pk_column} IN ({placeholders})', chunk)
+            deleted += cursor.rowcount
+    return deleted
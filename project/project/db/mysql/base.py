@@ -0,0 +1,8 @@
+"""MySQL-бэкенд с пулом соединений (см. project.db.pool)."""
+from django.db.backends.mysql import base
+
+from project.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,250 @@
+"""
+Пул соединений с БД для бэкендов project.db.mysql и project.db.sqlite3.
+
+Django держит по соединению на поток и при CONN_MAX_AGE = 0 закрывает его в
+конце каждого запроса, а при CONN_MAX_AGE > 0 - держит открытым в потоке,
+что не подходит для ASGI, где потоков у синхронного кода нет постоянных.
+С пулом (DATABASES[...]['POOL']['SIZE'] > 0) закрытие соединения Django
+возвращает его в общий для процесса пул, а следующее открытие в любом потоке
+берет свободное соединение из пула без установки нового.
+
+Настройки POOL:
+
+* SIZE - максимальное число соединений процесса (0 отключает пул);
+* TIMEOUT - сколько секунд ждать свободного соединения;
+* MAX_LIFETIME - через сколько секунд соединение закрывается вместо возврата;
+* HEALTH_CHECK_INTERVAL - соединение, простаивавшее дольше, перед выдачей
+  проверяется запросом SELECT 1.
+
+Состояние пулов отдается метриками db_pool_* (см. project.metrics).
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from django.db.utils import OperationalError
+
+from project import metrics
+
+
+class PoolTimeout(OperationalError):
+    """За TIMEOUT секунд в пуле не освободилось ни одного соединения."""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений DB-API."""
+
+    def __init__(self, name: str, connect: Callable, is_usable: Callable, size: int, timeout: float = 5.0,
+                 max_lifetime: float = 3600.0, health_check_interval: float = 30.0) -> None:
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._is_usable = is_usable
+        # свободные соединения: (соединение, время создания, время возврата)
+        self._idle: Deque[Tuple[object, float, float]] = deque()
+        self._created_at: Dict[int, float] = {}
+        self._open = 0
+        self._condition = threading.Condition()
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._open - len(self._idle)
+
+    def _close_raw(self, connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _forget(self, connection) -> None:
+        self._created_at.pop(id(connection), None)
+        self._open -= 1
+        self._condition.notify()
+
+    def acquire(self) -> Tuple[object, bool]:
+        """
+        Выдает соединение из пула или открывает новое.
+
+        Returns:
+            Пара (соединение, True если соединение уже использовалось).
+
+        Raises:
+            PoolTimeout: Если за timeout секунд соединение не освободилось.
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while True:
+            connection = None
+            with self._condition:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        pool_timeouts.inc(pool=self.name)
+                        raise PoolTimeout(f'No free connection in pool {self.name} after {self.timeout} s')
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, created_at, released_at = self._idle.pop()
+                else:
+                    self._open += 1
+            if connection is None:
+                break
+            now = time.monotonic()
+            if now - created_at < self.max_lifetime and (
+                    now - released_at < self.health_check_interval or self._is_usable(connection)):
+                self._observe(start, waited)
+                return connection, True
+            if now - created_at < self.max_lifetime:
+                pool_health_check_failures.inc(pool=self.name)
+            self._close_raw(connection)
+            with self._condition:
+                self._forget(connection)
+
+        try:
+            connection = self._connect()
+        except BaseException:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+        pool_connections_created.inc(pool=self.name)
+        self._observe(start, waited)
+        return connection, False
+
+    def _observe(self, start: float, waited: bool) -> None:
+        pool_checkout_seconds.observe(time.perf_counter() - start, pool=self.name)
+        if waited:
+            pool_waits.inc(pool=self.name)
+
+    def release(self, connection, discard: bool = False) -> None:
+        """
+        Возвращает соединение в пул.
+
+        Args:
+            connection: Соединение, выданное acquire.
+            discard: Закрыть соединение вместо возврата (например, если его
+                состояние неизвестно после ошибки).
+        """
+        now = time.monotonic()
+        with self._condition:
+            created_at = self._created_at.get(id(connection), now)
+            if not discard and now - created_at < self.max_lifetime:
+                self._idle.append((connection, created_at, now))
+                self._condition.notify()
+                return
+            self._forget(connection)
+        self._close_raw(connection)
+
+    def close_idle(self) -> None:
+        """Закрывает все свободные соединения."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            for connection, _, _ in idle:
+                self._forget(connection)
+        for connection, _, _ in idle:
+            self._close_raw(connection)
+
+
+_pools: Dict[Hashable, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key: Hashable, factory: Callable[[], ConnectionPool]) -> ConnectionPool:
+    """Возвращает пул процесса для ключа, создавая его при первом обращении."""
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = factory()
+        return _pools[key]
+
+
+def _pool_connections():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        yield {'pool': pool.name, 'state': 'idle'}, pool.idle
+        yield {'pool': pool.name, 'state': 'in_use'}, pool.in_use
+
+
+def _pool_sizes():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        yield {'pool': pool.name}, pool.size
+
+
+metrics.gauge('db_pool_connections', 'Open pooled database connections by state', _pool_connections)
+metrics.gauge('db_pool_size', 'Maximum number of connections in the pool', _pool_sizes)
+pool_checkout_seconds = metrics.histogram('db_pool_checkout_seconds', 'Time spent getting a connection from the pool')
+pool_waits = metrics.counter('db_pool_waits_total', 'Checkouts that had to wait for a free connection')
+pool_timeouts = metrics.counter('db_pool_timeouts_total', 'Checkouts that gave up waiting for a free connection')
+pool_connections_created = metrics.counter('db_pool_connections_created_total', 'New database connections opened')
+pool_health_check_failures = metrics.counter('db_pool_health_check_failures_total',
+                                             'Idle pooled connections found unusable and replaced')
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Примесь к DatabaseWrapper, берущая соединения из ConnectionPool.
+
+    Без POOL['SIZE'] бэкенд работает как стандартный.
+    """
+
+    _pool: Optional[ConnectionPool] = None
+    _pool_reused = False
+
+    def _get_pool(self, conn_params: dict) -> Optional[ConnectionPool]:
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('SIZE'):
+            return None
+        connect = super().get_new_connection
+
+        def is_usable(connection) -> bool:
+            try:
+                cursor = connection.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+                return True
+            except self.Database.Error:
+                return False
+
+        return get_pool((self.alias, repr(sorted(conn_params.items()))), lambda: ConnectionPool(
+            name=self.alias,
+            connect=lambda: connect(conn_params),
+            is_usable=is_usable,
+            size=options['SIZE'],
+            timeout=options.get('TIMEOUT', 5.0),
+            max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+            health_check_interval=options.get('HEALTH_CHECK_INTERVAL', 30.0),
+        ))
+
+    def get_new_connection(self, conn_params: dict):
+        pool = self._get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection, self._pool_reused = pool.acquire()
+        self._pool = pool
+        return connection
+
+    def init_connection_state(self) -> None:
+        # настройки сеанса соединения из пула уже выполнены при его создании
+        if not self._pool_reused:
+            super().init_connection_state()
+
+    def _close(self) -> None:
+        if self._pool is None:
+            return super()._close()
+        pool, self._pool = self._pool, None
+        # соединение в незавершенной транзакции или после ошибки в пул не возвращается
+        discard = self.in_atomic_block or self.errors_occurred or not self.autocommit
+        pool.release(self.connection, discard=discard)
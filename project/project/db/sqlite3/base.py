@@ -0,0 +1,8 @@
+"""SQLite-бэкенд с пулом соединений (см. project.db.pool); используется для разработки и тестов."""
+from django.db.backends.sqlite3 import base
+
+from project.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,40 @@
+from functools import wraps
+from typing import Callable, Union
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpRequest, HttpResponse
+
+
+def _load_user(request: HttpRequest) -> Union[User, AnonymousUser]:
+    user = request.user
+    user.is_authenticated  # noqa: B018 - обращение вычисляет ленивый объект
+    return user
+
+
+async def aget_user(request: HttpRequest) -> Union[User, AnonymousUser]:
+    """
+    Загружает request.user из асинхронного кода.
+
+    request.user загружается лениво и обращается к сессии и БД, поэтому первое
+    обращение выполняется через sync_to_async. После этого request.user (в том
+    числе в шаблонах) доступен в асинхронном коде без запросов.
+    """
+    return await sync_to_async(_load_user)(request)
+
+
+def async_login_required(view_func: Callable) -> Callable:
+    """
+    Аналог login_required для асинхронных представлений.
+
+    Неаутентифицированный пользователь перенаправляется на LOGIN_URL с параметром
+    next, как и в login_required.
+    """
+    @wraps(view_func)
+    async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,41 @@
+"""
+Окружение Jinja2 для страниц с быстрым путем рендеринга (JINJA2_TEMPLATES).
+
+Шаблоны лежат в templates/jinja2 и повторяют разметку шаблонов Django тех же
+имен. В окружение добавлены функции static, url и optional_url и фильтр date с форматами
+Django, которых нет в Jinja2.
+"""
+from django.templatetags.static import static
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.formats import date_format
+from jinja2 import Environment
+
+
+def url(name: str, *args, **kwargs) -> str:
+    """Аналог тега {% url %}: url('profile', username=...)."""
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+def optional_url(name: str, *args, **kwargs) -> str:
+    """Аналог {% url ... as var %}: пустая строка, если маршрута нет (например, note_events без ASYNC_VIEWS)."""
+    try:
+        return url(name, *args, **kwargs)
+    except NoReverseMatch:
+        return ''
+
+
+def date(value, format_string=None) -> str:
+    """Аналог фильтра date: время выводится в текущем часовом поясе."""
+    if not value:
+        return ''
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return date_format(value, format_string)
+
+
+def environment(**options) -> Environment:
+    env = Environment(**options)
+    env.globals.update({'static': static, 'url': url, 'optional_url': optional_url})
+    env.filters['date'] = date
+    return env
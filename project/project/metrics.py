@@ -0,0 +1,153 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Минимальная реализация счетчиков, гистограмм и вычисляемых показателей без
+внешних зависимостей. Метрики хранятся в памяти процесса: при нескольких
+процессах сервера каждый отдает свои значения. Страница /metrics/ включается
+настройкой METRICS_ENABLED.
+"""
+import bisect
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Counter:
+    """Монотонно растущий счетчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self._lock:
+            self._values[_labels(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Распределение значений по корзинам (например, длительностей)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_labels(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> Iterable[Sample]:
+        result = []
+        with self._lock:
+            for labels, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    result.append((f'{self.name}_bucket', labels + (('le', repr(bound)),), cumulative))
+                result.append((f'{self.name}_bucket', labels + (('le', '+Inf'),), count))
+                result.append((f'{self.name}_sum', labels, total))
+                result.append((f'{self.name}_count', labels, count))
+        return result
+
+
+class GaugeFunction:
+    """Показатель, вычисляемый в момент чтения метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Tuple[dict, float]]]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._collect = collect
+
+    def samples(self) -> Iterable[Sample]:
+        return [(self.name, _labels(labels), value) for labels, value in self._collect()]
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self) -> None:
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                rendered = ','.join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f'{name}{{{rendered}}} {value}' if rendered else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str) -> Counter:
+    return registry.register(Counter(name, documentation))
+
+
+def histogram(name: str, documentation: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, buckets))
+
+
+def gauge(name: str, documentation: str, collect: Callable[[], Iterable[Tuple[dict, float]]]) -> GaugeFunction:
+    return registry.register(GaugeFunction(name, documentation, collect))
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Отдает метрики процесса для Prometheus.
+
+    Args:
+        request: HTTP-запрос.
+
+    Returns:
+        Текст метрик или 404, если METRICS_ENABLED выключена.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
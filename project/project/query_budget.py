@@ -0,0 +1,180 @@
+"""
+Учет SQL-запросов на уровне HTTP-запроса.
+
+QueryBudgetMiddleware считает запросы и суммарное время работы с БД для
+каждого HTTP-запроса, находит повторяющиеся запросы одной формы (признак
+N+1) и сверяет число запросов с бюджетом, объявленным у представления
+декоратором query_budget. В режиме QUERY_BUDGET_STRICT нарушение бюджета
+вызывает исключение (используется в тестах), иначе пишется предупреждение
+в лог.
+"""
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_current_stats: contextvars.ContextVar = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше запросов, чем разрешает его бюджет."""
+
+
+class QueryStats:
+    """Статистика SQL-запросов, выполненных в рамках одного учета."""
+
+    def __init__(self, parent: Optional['QueryStats'] = None) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+        # внешний учет, в который тоже попадают запросы вложенного
+        self.parent = parent
+
+    def record(self, sql: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        # параметры передаются отдельно от SQL, поэтому текст запроса и есть его форма
+        self.shapes[sql] += 1
+        if self.parent is not None:
+            self.parent.record(sql, duration)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+            Возвращает формы запросов, выполненные не менее threshold раз.
+
+            Args:
+                threshold: Минимальное число повторов.
+
+            Returns:
+                Список пар (SQL, число повторов).
+        """
+        return [(sql, n) for sql, n in self.shapes.most_common() if n >= threshold]
+
+
+def _record_query(execute: Callable, sql: str, params, many: bool, context: dict):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection, **kwargs) -> None:
+    """Подключает учет запросов к соединению с БД (повторный вызов ничего не делает)."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='project.query_budget')
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """
+        Контекстный менеджер, собирающий статистику запросов внутри блока.
+
+        Учет привязан к contextvars, поэтому запросы из sync_to_async
+        тоже попадают в статистику. Запросы вложенного блока учитываются
+        и во внешнем.
+
+        Returns:
+            Объект QueryStats, заполняемый по мере выполнения запросов.
+    """
+    for connection in connections.all():
+        install_query_recorder(connection)
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def query_budget(max_queries: Union[int, Callable[[HttpRequest], int]]) -> Callable:
+    """
+        Декоратор, объявляющий максимальное число SQL-запросов представления.
+
+        Args:
+            max_queries: Допустимое число запросов на один HTTP-запрос,
+                включая загрузку сессии и пользователя, или функция, получающая
+                HttpRequest и возвращающая это число (если оно зависит от
+                параметров запроса).
+    """
+    def decorator(view_func: Callable) -> Callable:
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def check_query_budget(stats: QueryStats, budget: Optional[int], view_name: str) -> None:
+    """
+        Сверяет статистику запросов с бюджетом и ищет повторяющиеся запросы.
+
+        Args:
+            stats: Собранная статистика.
+            budget: Бюджет представления или None, если он не объявлен.
+            view_name: Имя представления для сообщения.
+
+        Raises:
+            QueryBudgetExceeded: Если включен QUERY_BUDGET_STRICT и найдено нарушение.
+    """
+    problems = []
+    if budget is not None and stats.count > budget:
+        problems.append(f'{stats.count} queries exceed budget of {budget}')
+    for sql, n in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+        problems.append(f'query repeated {n} times: {sql}')
+    if not problems:
+        return
+    message = f'{view_name} ({stats.duration * 1000:.1f} ms in DB): ' + '; '.join(problems)
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryBudgetMiddleware:
+    """Middleware, проверяющее бюджет SQL-запросов каждого представления."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with capture_queries() as stats:
+            response = self.get_response(request)
+        self._check(request, stats)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with capture_queries() as stats:
+            response = await self.get_response(request)
+        self._check(request, stats)
+        return response
+
+    @staticmethod
+    def _check(request: HttpRequest, stats: QueryStats) -> None:
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return
+        budget = getattr(match.func, 'query_budget', None)
+        if callable(budget):
+            budget = budget(request)
+        check_query_budget(stats, budget, match.view_name)
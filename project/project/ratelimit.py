@@ -0,0 +1,226 @@
+"""
+Ограничение частоты запросов к дорогим представлениям.
+
+Декоратор rate_limit задает для представления корзины токенов по IP клиента,
+по пользователю и по имени пользователя из формы (для входа: подбор пароля
+одной учетной записи с многих адресов). Каждый запрос забирает из корзины токен, а корзина
+пополняется с постоянной скоростью до своей емкости: rate '10/m' допускает
+пачку из 10 запросов и дальше в среднем 10 запросов в минуту. Запрос при
+пустой корзине получает 429 с заголовком Retry-After.
+
+Состояние корзин хранится в хранилище, заданном RATELIMIT_STORE: 'cache' -
+общий кэш Django (корзины общие для всех процессов), 'local' - память
+процесса. Хранилище в кэше читает и записывает корзину без блокировки, поэтому
+одновременные запросы могут пропустить несколько лишних запросов сверх
+лимита. Если хранилище недоступно, запрос пропускается.
+
+Решения учитываются счетчиками ratelimit_allowed_total и
+ratelimit_throttled_total на странице /metrics/.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from . import metrics
+from .decorators import aget_user
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+ratelimit_allowed = metrics.counter('ratelimit_allowed_total', 'Requests allowed by rate limits')
+ratelimit_throttled = metrics.counter('ratelimit_throttled_total', 'Requests rejected with 429 by rate limits')
+
+# состояние корзины: число токенов и время последнего пересчета
+Bucket = Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class Rate:
+    """Емкость корзины и время ее полного пополнения в секундах."""
+
+    capacity: int
+    period: float
+
+    @property
+    def per_second(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_rate(value: str) -> Rate:
+    """
+    Разбирает частоту вида '10/m' (за секунду, минуту, час или день: s, m, h, d).
+
+    Raises:
+        ValueError: Если строка не задает частоту.
+    """
+    count, _, period = value.partition('/')
+    if period not in PERIODS or not count.isdigit() or int(count) <= 0:
+        raise ValueError(f'Invalid rate {value!r}, expected "<count>/<s|m|h|d>"')
+    return Rate(int(count), PERIODS[period])
+
+
+def take_token(bucket: Optional[Bucket], rate: Rate, now: float) -> Tuple[Bucket, float]:
+    """
+    Пополняет корзину на прошедшее время и забирает из нее токен.
+
+    Args:
+        bucket: Состояние корзины или None для новой (полной) корзины.
+        rate: Частота корзины.
+        now: Текущее время в секундах.
+
+    Returns:
+        Новое состояние корзины и время ожидания до следующего токена в
+        секундах (0, если токен забран).
+    """
+    tokens, updated = bucket if bucket is not None else (rate.capacity, now)
+    tokens = min(rate.capacity, tokens + max(now - updated, 0) * rate.per_second)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / rate.per_second
+
+
+class LocalStore:
+    """Корзины в памяти процесса (для тестов и одного процесса)."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Bucket] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: Rate) -> float:
+        with self._lock:
+            self._buckets[key], wait = take_token(self._buckets.get(key), rate, time.monotonic())
+        return wait
+
+    async def aconsume(self, key: str, rate: Rate) -> float:
+        return self.consume(key, rate)
+
+
+class CacheStore:
+    """Корзины в кэше Django, общие для всех процессов."""
+
+    prefix = 'ratelimit:'
+
+    def consume(self, key: str, rate: Rate) -> float:
+        bucket, wait = take_token(cache.get(self.prefix + key), rate, time.time())
+        # полная корзина не отличается от отсутствующей, поэтому запись живет не дольше пополнения
+        cache.set(self.prefix + key, bucket, timeout=math.ceil(rate.period) + 1)
+        return wait
+
+    async def aconsume(self, key: str, rate: Rate) -> float:
+        bucket, wait = take_token(await cache.aget(self.prefix + key), rate, time.time())
+        await cache.aset(self.prefix + key, bucket, timeout=math.ceil(rate.period) + 1)
+        return wait
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    """Возвращает хранилище корзин, заданное RATELIMIT_STORE (одно на процесс)."""
+    if settings.RATELIMIT_STORE == 'local':
+        return LocalStore()
+    return CacheStore()
+
+
+def client_ip(request: HttpRequest) -> str:
+    """
+    Возвращает IP клиента.
+
+    Если задан RATELIMIT_IP_HEADER (например, HTTP_X_FORWARDED_FOR за
+    прокси), берется последний адрес из этого заголовка - его добавил
+    ближайший прокси, а не клиент.
+    """
+    header = settings.RATELIMIT_IP_HEADER
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def too_many_requests(wait: float) -> HttpResponse:
+    response = HttpResponse('Слишком много запросов, повторите попытку позже.', status=429,
+                            content_type='text/plain; charset=utf-8')
+    response.headers['Retry-After'] = str(max(math.ceil(wait), 1))
+    return response
+
+
+def _username_key(request: HttpRequest) -> Optional[str]:
+    # имя нормализуется, как при поиске пользователя без учета регистра, и хешируется:
+    # в ключ кэша не попадают произвольные символы из формы
+    username = request.POST.get('username', '').strip().casefold()
+    return hashlib.sha256(username.encode()).hexdigest()[:32] if username else None
+
+
+def rate_limit(scope: str, ip: Optional[str] = None, user: Optional[str] = None, username: Optional[str] = None,
+               methods: Optional[Tuple[str, ...]] = ('POST',)) -> Callable:
+    """
+    Декоратор, ограничивающий частоту запросов к представлению.
+
+    Подходит для синхронных и асинхронных представлений. Представления с
+    одинаковым scope расходуют общие корзины.
+
+    Args:
+        scope: Имя группы ограничений в ключах корзин и метриках.
+        ip: Частота для одного IP, например '10/m'.
+        user: Частота для одного аутентифицированного пользователя.
+        username: Частота для одного имени пользователя из поля username
+            POST-запроса (например, на странице входа).
+        methods: Учитываемые HTTP-методы (None - все).
+    """
+    limits = [(kind, parse_rate(value)) for kind, value in (('ip', ip), ('user', user), ('username', username))
+              if value]
+
+    def buckets(request: HttpRequest, request_user) -> List[Tuple[str, str, Rate]]:
+        keys = {'ip': client_ip(request),
+                'user': request_user.pk if request_user is not None and request_user.is_authenticated else None,
+                'username': _username_key(request) if username and request.method == 'POST' else None}
+        return [(kind, f'{scope}:{kind}:{keys[kind]}', rate) for kind, rate in limits if keys[kind]]
+
+    def applies(request: HttpRequest) -> bool:
+        return settings.RATELIMIT_ENABLED and (methods is None or request.method in methods)
+
+    def throttle(kind: str, wait: float) -> HttpResponse:
+        ratelimit_throttled.inc(scope=scope, bucket=kind)
+        return too_many_requests(wait)
+
+    def decorator(view_func: Callable) -> Callable:
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                if applies(request):
+                    request_user = await aget_user(request) if user else None
+                    for kind, key, rate in buckets(request, request_user):
+                        try:
+                            wait = await get_store().aconsume(key, rate)
+                        except Exception:
+                            logger.exception('Rate limit store failed for %s', key)
+                            continue
+                        if wait:
+                            return throttle(kind, wait)
+                    ratelimit_allowed.inc(scope=scope)
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if applies(request):
+                for kind, key, rate in buckets(request, request.user if user else None):
+                    try:
+                        wait = get_store().consume(key, rate)
+                    except Exception:
+                        logger.exception('Rate limit store failed for %s', key)
+                        continue
+                    if wait:
+                        return throttle(kind, wait)
+                ratelimit_allowed.inc(scope=scope)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
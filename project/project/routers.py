@@ -0,0 +1,157 @@
+"""
+Маршрутизация запросов между основной БД и репликами для чтения.
+
+Записи всегда идут в default. Чтения внутри HTTP-запроса распределяются
+случайно между DATABASE_REPLICAS, кроме случаев, когда реплика могла еще не
+получить свежие данные:
+
+* после записи в текущем запросе - до конца запроса;
+* в течение DB_REPLICA_STICKINESS секунд после POST (и других небезопасных
+  методов) того же клиента - ReplicaStickinessMiddleware ставит cookie;
+* внутри transaction.atomic() на основной БД - проверки и вычисления в
+  транзакции должны видеть те же данные, что и ее записи;
+* при заполнении кэша данными, измененными за последние DB_REPLICA_STICKINESS
+  секунд (mark_written / recently_written), иначе в общий кэш попала бы
+  устаревшая копия. Отметки хранятся в кэше по умолчанию и видны другим
+  процессам только если он общий (CACHE_IS_SHARED); с кэшем в памяти процесса
+  кэш всегда заполняется из основной БД.
+
+Вне HTTP-запросов (команды управления, фоновые обработчики) все запросы идут
+в default: обработчики сразу пишут по прочитанному.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest, HttpResponse
+
+_replica_reads: contextvars.ContextVar = contextvars.ContextVar('replica_reads', default=False)
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+@contextmanager
+def use_primary(enabled: bool = True) -> Iterator[None]:
+    """
+    Направляет чтения внутри блока в основную БД.
+
+    Args:
+        enabled: Если False, блок ничего не меняет (удобно для условного использования).
+    """
+    if not enabled:
+        yield
+        return
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _written_key(resource: str) -> str:
+    return f'db:written:{resource}'
+
+
+def mark_written(resource: str) -> None:
+    """Отмечает, что данные ресурса только что изменились (см. recently_written)."""
+    if settings.DATABASE_REPLICAS and settings.CACHE_IS_SHARED:
+        cache.set(_written_key(resource), True, settings.DB_REPLICA_STICKINESS)
+
+
+def recently_written(resource: str) -> bool:
+    """
+    Возвращает True, если ресурс менялся за последние DB_REPLICA_STICKINESS секунд.
+
+    С кэшем в памяти процесса отметки других процессов не видны, поэтому
+    при репликах всегда возвращается True.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return not settings.CACHE_IS_SHARED or cache.get(_written_key(resource), False)
+
+
+async def arecently_written(resource: str) -> bool:
+    """Асинхронная версия recently_written."""
+    if not settings.DATABASE_REPLICAS:
+        return False
+    return not settings.CACHE_IS_SHARED or await cache.aget(_written_key(resource), False)
+
+
+class PrimaryReplicaRouter:
+    """Роутер: записи в default, чтения в HTTP-запросах - в случайную реплику."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        # в транзакции на основной БД чтения идут туда же, иначе проверки в ней видели бы отстающую реплику
+        if settings.DATABASE_REPLICAS and _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        # после записи чтения до конца запроса идут в основную БД
+        _replica_reads.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name=None, **hints) -> bool:
+        # реплики получают схему репликацией
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Middleware, разрешающее чтения с реплик и закрепляющее клиента за основной
+    БД на DB_REPLICA_STICKINESS секунд после изменяющего запроса.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _sticky(request: HttpRequest) -> bool:
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _process_response(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        if settings.DATABASE_REPLICAS and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') \
+                and response.status_code < 400:
+            stickiness = settings.DB_REPLICA_STICKINESS
+            response.set_cookie(STICKY_COOKIE, str(time.time() + stickiness), max_age=stickiness, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _replica_reads.set(not self._sticky(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self._process_response(request, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token = _replica_reads.set(not self._sticky(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self._process_response(request, response)
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -24,7 +24,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = config('SECRET_KEY')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = config('DEBUG')
+DEBUG = config('DEBUG', cast=bool)
 
 ALLOWED_HOSTS = []
 
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "project.query_budget.QueryBudgetMiddleware",
+    "project.routers.ReplicaStickinessMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -54,38 +56,103 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "project.urls"
+# ASYNC_VIEWS=True serves the async versions of the views (for ASGI deployments).
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+ROOT_URLCONF = "project.async_urls" if ASYNC_VIEWS else "project.urls"
 
+# Compiled templates are kept in memory by the cached loader (the development server
+# clears it when a template changes). JINJA2_TEMPLATES=True renders the pages that have
+# a Jinja2 version in templates/jinja2 (the notes list and profile) with Jinja2.
+
+TEMPLATE_CONTEXT_PROCESSORS = [
+    "django.template.context_processors.debug",
+    "django.template.context_processors.request",
+    "django.contrib.auth.context_processors.auth",
+    "django.contrib.messages.context_processors.messages",
+]
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [os.path.join(BASE_DIR, 'templates')],
-        "APP_DIRS": True,
         "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.debug",
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
+            "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
             ],
         },
     },
 ]
+JINJA2_TEMPLATES = config('JINJA2_TEMPLATES', default=False, cast=bool)
+if JINJA2_TEMPLATES:
+    TEMPLATES.insert(0, {
+        "BACKEND": "django.template.backends.jinja2.Jinja2",
+        "DIRS": [os.path.join(BASE_DIR, 'templates', 'jinja2')],
+        "OPTIONS": {
+            "environment": "project.jinja2.environment",
+            "context_processors": TEMPLATE_CONTEXT_PROCESSORS,
+        },
+    })
 
 WSGI_APPLICATION = "project.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.mysql",
-        "NAME": config('MYSQL_NAME'),
-        "USER": config('MYSQL_USER'),
-        "PASSWORD": config('MYSQL_PASSWORD'),
-        "HOST": config('MYSQL_HOST'),
+# DB_ENGINE=sqlite switches to a local SQLite database for development and tests.
+
+if config('DB_ENGINE', default='mysql') == 'sqlite':
+    DATABASES = {
+        "default": {
+            "ENGINE": "project.db.sqlite3",
+            "NAME": config('SQLITE_NAME', default=os.path.join(BASE_DIR, 'db.sqlite3')),
+        }
     }
-}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "project.db.mysql",
+            "NAME": config('MYSQL_NAME'),
+            "USER": config('MYSQL_USER'),
+            "PASSWORD": config('MYSQL_PASSWORD'),
+            "HOST": config('MYSQL_HOST'),
+        }
+    }
+
+# Connections: DB_POOL_SIZE > 0 shares a process-wide pool of connections between threads
+# (recommended under ASGI); otherwise each thread keeps its connection for CONN_MAX_AGE seconds.
+# Both check a reused connection before handing it out.
+
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)
+DATABASES["default"].update({
+    "CONN_MAX_AGE": 0 if DB_POOL_SIZE else config('CONN_MAX_AGE', default=0 if ASYNC_VIEWS else 60, cast=int),
+    "CONN_HEALTH_CHECKS": True,
+    "POOL": {
+        "SIZE": DB_POOL_SIZE,
+        "TIMEOUT": config('DB_POOL_TIMEOUT', default=5.0, cast=float),
+        "MAX_LIFETIME": config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+        "HEALTH_CHECK_INTERVAL": config('DB_POOL_HEALTH_CHECK_INTERVAL', default=30.0, cast=float),
+    },
+})
+
+# Read replicas: each host in DB_REPLICA_HOSTS gets a "replicaN" alias with the primary's settings.
+# Reads inside views go to a random replica, writes to the primary (see project.routers);
+# a client stays on the primary for DB_REPLICA_STICKINESS seconds after a POST.
+
+DATABASE_REPLICAS = []
+for number, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "POOL": dict(DATABASES["default"]["POOL"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["project.routers.PrimaryReplicaRouter"]
+DB_REPLICA_STICKINESS = config('DB_REPLICA_STICKINESS', default=5, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -105,6 +172,10 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# ModelBackend stays listed so sessions created before CachedModelBackend keep working
+
+AUTHENTICATION_BACKENDS = ["account.backends.CachedModelBackend", "django.contrib.auth.backends.ModelBackend"]
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -121,6 +192,23 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static/']
+STATIC_ROOT = config('STATIC_ROOT', default=os.path.join(BASE_DIR, 'staticfiles'))
+
+# collectstatic writes .gz (and .br when the brotli package is installed) copies of text files.
+# STATIC_MANIFEST=True adds content hashes to file names, so they can be cached forever; it
+# requires running collectstatic before the server starts, as does STATIC_SERVE=True, which
+# serves STATIC_ROOT from the WSGI/ASGI application before requests reach Django.
+
+STATIC_MANIFEST = config('STATIC_MANIFEST', default=False, cast=bool)
+STATIC_SERVE = config('STATIC_SERVE', default=False, cast=bool)
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', default=60, cast=int)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "project.staticfiles.CompressedManifestStaticFilesStorage" if STATIC_MANIFEST
+        else "project.staticfiles.CompressedStaticFilesStorage",
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -135,6 +223,18 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # end MEDIA_ROOT
 
+# Avatars: originals larger than this many pixels on a side are downscaled (0 disables the cap)
+
+AVATAR_MAX_ORIGINAL_SIZE = config('AVATAR_MAX_ORIGINAL_SIZE', default=0, cast=int)
+
+# Avatars: files saved more recently than this many seconds are not deleted when released
+
+AVATAR_RELEASE_GRACE = config('AVATAR_RELEASE_GRACE', default=600, cast=int)
+
+# Profile pages: seconds a profile stays in the cache
+
+PROFILE_CACHE_TIMEOUT = config('PROFILE_CACHE_TIMEOUT', default=300, cast=int)
+
 # django-crispy-forms
 # https://django-crispy-forms.readthedocs.io/en/latest/install.html
 # https://github.com/django-crispy-forms/crispy-bootstrap5
@@ -146,3 +246,88 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 # end django-crispy-forms
 
 LOGIN_REDIRECT_URL = '/'
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": config('CACHE_BACKEND', default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config('CACHE_LOCATION', default=""),
+    }
+}
+
+# A per-process cache (locmem, dummy) is not shared between workers: a logout, password change or
+# deactivation in one worker would not reach the sessions and users cached by the others
+
+CACHE_IS_SHARED = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+# Sessions and the session user are read from the cache, falling back to the database
+
+SESSION_ENGINE = config('SESSION_ENGINE', default="django.contrib.sessions.backends.cached_db" if CACHE_IS_SHARED
+                        else "django.contrib.sessions.backends.db")
+
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60 if CACHE_IS_SHARED else 0, cast=int)
+
+# end Cache
+
+# query budget
+
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+# manage.py test всегда проверяет бюджет строго
+TEST_RUNNER = 'project.test_runner.QueryBudgetTestRunner'
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+
+# end query budget
+
+# Rate limits of expensive views (project.ratelimit): RATELIMIT_STORE is "cache" to share
+# token buckets between processes through the default cache or "local" to keep them in
+# process memory. Behind a reverse proxy, set RATELIMIT_IP_HEADER to the META key of the
+# header it sets (e.g. HTTP_X_FORWARDED_FOR), otherwise all clients share the proxy's IP.
+
+RATELIMIT_ENABLED = config('RATELIMIT_ENABLED', default=True, cast=bool)
+RATELIMIT_STORE = config('RATELIMIT_STORE', default='cache')
+RATELIMIT_IP_HEADER = config('RATELIMIT_IP_HEADER', default='')
+
+# Prometheus metrics of this process at /metrics/
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+
+# memo_board
+
+NOTES_PER_PAGE = config('NOTES_PER_PAGE', default=20, cast=int)
+NOTES_CACHE_TIMEOUT = config('NOTES_CACHE_TIMEOUT', default=300, cast=int)
+NOTES_BATCH_MAX_SIZE = config('NOTES_BATCH_MAX_SIZE', default=500, cast=int)
+NOTES_EXPORT_CHUNK_SIZE = config('NOTES_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Live feed of note changes (Server-Sent Events, ASGI only): "local" keeps events in the
+# process, a redis:// URL shares them between processes through Redis Streams
+
+NOTES_EVENTS_BROKER = config('NOTES_EVENTS_BROKER', default='local')
+NOTES_EVENTS_BUFFER = config('NOTES_EVENTS_BUFFER', default=1000, cast=int)
+NOTES_EVENTS_HEARTBEAT = config('NOTES_EVENTS_HEARTBEAT', default=15, cast=int)
+NOTES_EVENTS_MAX_AGE = config('NOTES_EVENTS_MAX_AGE', default=300, cast=int)
+NOTES_EVENTS_RETRY = config('NOTES_EVENTS_RETRY', default=3, cast=int)
+
+# end memo_board
+
+# Email: requests only store messages in the outbox table (registration.outbox), and
+# manage.py send_outbox delivers them through OUTBOX_DELIVERY_BACKEND (SMTP by default,
+# configured with the EMAIL_HOST* settings), retrying failures with exponential backoff.
+
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='registration.outbox.OutboxEmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='webmaster@localhost')
+OUTBOX_DELIVERY_BACKEND = config('OUTBOX_DELIVERY_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+OUTBOX_RETRY_DELAY = config('OUTBOX_RETRY_DELAY', default=60, cast=int)
+OUTBOX_MAX_RETRY_DELAY = config('OUTBOX_MAX_RETRY_DELAY', default=3600, cast=int)
+OUTBOX_LEASE = config('OUTBOX_LEASE', default=300, cast=int)
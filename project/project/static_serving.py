@@ -0,0 +1,297 @@
+"""
+Раздача статических файлов из STATIC_ROOT до Django.
+
+StaticFilesWSGI и StaticFilesASGI оборачивают приложение (project/wsgi.py и
+project/asgi.py при STATIC_SERVE=True) и отвечают на запросы под STATIC_URL
+сами: такие запросы не проходят через middleware и разбор URL.
+
+* Список файлов строится один раз при запуске, поэтому collectstatic нужно
+  выполнить до старта сервера. Путь запроса ищется в этом списке, так что
+  выйти за пределы STATIC_ROOT нельзя.
+* Заранее сжатые варианты (.br, .gz из project.staticfiles) выбираются по
+  Accept-Encoding; ответ содержит Vary: Accept-Encoding.
+* Файлы с хешем в имени (из staticfiles.json) кэшируются на год с
+  immutable, остальные - на STATIC_MAX_AGE секунд.
+* Поддерживаются ETag, If-None-Match, If-Modified-Since и один диапазон
+  Range (с If-Range). Диапазоны отдаются только из несжатого файла.
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.utils.http import http_date, parse_http_date_safe
+
+Headers = List[Tuple[str, str]]
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# варианты в порядке предпочтения: brotli сжимает текст лучше gzip
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+EXTRA_CONTENT_TYPES = {'.map': 'application/json', '.woff2': 'font/woff2', '.webp': 'image/webp'}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@dataclass
+class StaticFile:
+    """Файл из STATIC_ROOT и его сжатые варианты (кодировка -> путь и размер)."""
+
+    path: str
+    size: int
+    mtime: int
+    content_type: str
+    immutable: bool
+    variants: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        suffix = f'-{encoding}' if encoding else ''
+        return f'"{self.mtime:x}-{self.size:x}{suffix}"'
+
+
+@dataclass
+class StaticResponse:
+    """Ответ на запрос статического файла: статус, заголовки и отдаваемая часть файла."""
+
+    status: int
+    headers: Headers
+    path: Optional[str] = None
+    offset: int = 0
+    length: int = 0
+
+    @property
+    def status_line(self) -> str:
+        return f'{self.status} {HTTPStatus(self.status).phrase}'
+
+
+def _content_type(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower()
+    content_type = EXTRA_CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _accepted_encodings(header: str) -> Set[str]:
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range с одним диапазоном.
+
+    Returns:
+        Начало и длина диапазона, (size, 0) для диапазона вне файла или None,
+        если заголовок не удалось разобрать (файл отдается целиком).
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        length = min(int(end), size)
+        return (size - length, length) if length else (size, 0)
+    start = int(start)
+    if start >= size:
+        return size, 0
+    end = min(int(end), size - 1) if end else size - 1
+    if end < start:
+        return None
+    return start, end - start + 1
+
+
+class StaticFiles:
+    """
+    Список файлов STATIC_ROOT и построение ответов на запросы к ним.
+
+    Args:
+        root: Каталог собранных файлов (STATIC_ROOT).
+        prefix: Префикс URL (STATIC_URL), должен начинаться с '/'.
+        max_age: Время кэширования файлов без хеша в имени, в секундах.
+    """
+
+    def __init__(self, root: str, prefix: str, max_age: int) -> None:
+        self.root = root
+        self.prefix = '/' + prefix.strip('/') + '/'
+        self.max_age = max_age
+        self.files = self._scan()
+
+    def _scan(self) -> Dict[str, StaticFile]:
+        immutable = set()
+        manifest = os.path.join(self.root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                immutable = set(json.load(f).get('paths', {}).values())
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(directory, name)
+                url_name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                stat = os.stat(path)
+                static_file = StaticFile(path, stat.st_size, int(stat.st_mtime), _content_type(name),
+                                         url_name in immutable)
+                for encoding, suffix in ENCODINGS:
+                    if os.path.exists(path + suffix):
+                        static_file.variants[encoding] = (path + suffix, os.path.getsize(path + suffix))
+                files[url_name] = static_file
+        return files
+
+    def handles(self, path: str) -> bool:
+        return path.startswith(self.prefix)
+
+    def respond(self, method: str, path: str, headers: Dict[str, str]) -> StaticResponse:
+        """
+        Строит ответ на запрос под префиксом статических файлов.
+
+        Args:
+            method: HTTP-метод.
+            path: Путь запроса (уже декодированный).
+            headers: Заголовки запроса с именами в нижнем регистре.
+
+        Returns:
+            Ответ; path и length задают отдаваемую часть файла (length = 0 -
+            ответ без тела).
+        """
+        static_file = self.files.get(path[len(self.prefix):])
+        if static_file is None:
+            return StaticResponse(404, [('Content-Type', 'text/plain; charset=utf-8'), ('Content-Length', '0')])
+        if method not in ('GET', 'HEAD'):
+            return StaticResponse(405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+
+        encoding = None
+        if static_file.variants and 'range' not in headers:
+            accepted = _accepted_encodings(headers.get('accept-encoding', ''))
+            encoding = next((coding for coding, _ in ENCODINGS
+                             if coding in accepted and coding in static_file.variants), None)
+        etag = static_file.etag(encoding)
+        max_age = IMMUTABLE_MAX_AGE if static_file.immutable else self.max_age
+        common = [
+            ('ETag', etag),
+            ('Last-Modified', http_date(static_file.mtime)),
+            ('Cache-Control', f'public, max-age={max_age}' + (', immutable' if static_file.immutable else '')),
+        ]
+        if static_file.variants:
+            common.append(('Vary', 'Accept-Encoding'))
+
+        if self._not_modified(static_file, etag, headers):
+            return StaticResponse(304, common)
+
+        path, size = static_file.variants[encoding] if encoding else (static_file.path, static_file.size)
+        response_headers = common + [('Content-Type', static_file.content_type), ('Accept-Ranges', 'bytes')]
+        if encoding:
+            response_headers.append(('Content-Encoding', encoding))
+
+        byte_range = None
+        if 'range' in headers and self._if_range_matches(static_file, etag, headers.get('if-range')):
+            byte_range = _parse_range(headers['range'], size)
+        if byte_range is None:
+            return StaticResponse(200, response_headers + [('Content-Length', str(size))], path, 0,
+                                  size if method == 'GET' else 0)
+        offset, length = byte_range
+        if not length:
+            return StaticResponse(416, common + [('Content-Range', f'bytes */{size}'), ('Content-Length', '0')])
+        response_headers += [('Content-Range', f'bytes {offset}-{offset + length - 1}/{size}'),
+                             ('Content-Length', str(length))]
+        return StaticResponse(206, response_headers, path, offset, length if method == 'GET' else 0)
+
+    @staticmethod
+    def _not_modified(static_file: StaticFile, etag: str, headers: Dict[str, str]) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or etag in tags
+        since = parse_http_date_safe(headers.get('if-modified-since', ''))
+        return since is not None and static_file.mtime <= since
+
+    @staticmethod
+    def _if_range_matches(static_file: StaticFile, etag: str, if_range: Optional[str]) -> bool:
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        return parse_http_date_safe(if_range) == static_file.mtime
+
+
+def default_static_files() -> StaticFiles:
+    return StaticFiles(str(settings.STATIC_ROOT), settings.STATIC_URL, settings.STATIC_MAX_AGE)
+
+
+def _read_chunks(path: str, offset: int, length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class StaticFilesWSGI:
+    """WSGI-обертка, отдающая статические файлы без вызова приложения."""
+
+    def __init__(self, application, static_files: Optional[StaticFiles] = None) -> None:
+        self.application = application
+        self.static_files = static_files or default_static_files()
+
+    def __call__(self, environ, start_response):
+        # PATH_INFO в WSGI - байты пути, декодированные как latin-1
+        path = environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace')
+        if not self.static_files.handles(path):
+            return self.application(environ, start_response)
+        headers = {key[5:].replace('_', '-').lower(): value for key, value in environ.items()
+                   if key.startswith('HTTP_')}
+        response = self.static_files.respond(environ['REQUEST_METHOD'], path, headers)
+        start_response(response.status_line, response.headers)
+        if not response.length:
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and response.offset == 0 and response.status == 200:
+            # сервер может отдать весь файл через sendfile
+            return file_wrapper(open(response.path, 'rb'), CHUNK_SIZE)
+        return _read_chunks(response.path, response.offset, response.length)
+
+
+class StaticFilesASGI:
+    """ASGI-обертка, отдающая статические файлы без вызова приложения."""
+
+    def __init__(self, application, static_files: Optional[StaticFiles] = None) -> None:
+        self.application = application
+        self.static_files = static_files or default_static_files()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http' or not self.static_files.handles(scope['path']):
+            return await self.application(scope, receive, send)
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        response = self.static_files.respond(scope['method'], scope['path'], headers)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers],
+        })
+        if response.length:
+            chunks = _read_chunks(response.path, response.offset, response.length)
+            try:
+                # чтение с диска выполняется в потоке, чтобы не блокировать цикл событий
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                chunks.close()
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,82 @@
+"""
+Хранилища статических файлов, которые при collectstatic сжимают файлы заранее.
+
+Рядом с каждым текстовым файлом в STATIC_ROOT записываются варианты
+<имя>.gz и, если установлен пакет brotli, <имя>.br. Их отдает
+project.static_serving без сжатия на лету. Вариант не записывается, если он
+почти не меньше исходного файла.
+
+CompressedManifestStaticFilesStorage вдобавок добавляет к именам файлов хеш
+содержимого (staticfiles.json), поэтому такие файлы можно кэшировать
+навсегда. Хранилище выбирается настройкой STATIC_MANIFEST.
+"""
+import gzip
+import os
+from typing import Iterator, List, Tuple
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli не обязателен
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico')
+# файлы меньше этого размера не сжимаются: выигрыш меньше заголовков ответа
+MIN_COMPRESS_SIZE = 256
+# вариант сохраняется, только если он меньше исходного файла хотя бы на 5%
+MAX_COMPRESSED_RATIO = 0.95
+
+
+def compress_file(path: str) -> List[str]:
+    """
+    Записывает сжатые варианты файла рядом с ним.
+
+    Args:
+        path: Путь к файлу на диске.
+
+    Returns:
+        Пути записанных вариантов (.gz и .br).
+    """
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < MIN_COMPRESS_SIZE:
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    # mtime=0: одинаковое содержимое дает одинаковый .gz при каждой сборке
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) > len(data) * MAX_COMPRESSED_RATIO:
+            continue
+        with open(path + suffix, 'wb') as f:
+            f.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedStaticFilesMixin:
+    """Сжимает собранные файлы после обработки родительским хранилищем."""
+
+    def post_process(self, paths, dry_run: bool = False, **options) -> Iterator[Tuple[str, str, bool]]:
+        names = set(paths)
+        parent = getattr(super(), 'post_process', None)
+        if parent is not None:
+            for name, hashed_name, processed in parent(paths, dry_run, **options):
+                if hashed_name and not isinstance(processed, Exception):
+                    names.add(hashed_name)
+                yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            for variant in compress_file(self.path(name)):
+                yield name, os.path.relpath(variant, self.location), True
+
+
+class CompressedStaticFilesStorage(CompressedStaticFilesMixin, StaticFilesStorage):
+    pass
+
+
+class CompressedManifestStaticFilesStorage(CompressedStaticFilesMixin, ManifestStaticFilesStorage):
+    pass
@@ -0,0 +1,23 @@
+"""
+Запуск тестов со строгой проверкой бюджета SQL-запросов.
+
+Под manage.py test превышение бюджета представления или повторяющиеся
+запросы (см. project.query_budget) вызывают исключение независимо от
+QUERY_BUDGET_STRICT в окружении, поэтому регрессии роняют тесты, а не
+остаются предупреждениями в логе.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """DiscoverRunner, включающий QUERY_BUDGET_STRICT на время тестов."""
+
+    def setup_test_environment(self, **kwargs) -> None:
+        super().setup_test_environment(**kwargs)
+        self._saved_query_budget_strict = settings.QUERY_BUDGET_STRICT
+        settings.QUERY_BUDGET_STRICT = True
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        settings.QUERY_BUDGET_STRICT = self._saved_query_budget_strict
+        super().teardown_test_environment(**kwargs)
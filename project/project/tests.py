@@ -0,0 +1,548 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.db import connections, transaction
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import ResolverMatch, reverse
+
+from memo_board.models import Note
+
+from .admin import EstimatedCountPaginator
+from .benchmark import percentile
+from .db.bulk import delete_rows
+from .db.pool import PoolTimeout, pool_connections_created, pool_health_check_failures, pool_waits
+from .db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .query_budget import (QueryBudgetExceeded, QueryBudgetMiddleware, capture_queries, check_query_budget,
+                           query_budget)
+from .routers import (STICKY_COOKIE, PrimaryReplicaRouter, ReplicaStickinessMiddleware, mark_written,
+                      recently_written, use_primary)
+from .ratelimit import (LocalStore, get_store, parse_rate, rate_limit, ratelimit_allowed, ratelimit_throttled,
+                        take_token)
+from .static_serving import StaticFiles, StaticFilesASGI, StaticFilesWSGI
+
+
+class CaptureQueriesTest(TestCase):
+    def test_counts_queries_and_repeated_shapes(self):
+        with capture_queries() as stats:
+            for i in range(3):
+                User.objects.filter(pk=i).exists()
+            User.objects.count()
+        self.assertEqual(stats.count, 4)
+        self.assertGreaterEqual(stats.duration, 0)
+        self.assertEqual([n for sql, n in stats.repeated(3)], [3])
+
+    def test_nested_blocks_count_in_outer(self):
+        with capture_queries() as outer:
+            User.objects.count()
+            with capture_queries() as inner:
+                User.objects.count()
+        self.assertEqual((outer.count, inner.count), (2, 1))
+
+    def test_nothing_recorded_outside_block(self):
+        with capture_queries() as stats:
+            pass
+        User.objects.count()
+        self.assertEqual(stats.count, 0)
+
+
+class CheckQueryBudgetTest(TestCase):
+    def setUp(self):
+        with capture_queries() as self.stats:
+            User.objects.count()
+            User.objects.count()
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            check_query_budget(self.stats, 1, 'view')
+        check_query_budget(self.stats, 2, 'view')
+
+    def test_test_runner_enables_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            check_query_budget(self.stats, 1, 'view')
+
+    @override_settings(QUERY_BUDGET_STRICT=False, QUERY_REPEAT_THRESHOLD=2)
+    def test_repeated_queries_are_logged(self):
+        with self.assertLogs('project.query_budget', level='WARNING') as logs:
+            check_query_budget(self.stats, None, 'view')
+        self.assertIn('repeated 2 times', logs.output[0])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetMiddlewareTest(TestCase):
+    def _run(self, budget):
+        @query_budget(budget)
+        def view(request):
+            User.objects.count()
+            return HttpResponse()
+
+        def get_response(request):
+            request.resolver_match = ResolverMatch(view, (), {}, url_name='view')
+            return view(request)
+
+        return QueryBudgetMiddleware(get_response)(RequestFactory().get('/'))
+
+    def test_within_budget(self):
+        self.assertEqual(self._run(1).status_code, 200)
+
+    def test_over_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self._run(0)
+
+    def test_budget_depends_on_request(self):
+        self.assertEqual(self._run(lambda request: 1).status_code, 200)
+        with self.assertRaises(QueryBudgetExceeded):
+            self._run(lambda request: 0)
+
+
+class DeleteRowsTest(TestCase):
+    def test_deletes_by_pk_in_chunks_without_signals(self):
+        user = User.objects.create_user(username='owner')
+        notes = Note.objects.bulk_create([Note(title=f'n{i}', text='text', user=user) for i in range(5)])
+        receiver = mock.Mock()
+        post_delete.connect(receiver, sender=Note)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Note)
+        with mock.patch.object(connections['default'].ops, 'bulk_batch_size', return_value=2):
+            deleted = delete_rows(Note, [note.pk for note in notes[:4]] + [0])
+        self.assertEqual(deleted, 4)
+        self.assertEqual(list(Note.objects.values_list('pk', flat=True)), [notes[4].pk])
+        receiver.assert_not_called()
+        self.assertEqual(delete_rows(Note, []), 0)
+
+
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = os.path.join(directory.name, 'pool.sqlite3')
+        self.alias = f'pool_{self._testMethodName}'
+
+    def wrapper(self, **pool):
+        settings_dict = {**connections['default'].settings_dict, 'NAME': self.name,
+                         'POOL': {'SIZE': 1, 'TIMEOUT': 0.05, **pool}}
+        wrapper = PooledSQLiteWrapper(settings_dict, alias=self.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_closed_connection_is_reused(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        self.assertIsNone(first.connection)
+
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(second.connection, raw)
+        self.assertEqual(pool_connections_created.value(pool=self.alias), 1)
+
+    def test_checkout_times_out_when_pool_is_exhausted(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        with self.assertRaises(PoolTimeout):
+            self.wrapper().ensure_connection()
+
+    def test_waiting_checkout_gets_released_connection(self):
+        first = self.wrapper(TIMEOUT=5)
+        first.ensure_connection()
+        second = self.wrapper(TIMEOUT=5)
+        waiter = threading.Thread(target=second.ensure_connection)
+        waiter.start()
+        time.sleep(0.05)
+        first.close()
+        waiter.join()
+        self.assertIsNotNone(second.connection)
+        self.assertEqual(pool_waits.value(pool=self.alias), 1)
+        second.connection = None  # соединение открыто в другом потоке
+
+    def test_broken_idle_connection_is_replaced(self):
+        first = self.wrapper(HEALTH_CHECK_INTERVAL=0)
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        raw.close()
+
+        second = self.wrapper(HEALTH_CHECK_INTERVAL=0)
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        self.assertEqual(pool_health_check_failures.value(pool=self.alias), 1)
+
+    def test_connection_closed_in_transaction_is_discarded(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        first.set_autocommit(False)
+        first.close()
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertEqual(pool_connections_created.value(pool=self.alias), 2)
+
+
+class MetricsViewTest(TestCase):
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_exposes_pool_metrics(self):
+        response = self.client.get('/metrics/')
+        self.assertContains(response, '# TYPE db_pool_checkout_seconds histogram')
+        self.assertContains(response, '# TYPE db_pool_connections gauge')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], DB_REPLICA_STICKINESS=5, CACHE_IS_SHARED=True)
+class ReplicaRouterTest(SimpleTestCase):
+    # TestCase оборачивает тест в транзакцию, а в транзакции все чтения идут в основную БД
+    databases = {'default'}
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def routed(self, request, write=False):
+        """Прогоняет запрос через middleware, запоминая БД для чтений до и после записи."""
+        seen = {}
+
+        def view(request):
+            seen['read'] = self.router.db_for_read(User)
+            if write:
+                seen['write'] = self.router.db_for_write(User)
+                seen['read_after_write'] = self.router.db_for_read(User)
+            return HttpResponse()
+
+        response = ReplicaStickinessMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    def test_reads_in_requests_use_replicas(self):
+        seen, response = self.routed(self.factory.get('/'))
+        self.assertIn(seen['read'], ['replica1', 'replica2'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_reads_after_write_use_primary(self):
+        seen, response = self.routed(self.factory.post('/'), write=True)
+        self.assertEqual(seen['write'], 'default')
+        self.assertEqual(seen['read_after_write'], 'default')
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+
+    def test_sticky_cookie_pins_reads_to_primary(self):
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() + 5)
+        self.assertEqual(self.routed(request)[0]['read'], 'default')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        self.assertIn(self.routed(request)[0]['read'], ['replica1', 'replica2'])
+        request.COOKIES[STICKY_COOKIE] = 'garbage'
+        self.assertIn(self.routed(request)[0]['read'], ['replica1', 'replica2'])
+
+    def test_use_primary_and_recently_written(self):
+        def view(request):
+            with use_primary(recently_written('thing')):
+                before = self.router.db_for_read(User)
+            mark_written('thing')
+            with use_primary(recently_written('thing')):
+                after = self.router.db_for_read(User)
+            return HttpResponse(f'{before} {after}')
+
+        response = ReplicaStickinessMiddleware(view)(self.factory.get('/'))
+        before, after = response.content.decode().split()
+        self.assertIn(before, ['replica1', 'replica2'])
+        self.assertEqual(after, 'default')
+
+    def test_reads_in_transactions_use_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return HttpResponse(self.router.db_for_read(User))
+
+        self.assertEqual(ReplicaStickinessMiddleware(view)(self.factory.get('/')).content, b'default')
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_local_cache_refills_from_primary(self):
+        self.assertTrue(recently_written('never-written'))
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'memo_board'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'memo_board'))
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'testpass')
+        self.client.force_login(self.admin)
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(3)]
+        self.url = reverse('admin:memo_board_note_changelist')
+
+    def _notes(self, count):
+        Note.objects.bulk_create([Note(title=f'Note {i}', text='text', user=self.users[i % 3]) for i in range(count)])
+
+    def _queries(self, url):
+        with capture_queries() as stats:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return stats.count
+
+    def test_queries_do_not_depend_on_rows(self):
+        self._notes(3)
+        self.client.get(self.url)  # пользователь сессии попадает в кэш
+        few = self._queries(self.url)
+        self._notes(15)
+        self.assertEqual(self._queries(self.url), few)
+
+    def test_autocomplete_user_filter(self):
+        self._notes(6)
+        response = self.client.get(self.url, {'user__id__exact': self.users[1].pk})
+        self.assertEqual([note.user_id for note in response.context['cl'].result_list], [self.users[1].pk] * 2)
+        self.assertContains(response, 'data-filter-param="user__id__exact"')
+        self.assertContains(response, 'admin/js/autocomplete_filter.js')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'memo_board', 'model_name': 'note', 'field_name': 'user', 'term': 'user1'})
+        self.assertEqual([item['text'] for item in response.json()['results']], ['user1'])
+
+    def test_user_search_matches_username_and_email_prefix(self):
+        User.objects.create_user(username='carol', email='mail@example.com')
+        url = reverse('admin:auth_user_changelist')
+        for term, expected in (('car', ['carol']), ('mail@', ['carol']), ('example', [])):
+            with self.subTest(term=term):
+                response = self.client.get(url, {'q': term})
+                self.assertEqual([user.username for user in response.context['cl'].result_list], expected)
+
+    def test_other_changelists_render(self):
+        for name in ('auth_user', 'account_profile', 'account_accountdeletion', 'memo_board_archivednote',
+                     'memo_board_notestats'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(f'admin:{name}_changelist'), {'q': 'user'}).status_code, 200)
+
+    def test_estimated_count_used_only_without_filters(self):
+        self._notes(6)
+        with mock.patch('project.admin.estimate_table_rows', return_value=1_000_000):
+            self.assertEqual(EstimatedCountPaginator(Note.objects.order_by('pk'), 20).count, 1_000_000)
+            filtered = Note.objects.filter(user=self.users[0]).order_by('pk')
+            self.assertEqual(EstimatedCountPaginator(filtered, 20).count, 2)
+        self.assertEqual(EstimatedCountPaginator(Note.objects.order_by('pk'), 20).count, 6)
+
+
+class PercentileTest(TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class CompressedStaticFilesTest(TestCase):
+    def test_collectstatic_hashes_and_compresses(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+                STATIC_ROOT=root, STORAGES={**settings.STORAGES, 'staticfiles': {
+                    'BACKEND': 'project.staticfiles.CompressedManifestStaticFilesStorage'}}):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = static('vendor/bootstrap/css/bootstrap.min.css')
+            self.assertRegex(url, r'^/static/vendor/bootstrap/css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+            path = os.path.join(root, url[len('/static/'):])
+            with open(path, 'rb') as original, gzip.open(path + '.gz') as compressed:
+                self.assertEqual(compressed.read(), original.read())
+            # пустой basic.css сжимать бессмысленно
+            self.assertFalse(os.path.exists(os.path.join(root, 'memo_board', 'css', 'basic.css.gz')))
+
+
+class StaticServingTest(TestCase):
+    CSS = b'body { color: black; }\n' * 40
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        os.makedirs(os.path.join(self.root, 'css'))
+        for name, data in (('css/app.css', self.CSS), ('css/app.0123456789ab.css', self.CSS),
+                           ('css/app.css.gz', gzip.compress(self.CSS)), ('css/app.css.br', b'brotli')):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(data)
+        with open(os.path.join(self.root, 'staticfiles.json'), 'w') as f:
+            json.dump({'paths': {'css/app.css': 'css/app.0123456789ab.css'}}, f)
+        self.app = mock.Mock(return_value=[b'django'])
+        self.wsgi = StaticFilesWSGI(self.app, StaticFiles(self.root, '/static/', 60))
+
+    def get(self, path, method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path}
+        environ.update({'HTTP_' + name.upper(): value for name, value in headers.items()})
+        started = {}
+
+        def start_response(status, response_headers):
+            started.update(status=status, headers=dict(response_headers))
+
+        body = b''.join(self.wsgi(environ, start_response))
+        return started.get('status'), started.get('headers'), body
+
+    def test_negotiates_precompressed_variants(self):
+        status, headers, body = self.get('/static/css/app.css', accept_encoding='gzip, br')
+        self.assertEqual((status, headers['Content-Encoding'], body), ('200 OK', 'br', b'brotli'))
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+
+        status, headers, body = self.get('/static/css/app.css', accept_encoding='gzip, br;q=0')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), self.CSS)
+
+        status, headers, body = self.get('/static/css/app.css')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual((body, headers['Content-Length']), (self.CSS, str(len(self.CSS))))
+        self.app.assert_not_called()
+
+    def test_hashed_files_are_immutable(self):
+        status, headers, _ = self.get('/static/css/app.0123456789ab.css')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertNotIn('Vary', headers)
+
+    def test_conditional_requests(self):
+        _, headers, _ = self.get('/static/css/app.css', accept_encoding='gzip')
+        status, not_modified, body = self.get('/static/css/app.css', accept_encoding='gzip',
+                                              if_none_match=headers['ETag'])
+        self.assertEqual((status, body, not_modified['ETag']), ('304 Not Modified', b'', headers['ETag']))
+        # ETag варианта gzip не подходит к ответу brotli
+        status, _, _ = self.get('/static/css/app.css', accept_encoding='br', if_none_match=headers['ETag'])
+        self.assertEqual(status, '200 OK')
+        status, _, _ = self.get('/static/css/app.css', if_modified_since=headers['Last-Modified'])
+        self.assertEqual(status, '304 Not Modified')
+
+    def test_ranges(self):
+        status, headers, body = self.get('/static/css/app.css', accept_encoding='br', range='bytes=5-9')
+        self.assertEqual((status, body), ('206 Partial Content', self.CSS[5:10]))
+        self.assertEqual(headers['Content-Range'], f'bytes 5-9/{len(self.CSS)}')
+        self.assertNotIn('Content-Encoding', headers)
+
+        _, _, body = self.get('/static/css/app.css', range='bytes=-4')
+        self.assertEqual(body, self.CSS[-4:])
+        status, headers, _ = self.get('/static/css/app.css', range=f'bytes={len(self.CSS)}-')
+        self.assertEqual((status, headers['Content-Range']), ('416 Requested Range Not Satisfiable',
+                                                             f'bytes */{len(self.CSS)}'))
+        # несколько диапазонов и устаревший If-Range отдают файл целиком
+        status, _, body = self.get('/static/css/app.css', range='bytes=0-1,5-6')
+        self.assertEqual((status, body), ('200 OK', self.CSS))
+        status, _, _ = self.get('/static/css/app.css', range='bytes=0-1', if_range='"stale"')
+        self.assertEqual(status, '200 OK')
+
+    def test_other_requests(self):
+        status, headers, body = self.get('/static/css/app.css', method='HEAD')
+        self.assertEqual((status, body, headers['Content-Length']), ('200 OK', b'', str(len(self.CSS))))
+        self.assertEqual(self.get('/static/css/app.css', method='POST')[0], '405 Method Not Allowed')
+        self.assertEqual(self.get('/static/../settings.py')[0], '404 Not Found')
+        self.assertEqual(self.get('/static/staticfiles.json.gz')[0], '404 Not Found')
+        self.app.assert_not_called()
+        self.assertEqual(self.get('/notes-list/')[2], b'django')
+
+    def test_asgi(self):
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        asgi = StaticFilesASGI(application, StaticFiles(self.root, '/static/', 60))
+
+        async def request(path, headers):
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers}
+            await asgi(scope, None, send)
+            return messages
+
+        messages = asyncio.run(request('/static/css/app.css', [(b'accept-encoding', b'gzip')]))
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-encoding', b'gzip'), messages[0]['headers'])
+        self.assertEqual(gzip.decompress(b''.join(m.get('body', b'') for m in messages[1:])), self.CSS)
+        self.assertEqual(asyncio.run(request('/notes-list/', []))[0]['status'], 204)
+
+
+class TokenBucketTest(TestCase):
+    def test_parse_rate(self):
+        rate = parse_rate('30/m')
+        self.assertEqual((rate.capacity, rate.period, rate.per_second), (30, 60, 0.5))
+        for value in ('30', '0/m', 'x/m', '5/w'):
+            with self.assertRaises(ValueError):
+                parse_rate(value)
+
+    def test_bucket_refills_at_rate(self):
+        rate = parse_rate('2/m')
+        bucket, wait = take_token(None, rate, 100.0)
+        bucket, wait = take_token(bucket, rate, 100.0)
+        self.assertEqual(wait, 0)
+        bucket, wait = take_token(bucket, rate, 100.0)
+        self.assertEqual(wait, 30)
+        bucket, wait = take_token(bucket, rate, 115.0)
+        self.assertEqual(wait, 15)
+        bucket, wait = take_token(bucket, rate, 130.0)
+        self.assertEqual(wait, 0)
+        # пополнение не превышает емкость
+        bucket, wait = take_token(bucket, rate, 10000.0)
+        self.assertEqual(bucket, (1, 10000.0))
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMIT_IP_HEADER='')
+class RateLimitDecoratorTest(TestCase):
+    def setUp(self):
+        get_store.cache_clear()
+        self.addCleanup(get_store.cache_clear)
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user('limited')
+
+    def request(self, method='post', ip='10.1.1.1', user=None, **extra):
+        request = getattr(self.factory, method)('/limited/', REMOTE_ADDR=ip, **extra)
+        request.user = user or self.user
+        return request
+
+    @override_settings(RATELIMIT_STORE='local')
+    def test_per_ip_and_per_user_buckets(self):
+        self.assertIsInstance(get_store(), LocalStore)
+        view = rate_limit('test_scope', ip='3/m', user='2/m')(lambda request: HttpResponse('ok'))
+        allowed = ratelimit_allowed.value(scope='test_scope')
+        self.assertEqual([view(self.request()).status_code for _ in range(3)], [200, 200, 429])
+        self.assertEqual(ratelimit_throttled.value(scope='test_scope', bucket='user'), 1)
+        self.assertEqual(ratelimit_allowed.value(scope='test_scope') - allowed, 2)
+
+        other = User.objects.create_user('other')
+        self.assertEqual(view(self.request(user=other)).status_code, 429)
+        self.assertEqual(ratelimit_throttled.value(scope='test_scope', bucket='ip'), 1)
+        self.assertEqual(view(self.request(ip='10.1.1.2', user=other)).status_code, 200)
+        # GET не учитывается по умолчанию
+        self.assertEqual(view(self.request('get')).status_code, 200)
+
+    def test_cache_store_and_async_views(self):
+        cache.clear()
+
+        async def async_view(request):
+            return HttpResponse('ok')
+
+        view = rate_limit('async_scope', ip='1/h', methods=None)(async_view)
+        self.assertEqual(asyncio.run(view(self.request('get'))).status_code, 200)
+        response = asyncio.run(view(self.request('get')))
+        self.assertEqual((response.status_code, response['Retry-After']), (429, '3600'))
+        self.assertIsNotNone(cache.get('ratelimit:async_scope:ip:10.1.1.1'))
+
+    def test_proxy_header_and_failures(self):
+        view = rate_limit('proxy_scope', ip='1/m')(lambda request: HttpResponse('ok'))
+        with override_settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR'):
+            self.assertEqual(view(self.request(HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')).status_code, 200)
+            self.assertEqual(view(self.request(HTTP_X_FORWARDED_FOR='3.3.3.3, 2.2.2.2')).status_code, 429)
+            self.assertEqual(view(self.request(HTTP_X_FORWARDED_FOR='1.1.1.1, 4.4.4.4')).status_code, 200)
+        with override_settings(RATELIMIT_ENABLED=False):
+            self.assertEqual(view(self.request(HTTP_X_FORWARDED_FOR='2.2.2.2')).status_code, 200)
+        # недоступное хранилище не должно блокировать запросы
+        with mock.patch('project.ratelimit.cache.get', side_effect=ConnectionError), \
+                self.assertLogs('project.ratelimit', 'ERROR'):
+            self.assertEqual(view(self.request(ip='10.9.9.9')).status_code, 200)
@@ -14,12 +14,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.auth.views import LoginView
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+from .ratelimit import rate_limit
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
+    path('accounts/login/', rate_limit('login', ip='20/m', username='5/m')(LoginView.as_view()), name='login'),
     path('accounts/', include('django.contrib.auth.urls')),
     path('', include('memo_board.urls')),
     path('', include('registration.urls')),
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.STATIC_SERVE:
+    from project.static_serving import StaticFilesWSGI  # noqa: E402
+
+    application = StaticFilesWSGI(application)
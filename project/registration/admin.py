@@ -1,3 +1,36 @@
 from django.contrib import admin
+from django.utils import timezone
 
-# Register your models here.
+from project.admin import EstimatedCountPaginator
+from .models import OutboxEmail
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display: tuple = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter: tuple = ('status',)
+    list_per_page: int = 50
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+    # письма содержат действующие ссылки сброса пароля: текст не показывается, а
+    # получателей и содержимое нельзя изменить, чтобы перенаправить письмо
+    exclude: tuple = ('body', 'html_body', 'headers')
+    actions: list = ['retry_now']
+
+    def has_add_permission(self, request) -> bool:
+        return False
+
+    def has_change_permission(self, request, obj=None) -> bool:
+        return False
+
+    def has_retry_permission(self, request) -> bool:
+        # повтор не меняет содержимое писем, но доступен только с правом на их изменение
+        return request.user.has_perm('registration.change_outboxemail')
+
+    @admin.action(description='Отправить повторно', permissions=['retry'])
+    def retry_now(self, request, queryset) -> None:
+        queued = queryset.exclude(status=OutboxEmail.SENT).update(status=OutboxEmail.PENDING, attempts=0,
+                                                                  next_attempt_at=timezone.now())
+        self.message_user(request, f'{queued} писем поставлено в очередь')
+
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
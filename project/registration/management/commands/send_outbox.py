@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from registration.outbox import claim_due_emails, deliver_emails, purge_sent_emails
+
+
+class Command(BaseCommand):
+    help = ('Фоновый отправитель писем из очереди OutboxEmail: отправляет их пакетами через одно соединение '
+            'с почтовым сервером (OUTBOX_DELIVERY_BACKEND) и повторяет неудачные отправки с растущей паузой. '
+            'С --once отправляет письма, время которых наступило, и завершается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Отправить очередь и завершиться')
+        parser.add_argument('--batch-size', type=int, default=100, help='Писем за один проход')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза в секундах при пустой очереди')
+        parser.add_argument('--keep-days', type=int, default=7, help='Сколько дней хранить отправленные письма')
+
+    def handle(self, *args, **options):
+        connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND, fail_silently=False)
+        sent = failed = 0
+        try:
+            while True:
+                emails = claim_due_emails(options['batch_size'])
+                if emails:
+                    batch_sent, batch_failed = deliver_emails(emails, connection)
+                    sent, failed = sent + batch_sent, failed + batch_failed
+                    self.stdout.write(f'{sent} emails sent, {failed} failed attempts')
+                    continue
+                # почтовые серверы закрывают простаивающие соединения, поэтому без писем оно не держится
+                connection.close()
+                purged = purge_sent_emails(timedelta(days=options['keep_days']))
+                if purged:
+                    self.stdout.write(f'{purged} sent emails purged')
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            connection.close()
+        self.stdout.write(self.style.SUCCESS(f'Done, {sent} emails sent, {failed} failed attempts'))
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_email",
+                    models.CharField(max_length=254, verbose_name="Отправитель"),
+                ),
+                ("to", models.JSONField(default=list, verbose_name="Получатели")),
+                (
+                    "cc",
+                    models.JSONField(blank=True, default=list, verbose_name="Копия"),
+                ),
+                (
+                    "bcc",
+                    models.JSONField(
+                        blank=True, default=list, verbose_name="Скрытая копия"
+                    ),
+                ),
+                (
+                    "reply_to",
+                    models.JSONField(blank=True, default=list, verbose_name="Ответить"),
+                ),
+                ("subject", models.TextField(verbose_name="Тема")),
+                ("body", models.TextField(verbose_name="Текст")),
+                ("html_body", models.TextField(blank=True, verbose_name="HTML")),
+                (
+                    "headers",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Заголовки"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает отправки"),
+                            ("sent", "Отправлено"),
+                            ("failed", "Не отправлено"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Попыток отправки"
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Следующая попытка",
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Последняя ошибка"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Создано"),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Отправлено"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Исходящее письмо",
+                "verbose_name_plural": "Исходящие письма",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"], name="outbox_due_idx"
+                    )
+                ],
+            },
+        ),
+    ]
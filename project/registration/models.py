@@ -1,3 +1,36 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboxEmail(models.Model):
+    """Письмо, ожидающее отправки фоновым процессом (см. registration.outbox)."""
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Ожидает отправки'), (SENT, 'Отправлено'), (FAILED, 'Не отправлено')]
+
+    from_email = models.CharField(verbose_name='Отправитель', max_length=254)
+    to = models.JSONField(verbose_name='Получатели', default=list)
+    cc = models.JSONField(verbose_name='Копия', default=list, blank=True)
+    bcc = models.JSONField(verbose_name='Скрытая копия', default=list, blank=True)
+    reply_to = models.JSONField(verbose_name='Ответить', default=list, blank=True)
+    subject = models.TextField(verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    html_body = models.TextField(verbose_name='HTML', blank=True)
+    headers = models.JSONField(verbose_name='Заголовки', default=dict, blank=True)
+    status = models.CharField(verbose_name='Состояние', max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попыток отправки', default=0)
+    next_attempt_at = models.DateTimeField(verbose_name='Следующая попытка', default=timezone.now)
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = models.DateTimeField(verbose_name='Создано', auto_now_add=True)
+    sent_at = models.DateTimeField(verbose_name='Отправлено', null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f'{self.subject} -> {", ".join(self.to)}'
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        # очередь выбирается по состоянию и времени следующей попытки
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')]
@@ -0,0 +1,198 @@
+"""
+Очередь исходящих писем в базе данных.
+
+OutboxEmailBackend - бэкенд почты Django (EMAIL_BACKEND), который не
+связывается с SMTP-сервером, а сохраняет письма в таблицу OutboxEmail.
+Письмо сохраняется в транзакции запроса, поэтому страница сброса пароля
+отвечает сразу, а при откате транзакции письмо не уходит.
+
+Фоновый процесс manage.py send_outbox забирает письма пакетами и отправляет
+их через бэкенд OUTBOX_DELIVERY_BACKEND (по умолчанию SMTP), открывая
+соединение один раз на много писем. Неудачная отправка повторяется с
+экспоненциально растущей паузой; после OUTBOX_MAX_ATTEMPTS попыток или
+постоянной ошибки сервера (код 5xx) письмо помечается как неотправленное.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+from typing import List, Sequence, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from project import metrics
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+outbox_sent = metrics.counter('outbox_emails_sent_total', 'Emails delivered from the outbox')
+outbox_failures = metrics.counter('outbox_email_failures_total',
+                                  'Failed outbox deliveries by outcome (retry or failed)')
+
+
+def enqueue_messages(messages: Sequence[EmailMessage]) -> int:
+    """
+    Сохраняет письма в очередь.
+
+    Args:
+        messages: Письма Django; у EmailMultiAlternatives сохраняется
+            HTML-альтернатива.
+
+    Returns:
+        Число сохраненных писем.
+
+    Raises:
+        ValueError: Если у письма есть вложения (очередь их не хранит).
+    """
+    rows = []
+    for message in messages:
+        if message.attachments:
+            raise ValueError('The email outbox does not support attachments')
+        html = next((content for content, mimetype in getattr(message, 'alternatives', [])
+                     if mimetype == 'text/html'), '')
+        rows.append(OutboxEmail(from_email=message.from_email or settings.DEFAULT_FROM_EMAIL, to=list(message.to),
+                                cc=list(message.cc), bcc=list(message.bcc), reply_to=list(message.reply_to),
+                                subject=message.subject, body=message.body, html_body=html,
+                                headers=dict(message.extra_headers)))
+    OutboxEmail.objects.bulk_create(rows)
+    return len(rows)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Бэкенд почты, ставящий письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages: Sequence[EmailMessage]) -> int:
+        messages = [message for message in email_messages if message.recipients()]
+        if not messages:
+            return 0
+        try:
+            return enqueue_messages(messages)
+        except Exception:
+            if not self.fail_silently:
+                raise
+            logger.exception('Failed to enqueue %s emails', len(messages))
+            return 0
+
+
+def to_message(email: OutboxEmail, connection=None) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(email.subject, email.body, email.from_email, email.to, bcc=email.bcc,
+                                     connection=connection, headers=email.headers, cc=email.cc,
+                                     reply_to=email.reply_to)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Пауза перед следующей попыткой: OUTBOX_RETRY_DELAY, удваиваемая с каждой попыткой."""
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.OUTBOX_MAX_RETRY_DELAY))
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибка, которую повтор не исправит: сервер ответил кодом 5xx."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def claim_due_emails(limit: int) -> List[OutboxEmail]:
+    """
+    Забирает письма, время отправки которых наступило.
+
+    Время следующей попытки забранных писем сдвигается на OUTBOX_LEASE
+    секунд, поэтому параллельный процесс их не возьмет, а письма процесса,
+    завершившегося во время отправки, будут отправлены после этой паузы.
+
+    Args:
+        limit: Максимальное число писем.
+
+    Returns:
+        Забранные письма; next_attempt_at каждого - конец аренды.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE)
+    with transaction.atomic():
+        emails = list(OutboxEmail.objects.select_for_update(skip_locked=True)
+                      .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+                      .order_by('next_attempt_at', 'pk')[:limit])
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=lease_until)
+    for email in emails:
+        email.next_attempt_at = lease_until
+    return emails
+
+
+def _renew_lease(email: OutboxEmail) -> bool:
+    """
+    Продлевает аренду письма перед отправкой.
+
+    Аренда сверяется с сохраненной при захвате: если она истекла и письмо
+    забрал другой процесс, письмо не отправляется повторно.
+    """
+    lease_until = timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE)
+    renewed = OutboxEmail.objects.filter(pk=email.pk, status=OutboxEmail.PENDING,
+                                         next_attempt_at=email.next_attempt_at).update(next_attempt_at=lease_until)
+    if renewed:
+        email.next_attempt_at = lease_until
+    return bool(renewed)
+
+
+def deliver_emails(emails: List[OutboxEmail], connection) -> Tuple[int, int]:
+    """
+    Отправляет письма через открытое соединение и сохраняет результат.
+
+    Перед каждым письмом аренда продлевается, поэтому медленная отправка
+    пакета не отдает еще не отправленные письма другому процессу. Письмо,
+    аренду которого уже забрал другой процесс, пропускается, а результат
+    сохраняется только пока аренда принадлежит этому процессу.
+
+    Ошибка соединения закрывает его; следующее письмо откроет новое.
+
+    Args:
+        emails: Письма из claim_due_emails.
+        connection: Бэкенд почты Django с fail_silently=False.
+
+    Returns:
+        Число отправленных и неотправленных писем.
+    """
+    sent = failed = 0
+    for email in emails:
+        if not _renew_lease(email):
+            logger.warning('Outbox email %s was claimed by another worker, skipping it', email.pk)
+            continue
+        leased = OutboxEmail.objects.filter(pk=email.pk, next_attempt_at=email.next_attempt_at)
+        try:
+            connection.open()
+            connection.send_messages([to_message(email, connection)])
+        except Exception as error:
+            failed += 1
+            # SMTPException - подкласс OSError; отказ сервера принять письмо соединение не портит
+            if isinstance(error, smtplib.SMTPServerDisconnected) or (
+                    isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)):
+                connection.close()
+            email.attempts += 1
+            email.last_error = f'{type(error).__name__}: {error}'[:1000]
+            if is_permanent_error(error) or email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                email.status = OutboxEmail.FAILED
+                outbox_failures.inc(outcome='failed')
+                logger.error('Giving up on outbox email %s after %s attempts: %s', email.pk, email.attempts,
+                             email.last_error)
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+                outbox_failures.inc(outcome='retry')
+            leased.update(attempts=email.attempts, last_error=email.last_error, status=email.status,
+                          next_attempt_at=email.next_attempt_at)
+            continue
+        sent += 1
+        outbox_sent.inc()
+        leased.update(status=OutboxEmail.SENT, sent_at=timezone.now(), attempts=email.attempts + 1)
+    return sent, failed
+
+
+def purge_sent_emails(older_than: timedelta) -> int:
+    """Удаляет записи об отправленных письмах старше older_than. Возвращает число удаленных."""
+    deleted, _ = OutboxEmail.objects.filter(status=OutboxEmail.SENT, sent_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -1,10 +1,23 @@
+import io
+import socketserver
+import threading
+from datetime import timedelta
+from email import message_from_bytes
+from unittest import mock
+
 from django.contrib.auth.forms import UserCreationForm
-from django.test import Client, TestCase
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 
 from .forms import RegisterForm
+from .models import OutboxEmail
+from .outbox import claim_due_emails, deliver_emails, retry_delay
 
 
 # тест для формы
@@ -67,3 +80,186 @@ class SignUpViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'registration/sign_up.html')
         self.assertTrue(isinstance(response.context['form'], RegisterForm))
+
+    # часы корзин остановлены: медленное хеширование паролей не должно успевать пополнить корзину
+    @mock.patch('project.ratelimit.time', **{'time.return_value': 1000.0})
+    def test_sign_up_is_rate_limited_per_ip(self, _):
+        cache.clear()
+        # отдельный адрес, чтобы не расходовать корзину 127.0.0.1 других тестов
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        for _ in range(10):
+            self.assertEqual(client.post(self.url, data=self.invalid_data).status_code, 302)
+        response = client.post(self.url, data=self.valid_data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertFalse(User.objects.filter(username='testuser').exists())
+        self.assertEqual(client.get(self.url).status_code, 200)
+        self.assertEqual(Client(REMOTE_ADDR='10.0.0.2').post(self.url, data=self.valid_data).status_code, 302)
+
+    @mock.patch('project.ratelimit.time', **{'time.return_value': 1000.0})
+    def test_login_is_rate_limited_per_ip(self, _):
+        cache.clear()
+        client = Client(REMOTE_ADDR='10.0.0.3')
+        # разные имена, чтобы не исчерпать корзину одного имени пользователя
+        for number in range(20):
+            credentials = {'username': f'nobody{number}', 'password': 'wrong'}
+            self.assertEqual(client.post(reverse('login'), credentials).status_code, 200)
+        self.assertEqual(client.post(reverse('login'), {'username': 'fresh', 'password': 'wrong'}).status_code, 429)
+
+    @mock.patch('project.ratelimit.time', **{'time.return_value': 1000.0})
+    def test_login_is_rate_limited_per_username(self, _):
+        cache.clear()
+        credentials = {'username': 'Victim', 'password': 'wrong'}
+        for number in range(5):
+            client = Client(REMOTE_ADDR=f'10.0.1.{number}')
+            self.assertEqual(client.post(reverse('login'), credentials).status_code, 200)
+        client = Client(REMOTE_ADDR='10.0.1.99')
+        self.assertEqual(client.post(reverse('login'), {**credentials, 'username': ' victim '}).status_code, 429)
+        self.assertEqual(client.post(reverse('login'), {**credentials, 'username': 'someone'}).status_code, 200)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost ready')
+        while line := self.rfile.readline():
+            verb = line[:4].decode().upper()
+            if verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                if server.data_replies:
+                    self.reply(server.data_replies.pop(0))
+                else:
+                    server.messages.append(message_from_bytes(data))
+                    self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK' if verb in ('EHLO', 'HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP') else '502 Unknown')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP-сервер для тестов: сохраняет принятые письма, на DATA может отвечать ошибками из data_replies."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.data_replies = []
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(EMAIL_BACKEND='registration.outbox.OutboxEmailBackend',
+                   OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                   EMAIL_HOST='127.0.0.1', EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_TIMEOUT=5,
+                   OUTBOX_RETRY_DELAY=60, OUTBOX_MAX_RETRY_DELAY=3600, OUTBOX_MAX_ATTEMPTS=3, RATELIMIT_ENABLED=False)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reset', email='reset@example.com', password='strongpassword123')
+
+    def send_outbox(self, port: int) -> None:
+        with override_settings(EMAIL_PORT=port):
+            call_command('send_outbox', once=True, stdout=io.StringIO())
+
+    def test_password_reset_only_enqueues(self):
+        with mock.patch('smtplib.SMTP') as smtp:
+            response = self.client.post(reverse('password_reset'), {'email': 'reset@example.com'})
+        self.assertRedirects(response, reverse('password_reset_done'))
+        smtp.assert_not_called()
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.to, email.status), (['reset@example.com'], OutboxEmail.PENDING))
+        self.assertIn('/reset/', email.body)
+
+    def test_worker_delivers_batches_over_one_connection(self):
+        for n in range(3):
+            mail.EmailMultiAlternatives(f'Subject {n}', 'text', 'from@example.com', [f'user{n}@example.com'],
+                                        alternatives=[('<p>html</p>', 'text/html')]).send()
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count(), 3)
+        with LocalSMTPServer() as server:
+            self.send_outbox(server.server_address[1])
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(sorted(message['Subject'] for message in server.messages), ['Subject 0', 'Subject 1',
+                                                                                    'Subject 2'])
+        self.assertTrue(server.messages[0].is_multipart())
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT, attempts=1).count(), 3)
+
+    def test_failures_are_retried_with_backoff(self):
+        for n in range(3):
+            mail.send_mail(f'Subject {n}', 'text', 'from@example.com', [f'user{n}@example.com'])
+        with LocalSMTPServer() as server:
+            server.data_replies = ['451 Try again later', '550 No such user']
+            with self.assertLogs('registration.outbox', 'ERROR'):
+                self.send_outbox(server.server_address[1])
+        self.assertEqual(server.connections, 1)
+        emails = list(OutboxEmail.objects.order_by('pk'))
+        self.assertEqual([(email.status, email.attempts) for email in emails],
+                         [(OutboxEmail.PENDING, 1), (OutboxEmail.FAILED, 1), (OutboxEmail.SENT, 1)])
+        self.assertIn('451', emails[0].last_error)
+        self.assertAlmostEqual((emails[0].next_attempt_at - timezone.now()).total_seconds(), 60, delta=5)
+
+        # сервер недоступен: письмо остается в очереди до исчерпания попыток
+        OutboxEmail.objects.filter(pk=emails[0].pk).update(next_attempt_at=timezone.now(), attempts=2)
+        with LocalSMTPServer() as server:
+            port = server.server_address[1]
+        with self.assertLogs('registration.outbox', 'ERROR'):
+            self.send_outbox(port)
+        email = OutboxEmail.objects.get(pk=emails[0].pk)
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.FAILED, 3))
+        self.assertIn('ConnectionRefusedError', email.last_error)
+
+    def test_retry_delay_and_lease(self):
+        self.assertEqual([retry_delay(n).total_seconds() for n in (1, 2, 3, 10)], [60, 120, 240, 3600])
+        mail.send_mail('Subject', 'text', 'from@example.com', ['user@example.com'])
+        self.assertEqual(len(claim_due_emails(10)), 1)
+        self.assertEqual(claim_due_emails(10), [])
+
+    def test_email_claimed_by_another_worker_is_not_sent_twice(self):
+        for n in range(2):
+            mail.send_mail(f'Subject {n}', 'text', 'from@example.com', [f'user{n}@example.com'])
+        emails = claim_due_emails(10)
+        # аренда первого письма истекла, и его забрал другой процесс
+        OutboxEmail.objects.filter(pk=emails[0].pk).update(next_attempt_at=timezone.now() + timedelta(minutes=1))
+        connection = mock.Mock()
+        with self.assertLogs('registration.outbox', 'WARNING'):
+            self.assertEqual(deliver_emails(emails, connection), (1, 0))
+        connection.send_messages.assert_called_once()
+        self.assertEqual(OutboxEmail.objects.get(pk=emails[0].pk).status, OutboxEmail.PENDING)
+        self.assertEqual(OutboxEmail.objects.get(pk=emails[1].pk).status, OutboxEmail.SENT)
+
+    def test_admin_is_read_only_and_hides_bodies(self):
+        mail.send_mail('Reset', 'secret reset link', 'from@example.com', ['user@example.com'])
+        email = OutboxEmail.objects.get()
+        self.client.force_login(User.objects.create_superuser('admin', password='adminpass'))
+        response = self.client.get(reverse('admin:registration_outboxemail_change', args=[email.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'secret reset link')
+        self.client.post(reverse('admin:registration_outboxemail_change', args=[email.pk]),
+                         {'to': '["attacker@example.com"]', 'subject': 'Reset', 'from_email': 'from@example.com'})
+        email.refresh_from_db()
+        self.assertEqual(email.to, ['user@example.com'])
+        self.assertEqual(self.client.get(reverse('admin:registration_outboxemail_add')).status_code, 403)
+
+        OutboxEmail.objects.update(status=OutboxEmail.FAILED)
+        self.client.post(reverse('admin:registration_outboxemail_changelist'),
+                         {'action': 'retry_now', '_selected_action': [email.pk]})
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.PENDING)
+
+    def test_sent_emails_are_purged(self):
+        mail.send_mail('Old', 'text', 'from@example.com', ['user@example.com'])
+        OutboxEmail.objects.update(status=OutboxEmail.SENT, sent_at=timezone.now() - timedelta(days=8))
+        self.send_outbox(1)
+        self.assertFalse(OutboxEmail.objects.exists())
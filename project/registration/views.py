@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import login
 from django.http import HttpResponseRedirect, HttpRequest, HttpResponse
 from django.shortcuts import render
+
+from project.ratelimit import rate_limit
 from .forms import RegisterForm
 
 
+@rate_limit('sign_up', ip='10/m')
 def sign_up(request: HttpRequest) -> HttpResponse:
     """
     Функция представления для регистрации нового пользователя.
@@ -18,7 +22,7 @@ def sign_up(request: HttpRequest) -> HttpResponse:
         form = RegisterForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
         return HttpResponseRedirect('/')
 
     else:
@@ -0,0 +1,19 @@
+'use strict';
+// Фильтры списков админки с автодополнением: выбор объекта перезагружает
+// список с параметром фильтра, остальные параметры запроса сохраняются.
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('select[data-filter-param]').off('change.filter').on('change.filter', function() {
+            const params = new URLSearchParams(window.location.search);
+            params.delete('p');
+            if (this.value) {
+                params.set(this.dataset.filterParam, this.value);
+            } else {
+                params.delete(this.dataset.filterParam);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
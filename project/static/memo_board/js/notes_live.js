@@ -0,0 +1,54 @@
+// Живая лента заметок: применяет события /notes/events/ к списку без перезагрузки страницы.
+(function () {
+    'use strict';
+
+    var container = document.getElementById('notes');
+    if (!container || !container.dataset.eventsUrl || !window.EventSource) {
+        return;
+    }
+
+    var source = new EventSource(container.dataset.eventsUrl);
+
+    function parse(html) {
+        var template = document.createElement('template');
+        template.innerHTML = html.trim();
+        return template.content.firstElementChild;
+    }
+
+    function find(id) {
+        return container.querySelector('[data-note-id="' + id + '"]');
+    }
+
+    source.addEventListener('created', function (event) {
+        var data = JSON.parse(event.data);
+        // новые заметки видны только на первой странице
+        if (find(data.id) || container.dataset.prepend !== 'true') {
+            return;
+        }
+        var empty = container.querySelector('.no_notes');
+        if (empty) {
+            empty.remove();
+        }
+        container.prepend(parse(data.html));
+    });
+
+    source.addEventListener('updated', function (event) {
+        var data = JSON.parse(event.data);
+        var item = find(data.id);
+        if (item) {
+            item.replaceWith(parse(data.html));
+        }
+    });
+
+    source.addEventListener('deleted', function (event) {
+        var item = find(JSON.parse(event.data).id);
+        if (item) {
+            item.remove();
+        }
+    });
+
+    source.addEventListener('reset', function () {
+        source.close();
+        window.location.reload();
+    });
+})();